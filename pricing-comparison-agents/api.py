@@ -0,0 +1,262 @@
+"""
+HTTP API for price comparisons. Run from pricing-comparison-agents/:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    POST /compare          one comparison, {"query": "..."}
+    POST /compare/batch    several comparisons, {"queries": ["...", ...]}, at most
+                           API_MAX_BATCH and never more than the pool holds
+    POST /summary          LLM-written summary of a comparison, {"top_result": {...}}
+    POST /summary/stream   the same summary as JSON lines while the model writes it
+    GET  /compare/stream   progressive results as JSON lines, ?query=...
+    GET  /health           liveness and worker pool usage
+    GET  /cache/semantic   near-duplicate query cache hits, with what each query matched
+    GET  /metrics          Prometheus metrics
+
+Comparisons and summaries run on a bounded worker pool (API_WORKERS running,
+API_QUEUE_SIZE waiting); requests beyond that are rejected with 429 and a
+Retry-After header.
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from config.settings import (
+    API_MAX_BATCH,
+    API_QUEUE_SIZE,
+    API_RETRY_AFTER,
+    API_WORKERS,
+    REQUEST_DEADLINE,
+    SEMANTIC_CACHE_ENABLED,
+    configure_logging,
+    logger,
+)
+from graph.graph_builder import arun_graph, astream_graph, get_compiled_graph
+from graph.query_cache import get_query_cache
+from graph.summary import astream_llm_summary, asummarize
+from utils.metrics import metrics
+from utils.worker_pool import PoolSaturated, WorkerPool
+
+pool = WorkerPool(API_WORKERS, API_QUEUE_SIZE)
+# A batch is admitted all or nothing, so one larger than the pool could never run
+MAX_BATCH = min(API_MAX_BATCH, pool.capacity)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    configure_logging()
+    if MAX_BATCH < API_MAX_BATCH:
+        logger.warning(
+            f"API_MAX_BATCH={API_MAX_BATCH} exceeds the worker pool "
+            f"capacity, batches are capped at {MAX_BATCH}"
+        )
+    # Compile up front so the first request doesn't pay for it
+    get_compiled_graph()
+    yield
+
+
+app = FastAPI(title="Pricing comparison", lifespan=lifespan)
+
+
+class CompareRequest(BaseModel):
+    query: str = Field(min_length=1)
+    use_llm_cache: bool = True
+    deadline: float = REQUEST_DEADLINE
+    # Resending a failed request with the same run_id resumes it instead of starting
+    # over
+    run_id: Optional[str] = None
+
+
+class SummaryRequest(BaseModel):
+    top_result: dict
+    use_llm_cache: bool = True
+
+
+class BatchCompareRequest(BaseModel):
+    queries: list[str] = Field(min_length=1)
+    use_llm_cache: bool = True
+    deadline: float = REQUEST_DEADLINE
+
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated(_request, _exc: PoolSaturated):
+    return JSONResponse(
+        {"detail": "Too many comparisons in progress, retry later."},
+        status_code=429,
+        headers={"Retry-After": str(API_RETRY_AFTER)},
+    )
+
+
+def comparison_record(query: str, final_state: dict, started: float) -> dict:
+    return {
+        "query": query,
+        "top_result": final_state.get("top_result"),
+        "summary": final_state.get("summary"),
+        "retailer_status": final_state.get("retailer_status"),
+        "price_history": final_state.get("price_history"),
+        "elapsed": round(time.perf_counter() - started, 3),
+    }
+
+
+async def run_comparison(
+    query: str, use_llm_cache: bool, deadline: float, run_id: str = None
+) -> dict:
+    """Runs one admitted comparison on a pool worker."""
+    started = time.perf_counter()
+    async with pool.worker():
+        final_state = await arun_graph(query, use_llm_cache, deadline, run_id)
+    return comparison_record(query, final_state, started)
+
+
+@app.post("/compare")
+async def compare(request: CompareRequest):
+    pool.admit()
+    try:
+        return await run_comparison(
+            request.query, request.use_llm_cache, request.deadline, request.run_id
+        )
+    except Exception as e:
+        logger.error(f"Comparison for '{request.query}' failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    finally:
+        pool.release()
+
+
+@app.post("/compare/batch")
+async def compare_batch(request: BatchCompareRequest):
+    queries = list(
+        dict.fromkeys(query.strip() for query in request.queries if query.strip())
+    )
+    if len(queries) > MAX_BATCH:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_BATCH} queries per batch."
+        )
+    pool.admit(len(queries))
+
+    async def run_one(query: str) -> dict:
+        try:
+            record = await run_comparison(
+                query, request.use_llm_cache, request.deadline
+            )
+            return {"status": "ok", **record}
+        except Exception as e:
+            logger.error(f"Comparison for '{query}' failed: {e}")
+            return {"query": query, "status": "error", "error": str(e)}
+        finally:
+            pool.release()
+
+    return {"results": await asyncio.gather(*(run_one(query) for query in queries))}
+
+
+@app.get("/compare/stream")
+async def compare_stream(
+    query: str = Query(min_length=1),
+    use_llm_cache: bool = True,
+    deadline: float = REQUEST_DEADLINE,
+    run_id: Optional[str] = None,
+):
+    """
+    Streams ("update", node, state update) and ("token", node, text) events as
+    JSON lines {"event", "node", "data"} while the graph runs.
+    """
+    # Answer 429 up front while the pool is full, but take the slot in the generator:
+    # its finally only runs once the client starts reading
+    pool.check()
+
+    async def events():
+        try:
+            pool.admit()
+        except PoolSaturated as e:
+            yield json.dumps({"event": "error", "node": None, "data": str(e)}) + "\n"
+            return
+        try:
+            async with pool.worker():
+                stream = astream_graph(query, use_llm_cache, deadline, run_id)
+                async for event, node, data in stream:
+                    line = {"event": event, "node": node, "data": data}
+                    yield json.dumps(line, default=str) + "\n"
+        except Exception as e:
+            logger.error(f"Streaming comparison for '{query}' failed: {e}")
+            yield json.dumps({"event": "error", "node": None, "data": str(e)}) + "\n"
+        finally:
+            pool.release()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/summary")
+async def summary(request: SummaryRequest):
+    """
+    Comparisons come back with a template summary; this writes the conversational
+    one for a top_result returned by /compare, only for clients that show it.
+    """
+    pool.admit()
+    try:
+        async with pool.worker():
+            text = await asummarize(request.top_result, request.use_llm_cache)
+        return {"summary": text}
+    except Exception as e:
+        logger.error(f"Summary failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    finally:
+        pool.release()
+
+
+@app.post("/summary/stream")
+async def summary_stream(request: SummaryRequest):
+    """
+    Streams the /summary text as JSON lines {"event": "token", "node": "summary",
+    "data": text} while the model writes it.
+    """
+    pool.check()
+
+    async def events():
+        try:
+            pool.admit()
+        except PoolSaturated as e:
+            yield json.dumps({"event": "error", "node": None, "data": str(e)}) + "\n"
+            return
+        try:
+            async with pool.worker():
+                chunks = astream_llm_summary(request.top_result, request.use_llm_cache)
+                async for chunk in chunks:
+                    line = {"event": "token", "node": "summary", "data": chunk}
+                    yield json.dumps(line) + "\n"
+        except Exception as e:
+            logger.error(f"Streaming summary failed: {e}")
+            yield json.dumps({"event": "error", "node": None, "data": str(e)}) + "\n"
+        finally:
+            pool.release()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "pool": pool.stats()}
+
+
+@app.get("/cache/semantic")
+async def semantic_cache_stats():
+    if not SEMANTIC_CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_query_cache().stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_route():
+    return metrics.render_prometheus()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,8 +1,18 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from graph.graph_builder import run_graph
+
+from config.settings import COMPARISON_API_URL, METRICS_PORT, configure_logging
+from graph.retailers.registry import RETAILERS
+from utils.api_client import ComparisonBusy, stream_comparison, stream_summary
+from utils.metrics import start_metrics_server
+
+# Shown when the comparison API turns a request away with 429
+BUSY_MESSAGE = "The comparison service is busy, please try again in a few seconds."
 
 st.set_page_config(layout="wide")
+configure_logging()
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
 
 st.markdown("""
     <style>
@@ -100,6 +110,120 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+
+def render_comparison(comparison_data):
+    for i in range(0, len(comparison_data.get("products", [])), 2):
+        cols = st.columns(2)
+        for j, col in enumerate(cols):
+            if i + j < len(comparison_data.get("products", [])):
+                product = comparison_data["products"][i + j]
+                
+                # Safely get rating, default to 5 if not found
+                rating = 5
+                if "rating" in product and product["rating"]:
+                    try:
+                        rating = int(float(product["rating"]))
+                    except:
+                        rating = 5
+
+                with col:
+                    st.markdown(f'''
+                        <div style="display: flex; background: white; padding: 1rem; 
+                                border-radius: 0.5rem; box-shadow: 0 2px 4px rgba(0,0,0,0.1); 
+                                margin: 0.5rem 0; gap: 1rem;">
+                            <div style="flex: 1;">
+                                <img src="{product['image']}" style="width: 100%; max-height: 150px; 
+                                    object-fit: contain; border-radius: 0.375rem;">
+                                <div style="color: #fbbf24; font-size: 0.75rem; margin-top: 0.5rem;">
+                                    {"⭐" * rating}
+                                </div>
+                            </div>
+                            <div style="flex: 1.5;">
+                                <div style="font-weight: 500; margin-bottom: 0.75rem; 
+                                        font-size: 0.875rem; color: #1a202c;">
+                                    {product['title'][:50]}...
+                                </div>
+                                <div>
+                                    {"".join([f"""
+                                        <div style="display: flex; align-items: center; padding: 0.5rem;
+                                                margin: 0.25rem 0; background: #f8fafc; 
+                                                border-radius: 0.375rem; font-size: 0.75rem;">
+                                            <span style="flex: 2; color: #4a5568;">{r['name']}</span>
+                                            <span style="flex: 1; font-weight: 600; color: #1a202c; 
+                                                text-align: right; padding-right: 0.5rem;">
+                                                ${r['price']}
+                                            </span>
+                                            <span style="width: 20px; text-align: center;">
+                                                {'✅' if r['availability'] else '❌'}
+                                            </span>
+                                        </div>
+                                    """ for r in product["retailers"]])}
+                                </div>
+                            </div>
+                        </div>
+                    ''', unsafe_allow_html=True)
+
+
+def render_retailer_hits(retailer_name, hits, status="ok"):
+    if status != "ok":
+        reason = "timed out" if status == "late" else "unavailable"
+        st.markdown(f"**{retailer_name}** · {reason}, left out of the comparison")
+        return
+    st.markdown(f"**{retailer_name}** · {len(hits)} results")
+    for hit in hits:
+        st.markdown(f"- [{hit['title']}]({hit['url']})")
+
+
+def comparison_events(user_query):
+    """
+    Progress events from the comparison API when one is configured, otherwise
+    from a local graph run.
+    """
+    if COMPARISON_API_URL:
+        return stream_comparison(COMPARISON_API_URL, user_query)
+    from graph.graph_builder import stream_graph
+    return stream_graph(user_query)
+
+
+def detailed_summary(top_result):
+    """LLM-written summary streamed as the model writes it, only asked for on demand"""
+    if COMPARISON_API_URL:
+        return stream_summary(COMPARISON_API_URL, top_result)
+    from graph.summary import stream_llm_summary
+    return stream_llm_summary(top_result)
+
+
+def run_comparison(user_query):
+    """Streams the graph, rendering each stage as soon as its node finishes"""
+    status = st.empty()
+    retailer_area = st.container()
+    grid_area = st.container()
+    summary_area = st.empty()
+    summary = ""
+    comparison_data = None
+    status.info("Searching across retailers...")
+    for event, node, payload in comparison_events(user_query):
+        if event == "token":
+            # Only compare streams tokens, and half-written JSON isn't worth showing
+            continue
+        if node in RETAILERS:
+            with retailer_area:
+                render_retailer_hits(
+                    RETAILERS[node].name,
+                    payload["retailer_results"][node],
+                    payload["retailer_status"][node],
+                )
+        elif node == "compare":
+            comparison_data = payload["top_result"]
+            with grid_area:
+                render_comparison(comparison_data)
+        elif node == "summarize":
+            summary = payload.get("summary") or summary
+            summary_area.markdown(summary)
+    status.empty()
+    return comparison_data, summary
+
+
 if "show_results" not in st.session_state:
     st.session_state["show_results"] = False
 
@@ -114,9 +238,14 @@ if not st.session_state["show_results"]:
     
     if st.button("Compare Prices", type="primary", use_container_width=False):
         if user_query:
-            with st.spinner("Searching across retailers..."):
-                graph_results = run_graph(user_query)
-                st.session_state.comparison_results = graph_results.get("aggregator", [])[6]["top_result"]
+            try:
+                comparison_data, summary = run_comparison(user_query)
+            except ComparisonBusy:
+                st.error(BUSY_MESSAGE)
+            else:
+                st.session_state.comparison_results = comparison_data or {}
+                st.session_state.summary = summary
+                st.session_state.detailed_summary = None
                 st.session_state.show_results = True
                 st.rerun()
         else:
@@ -128,55 +257,22 @@ else:
         st.rerun()
     
     if "comparison_results" in st.session_state:
-        comparison_data = st.session_state.comparison_results
-        
-        for i in range(0, len(comparison_data.get("products", [])), 2):
-            cols = st.columns(2)
-            for j, col in enumerate(cols):
-                if i + j < len(comparison_data.get("products", [])):
-                    product = comparison_data["products"][i + j]
-                    
-                    # Safely get rating, default to 5 if not found
-                    rating = 5
-                    if "rating" in product and product["rating"]:
-                        try:
-                            rating = int(float(product["rating"]))
-                        except:
-                            rating = 5
-
-                    with col:
-                        st.markdown(f'''
-                            <div style="display: flex; background: white; padding: 1rem; 
-                                    border-radius: 0.5rem; box-shadow: 0 2px 4px rgba(0,0,0,0.1); 
-                                    margin: 0.5rem 0; gap: 1rem;">
-                                <div style="flex: 1;">
-                                    <img src="{product['image']}" style="width: 100%; max-height: 150px; 
-                                        object-fit: contain; border-radius: 0.375rem;">
-                                    <div style="color: #fbbf24; font-size: 0.75rem; margin-top: 0.5rem;">
-                                        {"⭐" * rating}
-                                    </div>
-                                </div>
-                                <div style="flex: 1.5;">
-                                    <div style="font-weight: 500; margin-bottom: 0.75rem; 
-                                            font-size: 0.875rem; color: #1a202c;">
-                                        {product['title'][:50]}...
-                                    </div>
-                                    <div>
-                                        {"".join([f"""
-                                            <div style="display: flex; align-items: center; padding: 0.5rem;
-                                                    margin: 0.25rem 0; background: #f8fafc; 
-                                                    border-radius: 0.375rem; font-size: 0.75rem;">
-                                                <span style="flex: 2; color: #4a5568;">{r['name']}</span>
-                                                <span style="flex: 1; font-weight: 600; color: #1a202c; 
-                                                    text-align: right; padding-right: 0.5rem;">
-                                                    ${r['price']}
-                                                </span>
-                                                <span style="width: 20px; text-align: center;">
-                                                    {'✅' if r['availability'] else '❌'}
-                                                </span>
-                                            </div>
-                                        """ for r in product["retailers"]])}
-                                    </div>
-                                </div>
-                            </div>
-                        ''', unsafe_allow_html=True)
\ No newline at end of file
+        render_comparison(st.session_state.comparison_results)
+        if st.session_state.get("summary"):
+            st.markdown(st.session_state.summary)
+        can_summarize = (st.session_state.comparison_results
+                         and not st.session_state.get("detailed_summary"))
+        if can_summarize and st.button("Write a detailed summary", type="secondary"):
+            summary_area = st.empty()
+            summary = ""
+            try:
+                for chunk in detailed_summary(st.session_state.comparison_results):
+                    summary += chunk
+                    summary_area.markdown(summary)
+            except ComparisonBusy:
+                st.error(BUSY_MESSAGE)
+            else:
+                st.session_state.detailed_summary = summary
+                st.rerun()
+        if st.session_state.get("detailed_summary"):
+            st.markdown(st.session_state.detailed_summary)
@@ -0,0 +1,120 @@
+"""
+Cold-start benchmark: how long importing the entry modules takes.
+
+Each module is imported in a fresh interpreter with `-X importtime`, and the
+interpreter's own startup imports are subtracted. Run from pricing-comparison-agents/:
+
+    python -m benchmarks.import_time --repeat 5
+
+Exits with code 1 when a module's median import time exceeds its budget.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(HERE)
+
+# Median cold import budget in seconds per module
+DEFAULT_BUDGETS = {
+    "graph": 0.15,
+    "graph.graph_builder": 1.0,
+    "run": 1.0,
+}
+IMPORT_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """
+    (module, self us, cumulative us, nesting depth) for every line of -X importtime
+    output.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE_RE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            entries.append((module, int(own), int(cumulative), len(indent) // 2))
+    return entries
+
+
+def measure(statement: str) -> list[tuple[str, int, int, int]]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(completed.stderr)
+
+
+def import_seconds(module: str, startup_modules: set[str]) -> tuple[float, list]:
+    """
+    Seconds spent importing `module` and its dependencies, plus the direct imports
+    beneath it.
+    """
+    entries = [
+        entry
+        for entry in measure(f"import {module}")
+        if entry[0] not in startup_modules
+    ]
+    total = sum(entry[2] for entry in entries if entry[3] == 0)
+    return total / 1e6, [entry for entry in entries if entry[3] <= 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure cold import time of the entry modules."
+    )
+    parser.add_argument(
+        "modules", nargs="*", default=list(DEFAULT_BUDGETS), help="modules to import"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="budget in seconds for every module, overriding the defaults",
+    )
+    parser.add_argument(
+        "--top", type=int, default=5, help="slowest dependencies to list per module"
+    )
+    args = parser.parse_args()
+
+    startup_modules = {entry[0] for entry in measure("pass")}
+    over_budget = []
+    for module in args.modules:
+        samples, dependencies = [], []
+        for _ in range(args.repeat):
+            seconds, dependencies = import_seconds(module, startup_modules)
+            samples.append(seconds)
+        median = statistics.median(samples)
+        budget = args.budget if args.budget is not None else DEFAULT_BUDGETS.get(module)
+        status = (
+            ""
+            if budget is None
+            else (
+                " OVER BUDGET"
+                if median > budget
+                else f" (budget {budget * 1000:.0f}ms)"
+            )
+        )
+        print(f"{module:<24}{median * 1000:>10.1f}ms{status}")
+        for name, _, cumulative, _ in sorted(dependencies, key=lambda entry: -entry[2])[
+            : args.top
+        ]:
+            print(f"    {name:<40}{cumulative / 1000:>10.1f}ms")
+        if budget is not None and median > budget:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Import time over budget: {', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Offline latency benchmark for the comparison graph.
+
+Replaces the Tavily search client and the chat model with local stand-ins that
+replay recorded payloads after simulated latencies, then times every graph node
+on its own and run_graph end to end. Run from pricing-comparison-agents/:
+
+    python -m benchmarks.run_benchmark --iterations 50 \\
+        --search-latency lognormal:0.4,0.3 --llm-latency lognormal:2.0,0.3
+
+Add --failure-rate 0.1 or --domain-latency walmart.com=lognormal:3,0.5 to see how
+hedging, retries and circuit breakers cope with a degraded retailer.
+
+Results are written to --output. With --baseline, the run fails (exit code 1)
+when any p50/p95 regresses past --tolerance against that earlier result.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# The stand-ins must not be hidden behind the caches, and no real credentials are needed
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+os.environ["SEARCH_CACHE_ENABLED"] = "false"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LISTING_INDEX_ENABLED"] = "false"
+# Concurrent end-to-end runs use the same query and must not be coalesced into one
+os.environ["SINGLEFLIGHT_ENABLED"] = "false"
+# Record price history somewhere fresh so earlier runs don't change its cost
+os.environ["PRICE_HISTORY_PATH"] = tempfile.mkdtemp(prefix="price_history_")
+
+import numpy as np
+
+from benchmarks.stubs import (
+    FakeChatModel,
+    FakeSearchClient,
+    LatencyDistribution,
+    load_recording,
+)
+from config.settings import configure_logging
+from graph import nodes
+from graph.graph_builder import arun_graph
+from graph.llm import set_model
+from graph.retailers.registry import get_retailers
+from graph.retailers.search import make_retailer_node
+from utils.metrics import metrics as runtime_metrics
+from utils.search_client import set_search_client_factory
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RECORDING = os.path.join(HERE, "recordings", "default.json")
+DEFAULT_OUTPUT = os.path.join(HERE, "results", "latest.json")
+# Differences below this many seconds are treated as noise when comparing runs
+ABSOLUTE_SLACK = 0.005
+
+
+def summarize_samples(samples: list[float]) -> dict:
+    values = np.asarray(samples)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "n": len(samples),
+        "mean": float(values.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+    }
+
+
+async def bench_nodes(query: str, iterations: int) -> dict[str, list[float]]:
+    """
+    Times each node in isolation, feeding every node the state its predecessors
+    produced.
+    """
+    samples = {}
+
+    def record(name: str, started: float):
+        samples.setdefault(name, []).append(time.perf_counter() - started)
+
+    retailer_nodes = [
+        (retailer.key, make_retailer_node(retailer)) for retailer in get_retailers()
+    ]
+    for _ in range(iterations):
+        state = {"query": query, "llm_cache": False, "retailer_results": {}}
+        for key, retailer_node in retailer_nodes:
+            started = time.perf_counter()
+            update = await retailer_node(state)
+            record(f"retailer:{key}", started)
+            state["retailer_results"].update(update["retailer_results"])
+        for name in (
+            "coordinate",
+            "match",
+            "extract",
+            "compare",
+            "history",
+            "summarize",
+        ):
+            node = getattr(nodes, f"{name}_node")
+            started = time.perf_counter()
+            state.update(node(state))
+            record(name, started)
+    return samples
+
+
+async def bench_end_to_end(
+    query: str, iterations: int, concurrency: int
+) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def run_one():
+        async with semaphore:
+            started = time.perf_counter()
+            await arun_graph(query)
+            samples.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(run_one() for _ in range(iterations)))
+    return samples
+
+
+def find_regressions(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, stats in baseline["metrics"].items():
+        if name not in current["metrics"]:
+            continue
+        for percentile in ("p50", "p95"):
+            before, after = stats[percentile], current["metrics"][name][percentile]
+            if after > before * (1 + tolerance) + ABSOLUTE_SLACK:
+                regressions.append(
+                    f"{name} {percentile}: "
+                    f"{before * 1000:.1f}ms -> {after * 1000:.1f}ms"
+                )
+    return regressions
+
+
+def print_report(result: dict):
+    print(f"{'metric':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in result["metrics"].items():
+        p50, p95, p99 = (stats[p] * 1000 for p in ("p50", "p95", "p99"))
+        print(f"{name:<24}{stats['n']:>6}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+
+
+async def run(args) -> dict:
+    recording = load_recording(args.recording)
+    search_latency = LatencyDistribution(args.search_latency, seed=args.seed)
+    llm_latency = LatencyDistribution(args.llm_latency, seed=args.seed)
+    domain_latency = {
+        domain: LatencyDistribution(spec, seed=args.seed)
+        for domain, _, spec in (entry.partition("=") for entry in args.domain_latency)
+    }
+    set_search_client_factory(
+        lambda: FakeSearchClient(
+            recording, search_latency, args.failure_rate, domain_latency, seed=args.seed
+        )
+    )
+    set_model(FakeChatModel(recording, llm_latency))
+
+    node_samples = await bench_nodes(args.query, args.iterations)
+    end_to_end = await bench_end_to_end(args.query, args.iterations, args.concurrency)
+
+    metrics = {
+        name: summarize_samples(samples) for name, samples in node_samples.items()
+    }
+    metrics["end_to_end"] = summarize_samples(end_to_end)
+    counters = runtime_metrics.snapshot()["counters"]
+    return {
+        "timestamp": time.time(),
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "query",
+                "iterations",
+                "concurrency",
+                "search_latency",
+                "llm_latency",
+                "failure_rate",
+                "domain_latency",
+                "recording",
+                "seed",
+            )
+        },
+        "metrics": metrics,
+        # Hedges, retries, breaker trips, per-retailer outcomes and escalated searches
+        "resilience": {
+            name: value
+            for name, value in counters.items()
+            if name.startswith(
+                (
+                    "search_hedges",
+                    "search_retries",
+                    "search_circuit",
+                    "retailer_status",
+                    "search_stage",
+                    "search_escalations",
+                )
+            )
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline latency benchmark for the comparison graph."
+    )
+    parser.add_argument("--query", default="iphone 15")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument(
+        "--concurrency", type=int, default=1, help="end-to-end runs in flight at once"
+    )
+    parser.add_argument(
+        "--search-latency",
+        default="lognormal:0.4,0.3",
+        help="simulated tavily.search latency",
+    )
+    parser.add_argument(
+        "--llm-latency",
+        default="lognormal:1.5,0.3",
+        help="simulated model.invoke latency",
+    )
+    parser.add_argument(
+        "--failure-rate", type=float, default=0.0, help="fraction of searches that fail"
+    )
+    parser.add_argument(
+        "--domain-latency",
+        action="append",
+        default=[],
+        metavar="DOMAIN=SPEC",
+        help="latency override for one domain, e.g. walmart.com=lognormal:3,0.5",
+    )
+    parser.add_argument(
+        "--recording",
+        default=DEFAULT_RECORDING,
+        help="recorded search and model payloads",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="allowed relative slowdown, 0.1 = 10%%",
+    )
+    args = parser.parse_args()
+    configure_logging()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    for name, value in result["resilience"].items():
+        print(f"{name:<60}{value:>8}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(result, json.load(f), args.tolerance)
+        if regressions:
+            print(
+                "Regressions against baseline:\n  " + "\n  ".join(regressions),
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
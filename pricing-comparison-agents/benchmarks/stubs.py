@@ -0,0 +1,163 @@
+# benchmarks/stubs.py
+
+import asyncio
+import json
+import random
+import re
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# Section headers of a packed prompt, see graph/prompts.py create_packed_prompt
+PACKED_REQUEST_RE = re.compile(r"^### Request (\d+)$", re.MULTILINE)
+
+
+class LatencyDistribution:
+    """
+    Samples simulated call latencies in seconds.
+
+    Specs look like "constant:0.2", "uniform:0.1,0.4", "normal:0.3,0.05" or
+    "lognormal:0.3,0.5" (median, sigma).
+    """
+
+    def __init__(self, spec: str = "constant:0", seed: int = None):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(arg) for arg in args.split(",") if arg]
+        self.spec = spec
+        self._random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.kind == "constant":
+            return self.args[0] if self.args else 0.0
+        if self.kind == "uniform":
+            return self._random.uniform(*self.args)
+        if self.kind == "normal":
+            return max(self._random.gauss(*self.args), 0.0)
+        if self.kind == "lognormal":
+            median, sigma = self.args
+            return median * self._random.lognormvariate(0.0, sigma)
+        raise ValueError(f"Unknown latency distribution '{self.spec}'")
+
+
+def load_recording(path: str) -> dict:
+    """Loads recorded search and model payloads, see recordings/default.json."""
+    with open(path) as f:
+        return json.load(f)
+
+
+class FakeSearchError(Exception):
+    """Injected search failure."""
+
+
+class FakeSearchClient:
+    """
+    Stand-in for PooledSearchClient that replays recorded Tavily responses per
+    domain after a simulated network latency.
+
+    failure_rate injects errors into that fraction of calls, and domain_latency
+    overrides the latency distribution for single domains to simulate one slow retailer.
+    """
+
+    def __init__(
+        self,
+        recording: dict,
+        latency: LatencyDistribution,
+        failure_rate: float = 0.0,
+        domain_latency: dict[str, LatencyDistribution] = None,
+        seed: int = None,
+    ):
+        self.searches = recording["search"]
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.domain_latency = domain_latency or {}
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    # Same signature as PooledSearchClient.search, only the search params matter here
+    async def search(
+        self,
+        query: str,  # noqa: ARG002
+        limit_key: str = None,  # noqa: ARG002
+        limit: int = None,  # noqa: ARG002
+        rate: float = None,  # noqa: ARG002
+        **params,
+    ) -> dict:
+        self.calls += 1
+        domain = params.get("include_domains", [""])[0]
+        await asyncio.sleep(self.domain_latency.get(domain, self.latency).sample())
+        if self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise FakeSearchError(f"injected failure for {domain}")
+        response = self.searches.get(domain) or {"results": [], "images": []}
+        return {
+            **response,
+            "results": response["results"][: params.get("max_results", 5)],
+            "images": response.get("images", [])
+            if params.get("include_images")
+            else [],
+        }
+
+    async def aclose(self):
+        pass
+
+
+class FakeChatModel:
+    """
+    Stand-in for ChatOpenAI that returns the recorded compare or summary
+    response after a simulated latency.
+    """
+
+    model_name = "benchmark-stand-in"
+
+    def __init__(self, recording: dict, latency: LatencyDistribution):
+        self.responses = recording["llm"]
+        self.latency = latency
+        self.calls = 0
+
+    def _respond(self, messages) -> AIMessage:
+        self.calls += 1
+        kind = (
+            "compare"
+            if "product comparison expert" in messages[0].content
+            else "summary"
+        )
+        packed = PACKED_REQUEST_RE.findall(messages[-1].content)
+        if packed:
+            # Several prompts packed into one, see graph/llm.py
+            return AIMessage(
+                content=json.dumps(
+                    {
+                        "results": [
+                            {
+                                "id": int(number),
+                                "response": json.loads(self.responses[kind]),
+                            }
+                            for number in packed
+                        ]
+                    }
+                )
+            )
+        return AIMessage(content=self.responses[kind])
+
+    def invoke(self, messages, *_args, **_kwargs) -> AIMessage:
+        time.sleep(self.latency.sample())
+        return self._respond(messages)
+
+    async def ainvoke(self, messages, *_args, **_kwargs) -> AIMessage:
+        await asyncio.sleep(self.latency.sample())
+        return self._respond(messages)
+
+    async def astream(self, messages, *_args, **_kwargs):
+        """
+        Yields the recorded response a word at a time, after the simulated latency.
+        """
+        await asyncio.sleep(self.latency.sample())
+        for word in re.findall(r"\s*\S+", self._respond(messages).content):
+            yield AIMessageChunk(content=word)
+
+    def batch(self, inputs, *_args, **_kwargs) -> list[AIMessage]:
+        # Requests of a batch are sent concurrently, so they take about one latency
+        time.sleep(max(self.latency.sample() for _ in inputs))
+        return [self._respond(messages) for messages in inputs]
@@ -1,30 +1,163 @@
 # config/settings.py
 
+import logging
 import os
+from functools import lru_cache
+
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from tavily import TavilyClient
-import logging
-import langchain
 
 # Load environment variables from .env file
 load_dotenv()
-langchain.debug = True
-# Initialize logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Configuration variables
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LANGCHAIN_DEBUG = os.getenv("LANGCHAIN_DEBUG", "false").lower() == "true"
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+SEARCH_API_URL = os.getenv("SEARCH_API_URL", "https://api.tavily.com")
+# Shared keep-alive pool used by the async retailer nodes
+SEARCH_MAX_CONNECTIONS = int(os.getenv("SEARCH_MAX_CONNECTIONS", "20"))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "10"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "30"))
+# Default per-retailer searches per second, 0 disables rate limiting
+SEARCH_RATE_LIMIT = float(os.getenv("SEARCH_RATE_LIMIT", "0"))
+# Resilience of retailer searches, see utils/resilience.py. A search still running after
+# the SEARCH_HEDGE_PERCENTILE latency of its domain gets a second, hedged request (0
+# disables hedging)
+SEARCH_HEDGE_PERCENTILE = float(os.getenv("SEARCH_HEDGE_PERCENTILE", "95"))
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", "2"))
+SEARCH_RETRY_BACKOFF = float(os.getenv("SEARCH_RETRY_BACKOFF", "0.2"))
+# Retries and hedges allowed per regular search, process-wide
+SEARCH_RETRY_BUDGET = float(os.getenv("SEARCH_RETRY_BUDGET", "0.2"))
+# Consecutive failures that open a domain's circuit, and seconds it stays open
+SEARCH_BREAKER_FAILURES = int(os.getenv("SEARCH_BREAKER_FAILURES", "5"))
+SEARCH_BREAKER_COOLDOWN = float(os.getenv("SEARCH_BREAKER_COOLDOWN", "30"))
+# Start each retailer search cheap and escalate only when its results lack prices or
+# stock signals, per-retailer thresholds in graph/retailers/registry.py
+ADAPTIVE_SEARCH_ENABLED = os.getenv("ADAPTIVE_SEARCH_ENABLED", "true").lower() == "true"
+# Search result cache: in-memory LRU in front of a SQLite file
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search_cache.db")
+SEARCH_CACHE_MEMORY_SIZE = int(os.getenv("SEARCH_CACHE_MEMORY_SIZE", "1024"))
+SEARCH_CACHE_DISK_SIZE = int(os.getenv("SEARCH_CACHE_DISK_SIZE", "100000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+# Local BM25 index over listings from earlier searches, see utils/listing_index.py. A
+# retailer is answered from it, without a search, when LISTING_INDEX_MIN_HITS of its
+# listings seen in the last LISTING_INDEX_MAX_AGE seconds contain every query term and
+# are about the queried product: at least LISTING_INDEX_MIN_COVERAGE of their title
+# words are query words, see graph/retailers/listings.py. Listings are kept
+# LISTING_INDEX_RETENTION seconds
+LISTING_INDEX_ENABLED = os.getenv("LISTING_INDEX_ENABLED", "true").lower() == "true"
+LISTING_INDEX_PATH = os.getenv("LISTING_INDEX_PATH", ".cache/listings.db")
+LISTING_INDEX_MAX_AGE = float(os.getenv("LISTING_INDEX_MAX_AGE", "1800"))
+LISTING_INDEX_MIN_HITS = int(os.getenv("LISTING_INDEX_MIN_HITS", "3"))
+LISTING_INDEX_MIN_COVERAGE = float(os.getenv("LISTING_INDEX_MIN_COVERAGE", "0.5"))
+LISTING_INDEX_RETENTION = float(os.getenv("LISTING_INDEX_RETENTION", "604800"))
+# LLM response cache keyed on model name + prompt hash
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.db")
+LLM_CACHE_MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "256"))
+LLM_CACHE_DISK_SIZE = int(os.getenv("LLM_CACHE_DISK_SIZE", "10000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+# Compare calls of concurrent runs (batch sweeps) sent together, see graph/llm.py: a
+# batch goes out when LLM_BATCH_MAX_SIZE calls wait or LLM_BATCH_MAX_WAIT seconds after
+# the first; prompts sharing a system prompt are packed into one request of up to
+# LLM_BATCH_PACK_TOKENS tokens, 0 sends each on its own
+LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "false").lower() == "true"
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+LLM_BATCH_MAX_WAIT = float(os.getenv("LLM_BATCH_MAX_WAIT", "0.05"))
+LLM_BATCH_PACK_TOKENS = int(os.getenv("LLM_BATCH_PACK_TOKENS", "6000"))
+# Offers extracted locally below this confidence are sent to the LLM
+EXTRACTION_CONFIDENCE = float(os.getenv("EXTRACTION_CONFIDENCE", "0.75"))
+# Token budget for the search data sent in the compare prompt
+COMPARE_PROMPT_TOKEN_BUDGET = int(os.getenv("COMPARE_PROMPT_TOKEN_BUDGET", "3000"))
+COMPARE_CONTENT_TOKENS = int(os.getenv("COMPARE_CONTENT_TOKENS", "160"))
+# Append-only price history of compared products, see utils/price_history.py
+PRICE_HISTORY_ENABLED = os.getenv("PRICE_HISTORY_ENABLED", "true").lower() == "true"
+PRICE_HISTORY_PATH = os.getenv("PRICE_HISTORY_PATH", ".cache/price_history")
+PRICE_HISTORY_WINDOW_DAYS = float(os.getenv("PRICE_HISTORY_WINDOW_DAYS", "30"))
+# Watchlist refresher, see graph/watchlist.py: seconds between passes, refreshes started
+# per second, max random delay in seconds before each refresh, and the relative price
+# move that counts
+WATCHLIST_PATH = os.getenv("WATCHLIST_PATH", ".cache/watchlist.db")
+WATCHLIST_INTERVAL = float(os.getenv("WATCHLIST_INTERVAL", "3600"))
+WATCHLIST_RATE = float(os.getenv("WATCHLIST_RATE", "0.5"))
+WATCHLIST_JITTER = float(os.getenv("WATCHLIST_JITTER", "5"))
+WATCHLIST_CONCURRENCY = int(os.getenv("WATCHLIST_CONCURRENCY", "4"))
+WATCHLIST_MIN_PRICE_CHANGE = float(os.getenv("WATCHLIST_MIN_PRICE_CHANGE", "0.005"))
+# Near-duplicate query cache in front of the graph, see utils/semantic_cache.py: a run
+# is reused for a query whose embedding is at least SEMANTIC_CACHE_THRESHOLD
+# cosine-similar (and has the same numbers) for SEMANTIC_CACHE_TTL seconds. Off by
+# default, it loads a local sentence-transformers model
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", ".cache/semantic_cache")
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "all-MiniLM-L6-v2")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "900"))
+SEMANTIC_CACHE_CANDIDATES = int(os.getenv("SEMANTIC_CACHE_CANDIDATES", "3"))
+# Share one in-flight execution between concurrent identical graph runs and searches
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+# HTTP API (api.py): comparisons running at once, more allowed to wait before answering
+# 429
+API_WORKERS = int(os.getenv("API_WORKERS", "8"))
+API_QUEUE_SIZE = int(os.getenv("API_QUEUE_SIZE", "32"))
+API_MAX_BATCH = int(os.getenv("API_MAX_BATCH", "50"))
+API_RETRY_AFTER = int(os.getenv("API_RETRY_AFTER", "5"))
+# When set, app.py streams comparisons from this API instead of running the graph itself
+COMPARISON_API_URL = os.getenv("COMPARISON_API_URL")
+COMPARISON_API_TIMEOUT = float(os.getenv("COMPARISON_API_TIMEOUT", "120"))
+# Threads writing LLM summaries requested after a comparison, see graph/summary.py
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+# Graph checkpoints per run id, so a retried or resumed run skips the nodes that already
+# completed
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.db")
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", "604800"))
+# Seconds a request waits for retailer searches before comparing whatever answered, 0
+# waits for all
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "12"))
+# Optional JSON file of extra retailers, see graph/retailers/registry.py
+RETAILERS_FILE = os.getenv("RETAILERS_FILE")
+# Log full search payloads and model responses, off by default since they are large
+LOG_PAYLOADS = os.getenv("LOG_PAYLOADS", "false").lower() == "true"
+# Node, search and model metrics; METRICS_PORT serves them at /metrics when set
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Fraction of spans written to METRICS_SPAN_PATH as JSON lines, 0 disables the export
+METRICS_SPAN_SAMPLE_RATE = float(os.getenv("METRICS_SPAN_SAMPLE_RATE", "0"))
+METRICS_SPAN_PATH = os.getenv("METRICS_SPAN_PATH", ".cache/spans.jsonl")
+
+_logging_configured = False
+
+
+def configure_logging():
+    """
+    Sets up console and app.log logging and LangChain debug output. Entry points
+    call this once; importing the package has no logging side effects.
+    """
+    global _logging_configured
+    if _logging_configured:
+        return
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("app.log", delay=True),
+            logging.StreamHandler()
+        ]
+    )
+    _logging_configured = True
+    if LANGCHAIN_DEBUG:
+        # LangChain's debug mode dumps every prompt and response, keep it for local
+        # troubleshooting
+        from langchain_core.globals import set_debug
+        set_debug(True)
+
 
-# Initialize model and client instances
-model = ChatOpenAI(model=OPENAI_MODEL)
-tavily = TavilyClient(api_key=TAVILY_API_KEY)  # Adjust according to TavilyClient's requirements
+@lru_cache(maxsize=None)
+def get_chat_model():
+    """
+    Returns the shared ChatOpenAI client, importing and constructing it on first use.
+    """
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=OPENAI_MODEL)
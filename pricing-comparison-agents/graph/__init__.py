@@ -1,7 +1,5 @@
 # graph/__init__.py
 
-from .graph_builder import  run_graph
-
 from .graph_state import AgentState, Product
 
 __all__ = [
@@ -10,3 +8,12 @@ __all__ = [
     "AgentState",
     "Product"
 ]
+
+
+def __getattr__(name):
+    # Importing the builder pulls in langgraph, so only do it when run_graph is asked
+    # for
+    if name == "run_graph":
+        from .graph_builder import run_graph
+        return run_graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,146 @@
+import re
+
+from .graph_state import ComparedProducts, MatchedProduct, Product, Retailer
+
+AMOUNT = r"\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d+(?:\.\d{2})?"
+PRICE_RE = re.compile(rf"(?:US\s?)?\$\s?({AMOUNT})(?!\d)")
+# "729,99" or "1.299,99": a comma before the last two digits is a decimal point
+DECIMAL_COMMA_RE = re.compile(r"(\d{1,3}(?:\.\d{3})+|\d+),(\d{2})")
+# A price right after one of these words is the current selling price
+CURRENT_PRICE_RE = re.compile(
+    r"(?:now|sale|current(?:ly)?|(?<!list )price|deal|only|buy for)"
+    rf"\s*:?\s*(?:US\s?)?\$\s?({AMOUNT})",
+    re.IGNORECASE,
+)
+RATING_RE = re.compile(r"(\d(?:\.\d)?)\s*(?:out of 5|/\s?5|stars?)", re.IGNORECASE)
+OUT_OF_STOCK_RE = re.compile(
+    r"out of stock|sold out|currently unavailable|not available|unavailable"
+    r"|no longer available|discontinued",
+    re.IGNORECASE,
+)
+IN_STOCK_RE = re.compile(
+    r"in stock|add to cart|available (?:now|online|for)|ships (?:in|from|today)"
+    r"|pickup today|free shipping|buy now",
+    re.IGNORECASE,
+)
+
+# Confidence contributions; a listing at or above the threshold skips the LLM
+PRICE_WEIGHT = 0.6
+AMBIGUOUS_PRICE_WEIGHT = 0.3
+AVAILABILITY_WEIGHT = 0.25
+TITLE_WEIGHT = 0.15
+
+
+def parse_amount(text: str) -> float | None:
+    """
+    Reads a price written either way, "$1,299.99" or "1.299,99" (the compare
+    prompt asks the model for XX,XX); None if it isn't one.
+    """
+    text = text.replace("$", "").strip()
+    decimal_comma = DECIMAL_COMMA_RE.fullmatch(text)
+    if decimal_comma:
+        return float(
+            decimal_comma.group(1).replace(".", "") + "." + decimal_comma.group(2)
+        )
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def parse_price(text: str) -> tuple[str | None, float]:
+    """
+    Finds the selling price in a snippet.
+
+    Returns:
+        tuple: The price in XX.XX format (or None) and its confidence contribution.
+    """
+    current = CURRENT_PRICE_RE.findall(text)
+    candidates = current or PRICE_RE.findall(text)
+    prices = {float(amount.replace(",", "")) for amount in candidates}
+    prices.discard(0.0)
+    if not prices:
+        return None, 0.0
+    first = float(candidates[0].replace(",", ""))
+    weight = PRICE_WEIGHT if len(prices) == 1 or current else AMBIGUOUS_PRICE_WEIGHT
+    return f"{first:.2f}", weight
+
+
+def parse_availability(text: str) -> tuple[bool, float]:
+    """Returns whether the snippet says the item is in stock, and how sure we are."""
+    if OUT_OF_STOCK_RE.search(text):
+        return False, AVAILABILITY_WEIGHT
+    if IN_STOCK_RE.search(text):
+        return True, AVAILABILITY_WEIGHT
+    # A listed price without any stock wording usually means it can be bought
+    return True, 0.0
+
+
+def parse_rating(text: str) -> str:
+    match = RATING_RE.search(text)
+    if match and 0 < float(match.group(1)) <= 5:
+        return match.group(1)
+    return ""
+
+
+def extract_listing(listing: Product) -> tuple[Retailer, str]:
+    """
+    Extracts the retailer offer from one search hit.
+
+    Returns:
+        tuple: The Retailer entry (with a confidence score) and the listing's rating.
+    """
+    text = listing.get("content", "")
+    price, price_confidence = parse_price(text)
+    availability, availability_confidence = parse_availability(text)
+    title_confidence = TITLE_WEIGHT if listing.get("title") else 0.0
+    retailer = Retailer(
+        name=listing.get("retailer", ""),
+        price=price or "",
+        availability=availability,
+        confidence=round(
+            price_confidence + availability_confidence + title_confidence, 2
+        ),
+    )
+    return retailer, parse_rating(text)
+
+
+def extract_products(
+    matched_products: list[MatchedProduct], threshold: float
+) -> tuple[list[ComparedProducts], list[MatchedProduct]]:
+    """
+    Builds ComparedProducts from matched listings without calling the LLM.
+
+    A product is resolved locally when every retailer offer in it has a price
+    and scores at least the confidence threshold; the rest are returned
+    separately so only those are sent to the model.
+
+    Returns:
+        tuple: The confidently extracted products and the unresolved matched products.
+    """
+    products = []
+    unresolved = []
+    for matched in matched_products:
+        offers = {}
+        rating = ""
+        for listing in matched["listings"]:
+            retailer, listing_rating = extract_listing(listing)
+            # Keep the first hit per retailer, it is the search engine's best match
+            offers.setdefault(retailer["name"], retailer)
+            rating = rating or listing_rating
+        retailers = list(offers.values())
+        if not all(r["price"] and r["confidence"] >= threshold for r in retailers):
+            unresolved.append(matched)
+            continue
+        products.append(
+            ComparedProducts(
+                key=matched["key"],
+                title=matched["title"],
+                image=matched["image"],
+                rating=rating,
+                url=matched["url"],
+                retailers=retailers,
+                confidence=min(r["confidence"] for r in retailers),
+            )
+        )
+    return products, unresolved
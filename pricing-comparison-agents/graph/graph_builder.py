@@ -1,12 +1,42 @@
 
-from langgraph.graph import StateGraph, END
+import asyncio
+import time
+from functools import lru_cache
+
+from langgraph.graph import END, StateGraph
+
+from config.settings import (
+    CHECKPOINT_ENABLED,
+    CHECKPOINT_PATH,
+    CHECKPOINT_TTL,
+    REQUEST_DEADLINE,
+    SEMANTIC_CACHE_ENABLED,
+    SINGLEFLIGHT_ENABLED,
+    logger,
+)
+from utils.async_runner import iterate_sync, run_sync
+from utils.checkpoint import SqliteCheckpointSaver
+from utils.metrics import instrument_node, metrics
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+
 from .graph_state import AgentState
-from .nodes import (start_node, compare_node, summarize_node,coordinate_node)
-from .retailers.amazon import amazon_node
-from .retailers.bestbuy import bestbuy_node
-from .retailers.walmart import walmart_node
-from IPython.display import Image, display
-from typing import Annotated, List, TypedDict
+from .nodes import (
+    compare_node,
+    coordinate_node,
+    extract_node,
+    history_node,
+    match_node,
+    start_node,
+    summarize_node,
+)
+from .query_cache import cached_run, remember_run
+from .retailers.registry import get_retailers
+from .retailers.search import make_retailer_node, normalize_query
+
+# Concurrent runs of the same (normalized) query share one graph execution
+graph_flight = AsyncSingleFlight("arun_graph")
+stream_flight = AsyncSingleFlight("astream_graph")
+sync_graph_flight = SingleFlight("run_graph")
 
 
 # def route_to_retailers(state: AgentState) -> List[str]:
@@ -22,22 +52,43 @@ from typing import Annotated, List, TypedDict
     
     
     
-def build_graph() -> StateGraph:
+@lru_cache(maxsize=None)
+def get_checkpointer():
+    """
+    Shared SQLite store of run checkpoints, or None when checkpointing is disabled.
+    """
+    if not CHECKPOINT_ENABLED:
+        return None
+    return SqliteCheckpointSaver(CHECKPOINT_PATH, ttl=CHECKPOINT_TTL)
+
+
+def build_graph(search_only: bool = False, checkpointer=None) -> StateGraph:
     """
     Builds and compiles the state graph for the AI agent.
 
+    Args:
+        search_only: Stop after extract, before any LLM call (used by the watchlist
+            to check whether anything changed first).
+        checkpointer: Saves the state after every step, so a run can resume.
+
     Returns:
         StateGraph: The compiled state graph.
     """
     builder = StateGraph(AgentState)
-    builder.add_node("start", start_node)
+    builder.add_node("start", instrument_node("start", start_node))
     
-    builder.add_node("amazon",  amazon_node)
-    builder.add_node("bestbuy", bestbuy_node)
-    builder.add_node("walmart", walmart_node)
-    builder.add_node("coordinator", coordinate_node)
-    builder.add_node("compare", compare_node)
-    builder.add_node("summarize", summarize_node)
+    retailers = get_retailers()
+    for retailer in retailers:
+        builder.add_node(
+            retailer.key, instrument_node(retailer.key, make_retailer_node(retailer))
+        )
+    builder.add_node("coordinator", instrument_node("coordinator", coordinate_node))
+    builder.add_node("match", instrument_node("match", match_node))
+    builder.add_node("extract", instrument_node("extract", extract_node))
+    if not search_only:
+        builder.add_node("compare", instrument_node("compare", compare_node))
+        builder.add_node("history", instrument_node("history", history_node))
+        builder.add_node("summarize", instrument_node("summarize", summarize_node))
     
     builder.set_entry_point("start")
     
@@ -49,14 +100,10 @@ def build_graph() -> StateGraph:
     # )
     
     
-    builder.add_edge("start", "amazon")
-    builder.add_edge("start", "bestbuy")
-    builder.add_edge("start", "walmart")
-    
-    # Connect to coordinator
-    builder.add_edge("amazon", "coordinator")
-    builder.add_edge("bestbuy", "coordinator")
-    builder.add_edge("walmart", "coordinator")
+    # Fan out to every registered retailer and join at the coordinator
+    for retailer in retailers:
+        builder.add_edge("start", retailer.key)
+        builder.add_edge(retailer.key, "coordinator")
     
     # builder.add_conditional_edges(
     #     "coordinator",
@@ -67,37 +114,275 @@ def build_graph() -> StateGraph:
     #     }
     # )
     
-    builder.add_edge("coordinator", "compare")
+    builder.add_edge("coordinator", "match")
+    builder.add_edge("match", "extract")
+    if search_only:
+        builder.add_edge("extract", END)
+        return builder.compile(checkpointer=checkpointer)
+    builder.add_edge("extract", "compare")
 
-    builder.add_edge("compare", "summarize")
+    builder.add_edge("compare", "history")
+    builder.add_edge("history", "summarize")
     #builder.add_edge("summarize", END)
     # builder.add_node("end", lambda x: x)
     
     # Add edge to end
     builder.add_edge("summarize", END)
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
 
 
 
-compiled_graph = build_graph()
-# display(Image(compiled_graph.get_graph().draw_mermaid_png()))
+@lru_cache(maxsize=None)
+def get_compiled_graph(search_only: bool = False, checkpointed: bool = False):
+    """
+    Returns the compiled graph, building it on first use and reusing it afterwards
+    (including across Streamlit reruns, which keep imported modules).
 
+    Runs without a run id use the graph without a checkpointer, which skips
+    serializing the state after every step.
+    """
+    return build_graph(search_only, get_checkpointer() if checkpointed else None)
 
-    
-def run_graph(user_input: str) -> AgentState:
-    initial_state = AgentState(
-       # comparison_results=[],
-        # top_results=[],          # Initialize as empty list
-        # amazon_results=[],      # Initialize as empty lists
-        # bestbuy_results=[],
-        # walmart_results=[],
-        # tasks=[user_input],     # Initialize 'tasks' as a list with the user input
-        # summary=[],
-        # next_steps=["start"]
-        # aggregator=[{"user input": user_input}],
-        aggregator=[{"user input": user_input}],
-        query=user_input
+
+
+def _flight_key(
+    user_input: str, use_llm_cache: bool, deadline: float, run_id: str = None
+) -> tuple:
+    return normalize_query(user_input), use_llm_cache, deadline, run_id
+
+
+def _initial_state(user_input: str, use_llm_cache: bool, deadline: float,
+                   use_search_cache: bool = True) -> AgentState:
+    return AgentState(
+        query=user_input,
+        llm_cache=use_llm_cache,
+        search_cache=use_search_cache,
+        deadline=time.time() + deadline if deadline else None,
+        retailer_results={},
+        retailer_status={}
     )
-    # ... your graph invocation logic ...
-    final_state = compiled_graph.invoke(initial_state)
-    return final_state
\ No newline at end of file
+
+
+async def _prepare_run(
+    user_input: str, use_llm_cache: bool, deadline: float, run_id: str
+):
+    """
+    Returns (graph, input, config, snapshot) for a run. Without a run id, or with
+    checkpointing disabled, the run starts from scratch. With one, an unfinished
+    earlier run under that id continues after its last completed step (input None),
+    and snapshot holds that run's latest state.
+    """
+    if run_id is None or get_checkpointer() is None:
+        return (
+            get_compiled_graph(),
+            _initial_state(user_input, use_llm_cache, deadline),
+            None,
+            None,
+        )
+    graph = get_compiled_graph(checkpointed=True)
+    config = {"configurable": {"thread_id": run_id}}
+    snapshot = await graph.aget_state(config)
+    if not snapshot.values:
+        return graph, _initial_state(user_input, use_llm_cache, deadline), config, None
+    if snapshot.next:
+        # Searches still pending get a fresh deadline instead of the first attempt's
+        config["configurable"]["deadline"] = (
+            time.time() + deadline if deadline else None
+        )
+        logger.info(f"Resuming run {run_id} at {', '.join(snapshot.next)}")
+    metrics.inc("graph_resumed_total", finished=str(not snapshot.next).lower())
+    return graph, None, config, snapshot
+
+
+async def _cached_run(user_input: str, use_llm_cache: bool) -> AgentState | None:
+    """
+    Final state of a recent run of a near-duplicate query, when the semantic query cache
+    is on.
+    """
+    if not (SEMANTIC_CACHE_ENABLED and use_llm_cache):
+        return None
+    try:
+        return await asyncio.to_thread(cached_run, user_input)
+    except Exception as e:
+        logger.error(f"Semantic query cache lookup failed: {e}")
+        return None
+
+
+async def _remember_run(user_input: str, final_state: AgentState):
+    if not SEMANTIC_CACHE_ENABLED:
+        return
+    try:
+        await asyncio.to_thread(remember_run, user_input, final_state)
+    except Exception as e:
+        logger.error(f"Storing the run in the semantic query cache failed: {e}")
+
+
+def _replay_state(final_state: AgentState):
+    """Update events reproducing a finished run that is served from the query cache."""
+    retailer_results = final_state.get("retailer_results", {})
+    for key, status in final_state.get("retailer_status", {}).items():
+        yield (
+            "update",
+            key,
+            {
+                "retailer_results": {key: retailer_results.get(key, [])},
+                "retailer_status": {key: status},
+            },
+        )
+    yield "update", "compare", {"top_result": final_state.get("top_result")}
+    yield "update", "history", {"price_history": final_state.get("price_history", {})}
+    yield "update", "summarize", {"summary": final_state.get("summary", "")}
+
+
+async def arun_graph(
+    user_input: str,
+    use_llm_cache: bool = True,
+    deadline: float = REQUEST_DEADLINE,
+    run_id: str = None,
+) -> AgentState:
+    """
+    Runs the comparison graph asynchronously so the retailer searches fan out at once.
+    The summary in the result is the template one; graph.summary writes an LLM one
+    on request.
+
+    Concurrent calls for the same normalized query share one run and receive
+    the same final state, which callers must not modify.
+
+    Args:
+        user_input: The product query.
+        use_llm_cache: Set to False to bypass cached compare responses.
+        deadline: Seconds to wait for retailer searches before comparing the ones
+            that answered; the others are marked in retailer_status. 0 waits for all.
+        run_id: Checkpoints the run under this id. Calling again with the same id
+            after a failure resumes after the last completed node, and returns the
+            stored result if the run already finished.
+
+    With SEMANTIC_CACHE_ENABLED, a recent run of a near-duplicate query (e.g. a
+    different spelling) is returned instead, unless use_llm_cache is False.
+    """
+    cached = await _cached_run(user_input, use_llm_cache)
+    if cached is not None:
+        return cached
+
+    async def run():
+        graph, graph_input, config, snapshot = await _prepare_run(
+            user_input, use_llm_cache, deadline, run_id
+        )
+        if snapshot is not None and not snapshot.next:
+            return snapshot.values
+        final_state = await graph.ainvoke(graph_input, config)
+        await _remember_run(user_input, final_state)
+        return final_state
+
+    if not SINGLEFLIGHT_ENABLED:
+        return await run()
+    return await graph_flight.do(
+        _flight_key(user_input, use_llm_cache, deadline, run_id), run
+    )
+
+
+async def asearch_graph(user_input: str, deadline: float = REQUEST_DEADLINE,
+                        use_search_cache: bool = True) -> AgentState:
+    """
+    Runs only the search half of the graph, up to and including extract, without
+    any LLM call. use_search_cache=False searches every retailer live.
+    """
+    initial_state = _initial_state(user_input, True, deadline, use_search_cache)
+    return await get_compiled_graph(search_only=True).ainvoke(initial_state)
+
+
+def run_graph(
+    user_input: str,
+    use_llm_cache: bool = True,
+    deadline: float = REQUEST_DEADLINE,
+    run_id: str = None,
+) -> AgentState:
+    """
+    Blocking wrapper around arun_graph for synchronous callers; threads asking for
+    the same query at the same time wait for a single run.
+    """
+    def run():
+        return run_sync(arun_graph(user_input, use_llm_cache, deadline, run_id))
+
+    if not SINGLEFLIGHT_ENABLED:
+        return run()
+    return sync_graph_flight.do(
+        _flight_key(user_input, use_llm_cache, deadline, run_id), run
+    )
+
+
+async def astream_graph(
+    user_input: str,
+    use_llm_cache: bool = True,
+    deadline: float = REQUEST_DEADLINE,
+    run_id: str = None,
+):
+    """
+    Runs the comparison graph and yields progress as it happens. A caller
+    streaming a query that is already streaming joins that run and first
+    receives the events produced so far. With a run_id, the updates of nodes
+    an earlier attempt already completed are replayed from its checkpoints first.
+    A run served from the semantic query cache is replayed as one update per node.
+
+    Yields:
+        tuple: ("update", node, update) when a node finishes, with the state
+        update it returned, or ("token", node, text) for each chunk the model
+        streams while that node is running.
+    """
+    async def events():
+        cached = await _cached_run(user_input, use_llm_cache)
+        if cached is not None:
+            for event in _replay_state(cached):
+                yield event
+            return
+        final_state = {}
+        graph, graph_input, config, snapshot = await _prepare_run(
+            user_input, use_llm_cache, deadline, run_id
+        )
+        if snapshot is not None:
+            final_state = dict(snapshot.values)
+            history = [state async for state in graph.aget_state_history(config)]
+            for state in reversed(history):
+                for node, update in (state.metadata.get("writes") or {}).items():
+                    if node != "__start__":
+                        yield "update", node, update
+        async for mode, chunk in graph.astream(
+            graph_input, config, stream_mode=["updates", "messages"]
+        ):
+            if mode == "updates":
+                for node, update in chunk.items():
+                    for key, value in (update or {}).items():
+                        # Mirrors the merge_dicts reducers of the keyed channels
+                        final_state[key] = (
+                            {**final_state.get(key, {}), **value}
+                            if key in ("retailer_results", "retailer_status")
+                            else value
+                        )
+                    yield "update", node, update
+            else:
+                message, metadata = chunk
+                if message.content:
+                    yield "token", metadata.get("langgraph_node"), message.content
+        if final_state.get("top_result") is not None:
+            await _remember_run(user_input, final_state)
+
+    if not SINGLEFLIGHT_ENABLED:
+        source = events()
+    else:
+        source = stream_flight.stream(
+            _flight_key(user_input, use_llm_cache, deadline, run_id), events
+        )
+    async for event in source:
+        yield event
+
+
+def stream_graph(
+    user_input: str,
+    use_llm_cache: bool = True,
+    deadline: float = REQUEST_DEADLINE,
+    run_id: str = None,
+):
+    """
+    Blocking iterator over astream_graph events, for synchronous callers like Streamlit.
+    """
+    return iterate_sync(astream_graph(user_input, use_llm_cache, deadline, run_id))
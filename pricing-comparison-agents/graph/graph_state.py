@@ -1,25 +1,41 @@
-from typing import TypedDict
-from typing import Annotated, List, TypedDict, Dict
-import operator
+from typing import Annotated, Dict, List, TypedDict
+
 
 class Retailer(TypedDict):
     name: str 
     price: str 
     availability: bool
+    confidence: float  # 0-1, how sure the local extractor is of price/availability
 
 class ComparedProducts(TypedDict):
+    key: str  # MatchedProduct key, identifies the product in the price history
     title: str
     image: str
     rating : str 
+    url: str
     retailers: list[Retailer]
+    confidence: float  # lowest confidence among the retailer offers
 
 class Product(TypedDict):
     title : str
     url : str
     image: str
     content: str
+    retailer: str  # display name of the retailer the hit came from
+
+class MatchedProduct(TypedDict):
+    key: str  # normalized title tokens, stable across runs
+    title: str
+    image: str
+    url: str
+    listings: list[Product]  # the same product as listed by each retailer
     
 
+def merge_dicts(left: dict, right: dict) -> dict:
+    """Reducer for keyed channels written by parallel branches."""
+    return {**(left or {}), **(right or {})}
+
+
 class AgentState(TypedDict):
     # comparison_results: Annotated[List[dict], "merge"]
     # top_results: Annotated[list, operator.add]
@@ -29,9 +45,25 @@ class AgentState(TypedDict):
     # tasks:  Annotated[list, operator.add]  # Changed from 'task: str' to 'tasks: List[str]'
     # summary :  Annotated[list, operator.add]
     # next_steps=[]
-    # aggregator: Annotated[list[tuple[str, list]], operator.add]
-    aggregator: Annotated[List[Dict[str, List]], operator.add]
     query: str
+    llm_cache: bool  # False skips the LLM response cache lookup for this run
+    search_cache: bool  # False searches every retailer live for this run
+    # Epoch seconds by which retailer searches must answer, unset waits for all
+    deadline: float
+    # Each retailer node writes its own key, so branches merge in any completion order
+    retailer_results: Annotated[Dict[str, List[Product]], merge_dicts]
+    # "ok", "late", "failed" or "skipped" per retailer
+    retailer_status: Annotated[Dict[str, str], merge_dicts]
+    compare_results: List[Product]
+    matched_products: List[MatchedProduct]
+    extracted_products: List[ComparedProducts]
+    unresolved_results: List[MatchedProduct]
+    top_result: dict
+    prompt_stats: dict  # compare prompt token counts, see graph/prompt_budget.py
+    price_history: (
+        dict  # product key -> retailer -> price stats over the history window
+    )
+    summary: str
     
     
     
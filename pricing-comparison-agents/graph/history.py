@@ -0,0 +1,70 @@
+import time
+from functools import lru_cache
+
+from config.settings import PRICE_HISTORY_PATH
+from utils.price_history import PriceHistory
+
+from .extraction import parse_amount
+from .graph_state import ComparedProducts
+from .matching import normalize_title, product_key
+
+
+@lru_cache(maxsize=None)
+def get_price_history() -> PriceHistory:
+    """Returns the process-wide price history, opening its files on first use."""
+    return PriceHistory(PRICE_HISTORY_PATH)
+
+
+def parse_stored_price(price) -> float | None:
+    return parse_amount(str(price))
+
+
+def product_history_key(product: ComparedProducts) -> str:
+    # Products the LLM compared come back without the MatchedProduct key
+    return product.get("key") or product_key(normalize_title(product.get("title", "")))
+
+
+def record_comparison(
+    history: PriceHistory, products: list[ComparedProducts], timestamp: float = None
+):
+    """Appends one observation per product and retailer offer of a comparison."""
+    history.append(
+        [
+            (
+                product_history_key(product),
+                offer.get("name", ""),
+                parse_stored_price(offer.get("price", "")),
+                bool(offer.get("availability")),
+            )
+            for product in products
+            for offer in product.get("retailers", [])
+        ],
+        timestamp,
+    )
+
+
+def price_stats(
+    history: PriceHistory, products: list[ComparedProducts], window_days: float
+) -> dict:
+    """
+    Price range of every compared offer over the last window_days, with
+    is_lowest set when the current price matches the window minimum.
+
+    Returns:
+        dict: product key -> retailer name ->
+        {"count", "min", "max", "p50", "is_lowest"}.
+    """
+    offers = {
+        (product_history_key(product), offer.get("name", "")): parse_stored_price(
+            offer.get("price", "")
+        )
+        for product in products
+        for offer in product.get("retailers", [])
+    }
+    stats = history.window_stats(list(offers), since=time.time() - window_days * 86400)
+    result = {}
+    for (key, retailer), window in stats.items():
+        current = offers[(key, retailer)]
+        window["is_lowest"] = current is not None and current <= window["min"]
+        result.setdefault(key, {})[retailer] = window
+    return result
@@ -0,0 +1,345 @@
+import hashlib
+import json
+from functools import lru_cache
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from config.settings import (
+    LLM_BATCH_ENABLED,
+    LLM_BATCH_MAX_SIZE,
+    LLM_BATCH_MAX_WAIT,
+    LLM_BATCH_PACK_TOKENS,
+    LLM_CACHE_DISK_SIZE,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MEMORY_SIZE,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    get_chat_model,
+    logger,
+)
+from utils.batcher import MicroBatcher
+from utils.cache import LRUCache, SqliteCache, TieredCache
+from utils.metrics import SIZE_BUCKETS, metrics, span
+
+from .prompt_budget import count_tokens
+from .prompts import create_packed_prompt
+
+_model_override = None
+_batching = LLM_BATCH_ENABLED
+
+
+def set_model(chat_model):
+    """
+    Replaces the chat model used by the graph, e.g. with a local stand-in; None restores
+    the default.
+    """
+    global _model_override
+    _model_override = chat_model
+
+
+def get_model():
+    return _model_override if _model_override is not None else get_chat_model()
+
+
+def set_batching(enabled: bool):
+    """Turns batching of concurrent compare calls on or off, e.g. for a batch sweep."""
+    global _batching
+    _batching = enabled
+
+
+def parse_json_content(content: str):
+    """Parses a JSON answer, which sometimes comes wrapped in a markdown code fence."""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        content = content.strip()
+        if not content.startswith("```"):
+            raise
+        return json.loads("\n".join(content.split("\n")[1:-1]))
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache() -> TieredCache:
+    """
+    Returns the process-wide LLM response cache, opening the SQLite tier on first use.
+    """
+    disk = SqliteCache(
+        LLM_CACHE_PATH, max_entries=LLM_CACHE_DISK_SIZE, table="llm_responses"
+    )
+    return TieredCache(LRUCache(LLM_CACHE_MEMORY_SIZE), disk)
+
+
+def llm_cache_key(model_name: str, messages: list[BaseMessage]) -> str:
+    """
+    Content address of a prompt: the model name plus every message's role and text.
+    """
+    raw = json.dumps(
+        [model_name, [[message.type, message.content] for message in messages]]
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _record_usage(model_name: str, response) -> tuple[int, int]:
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens, completion_tokens = (
+        usage.get("input_tokens", 0),
+        usage.get("output_tokens", 0),
+    )
+    metrics.inc("llm_prompt_tokens_total", prompt_tokens, model=model_name)
+    metrics.inc("llm_completion_tokens_total", completion_tokens, model=model_name)
+    return prompt_tokens, completion_tokens
+
+
+def _call_model(chat_model, messages: list[BaseMessage]) -> AIMessage:
+    """model.invoke inside an "llm" span, recording prompt size and token usage."""
+    model_name = getattr(chat_model, "model_name", type(chat_model).__name__)
+    prompt_chars = sum(len(message.content) for message in messages)
+    metrics.observe(
+        "llm_prompt_chars", prompt_chars, buckets=SIZE_BUCKETS, model=model_name
+    )
+    with span("llm", model=model_name) as current:
+        response = chat_model.invoke(messages)
+        prompt_tokens, completion_tokens = _record_usage(model_name, response)
+        current.set(
+            prompt_chars=prompt_chars,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+    return response
+
+
+def _call_model_batch(chat_model, requests: list[list[BaseMessage]]) -> list:
+    """
+    Sends several prompts at once with model.batch inside an "llm_batch" span.
+    Returns a response or an exception per prompt.
+    """
+    if len(requests) == 1 or not hasattr(chat_model, "batch"):
+        responses = []
+        for messages in requests:
+            try:
+                responses.append(_call_model(chat_model, messages))
+            except Exception as e:
+                responses.append(e)
+        return responses
+
+    model_name = getattr(chat_model, "model_name", type(chat_model).__name__)
+    for messages in requests:
+        metrics.observe(
+            "llm_prompt_chars",
+            sum(len(message.content) for message in messages),
+            buckets=SIZE_BUCKETS,
+            model=model_name,
+        )
+    with span("llm_batch", model=model_name) as current:
+        responses = chat_model.batch(requests, return_exceptions=True)
+        usage = [
+            _record_usage(model_name, response)
+            for response in responses
+            if not isinstance(response, Exception)
+        ]
+        current.set(
+            size=len(requests),
+            prompt_tokens=sum(tokens[0] for tokens in usage),
+            completion_tokens=sum(tokens[1] for tokens in usage),
+        )
+    return responses
+
+
+def _pack(batch: list[list[BaseMessage]]) -> list[list[int]]:
+    """
+    Groups batch positions into requests: system + user prompts sharing the
+    system prompt are packed together while they fit LLM_BATCH_PACK_TOKENS.
+    """
+    groups, open_groups = [], {}
+    for index, messages in enumerate(batch):
+        packable = (
+            LLM_BATCH_PACK_TOKENS > 0
+            and len(messages) == 2
+            and isinstance(messages[0], SystemMessage)
+            and isinstance(messages[1], HumanMessage)
+        )
+        if not packable:
+            groups.append([index])
+            continue
+        tokens = count_tokens(messages[1].content)
+        current = open_groups.get(messages[0].content)
+        if current is None or current[1] + tokens > LLM_BATCH_PACK_TOKENS:
+            current = open_groups[messages[0].content] = [[], 0]
+            groups.append(current[0])
+        current[0].append(index)
+        current[1] += tokens
+    return groups
+
+
+def _unpack(response, size: int) -> dict:
+    """
+    Answers of a packed request by request number, as JSON text; missing or malformed
+    ones are left out.
+    """
+    if isinstance(response, Exception):
+        return {}
+    try:
+        results = parse_json_content(response.content).get("results", [])
+    except (ValueError, AttributeError):
+        return {}
+    answers = {}
+    for result in results:
+        if (
+            isinstance(result, dict)
+            and isinstance(result.get("response"), dict)
+            and result.get("id") in range(size)
+        ):
+            answers[result["id"]] = json.dumps(result["response"])
+    return answers
+
+
+def _answer_batch(batch: list[list[BaseMessage]]) -> list:
+    """
+    MicroBatcher handler: answers the queued prompts with as few model requests as
+    possible.
+    """
+    chat_model = get_model()
+    groups = _pack(batch)
+    requests = []
+    for group in groups:
+        if len(group) == 1:
+            requests.append(batch[group[0]])
+        else:
+            system_prompt, user_prompt = create_packed_prompt(
+                batch[group[0]][0].content, [batch[index][1].content for index in group]
+            )
+            requests.append(
+                [
+                    SystemMessage(content=system_prompt),
+                    HumanMessage(content=user_prompt),
+                ]
+            )
+    metrics.inc("llm_batch_requests_total", len(requests))
+
+    results, retry = [None] * len(batch), []
+    for group, response in zip(
+        groups, _call_model_batch(chat_model, requests), strict=True
+    ):
+        if len(group) == 1:
+            results[group[0]] = response
+            continue
+        answers = _unpack(response, len(group))
+        metrics.inc("llm_packed_total", len(answers), result="answered")
+        for number, index in enumerate(group):
+            if number in answers:
+                results[index] = AIMessage(content=answers[number])
+            else:
+                retry.append(index)
+    if retry:
+        # Whatever the packed answer dropped is asked again on its own
+        metrics.inc("llm_packed_total", len(retry), result="retried")
+        logger.warning(
+            f"{len(retry)} packed prompts unanswered, sending them separately"
+        )
+        for index, response in zip(
+            retry,
+            _call_model_batch(chat_model, [batch[index] for index in retry]),
+            strict=True,
+        ):
+            results[index] = response
+    return results
+
+
+@lru_cache(maxsize=None)
+def get_model_batcher() -> MicroBatcher:
+    """Returns the process-wide batcher of concurrent model calls."""
+    return MicroBatcher("llm", _answer_batch, LLM_BATCH_MAX_SIZE, LLM_BATCH_MAX_WAIT)
+
+
+def _send(chat_model, messages: list[BaseMessage], batched: bool) -> AIMessage:
+    if batched and _batching:
+        return get_model_batcher().submit(messages)
+    return _call_model(chat_model, messages)
+
+
+def invoke_model(
+    messages: list[BaseMessage], use_cache: bool = True, batched: bool = False
+) -> AIMessage:
+    """
+    Calls the chat model, serving identical prompts from the response cache.
+
+    Args:
+        messages: The prompt messages.
+        use_cache: Set to False to always call the model (the fresh answer is still
+            cached).
+        batched: Allow the call to be sent together with concurrent ones when
+            batching is on. It waits up to LLM_BATCH_MAX_WAIT seconds for company.
+
+    Returns:
+        AIMessage: The model response.
+    """
+    chat_model = get_model()
+    if not LLM_CACHE_ENABLED:
+        return _send(chat_model, messages, batched)
+
+    cache = get_llm_cache()
+    key = llm_cache_key(chat_model.model_name, messages)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.inc("llm_cache_total", result="hit")
+            return AIMessage(content=cached)
+    metrics.inc("llm_cache_total", result="miss")
+
+    response = _send(chat_model, messages, batched)
+    cache.set(key, response.content, ttl=LLM_CACHE_TTL)
+    return response
+
+
+async def astream_model(messages: list[BaseMessage], use_cache: bool = True):
+    """
+    Calls the chat model through model.astream, yielding the answer's text as it
+    is written. A cached answer comes back as a single chunk, and a streamed one
+    is cached once it is complete.
+
+    Args:
+        messages: The prompt messages.
+        use_cache: Set to False to always call the model (the fresh answer is still
+            cached).
+    """
+    chat_model = get_model()
+    model_name = getattr(chat_model, "model_name", type(chat_model).__name__)
+    cache = get_llm_cache() if LLM_CACHE_ENABLED else None
+    key = llm_cache_key(model_name, messages)
+    if cache is not None and use_cache:
+        cached = await cache.aget(key)
+        if cached is not None:
+            metrics.inc("llm_cache_total", result="hit")
+            yield cached
+            return
+    if cache is not None:
+        metrics.inc("llm_cache_total", result="miss")
+
+    prompt_chars = sum(len(message.content) for message in messages)
+    metrics.observe(
+        "llm_prompt_chars", prompt_chars, buckets=SIZE_BUCKETS, model=model_name
+    )
+    chunks, prompt_tokens, completion_tokens = [], 0, 0
+    with span("llm", model=model_name) as current:
+        async for chunk in chat_model.astream(messages):
+            usage = getattr(chunk, "usage_metadata", None) or {}
+            prompt_tokens += usage.get("input_tokens", 0)
+            completion_tokens += usage.get("output_tokens", 0)
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        current.set(
+            prompt_chars=prompt_chars,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+    metrics.inc("llm_prompt_tokens_total", prompt_tokens, model=model_name)
+    metrics.inc("llm_completion_tokens_total", completion_tokens, model=model_name)
+    if cache is not None:
+        await cache.aset(key, "".join(chunks), ttl=LLM_CACHE_TTL)
+
+
+def forget_model_response(messages: list[BaseMessage]):
+    """Drops a cached response, e.g. one that turned out to be unparseable."""
+    if LLM_CACHE_ENABLED:
+        get_llm_cache().delete(llm_cache_key(get_model().model_name, messages))
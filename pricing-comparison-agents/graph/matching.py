@@ -0,0 +1,262 @@
+import re
+
+import numpy as np
+
+from utils.helper import clean_product_title
+
+from .graph_state import MatchedProduct, Product
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+CAPACITY_RE = re.compile(r"\b(\d+(?:\.\d+)?)\s?(tb|gb|mb|mah|oz|ml|qt|inch)(?![a-z])")
+COLOURS = {
+    "black",
+    "white",
+    "silver",
+    "gray",
+    "grey",
+    "gold",
+    "blue",
+    "red",
+    "green",
+    "pink",
+    "purple",
+    "yellow",
+    "orange",
+    "graphite",
+    "midnight",
+    "starlight",
+    "titanium",
+    "rose",
+    "navy",
+    "beige",
+}
+# Words naming another model of the same line: "iPhone 15" is not "iPhone 15 Pro"
+VARIANT_WORDS = {
+    "pro",
+    "max",
+    "plus",
+    "mini",
+    "ultra",
+    "lite",
+    "air",
+    "se",
+    "fe",
+    "xl",
+    "xs",
+    "slim",
+    "note",
+    "fold",
+    "flip",
+}
+STOP_WORDS = {
+    "the",
+    "a",
+    "an",
+    "and",
+    "with",
+    "for",
+    "of",
+    "in",
+    "on",
+    "by",
+    "to",
+    "new",
+    "brand",
+    "buy",
+    "amazon",
+    "com",
+    "walmart",
+    "best",
+    "bestbuy",
+    "shop",
+    "online",
+    "free",
+    "shipping",
+}
+
+# Weights of the similarity score; listings at or above MATCH_THRESHOLD are the same
+# product
+MODEL_NUMBER_BONUS = 0.35
+COLOUR_CONFLICT_PENALTY = 0.25
+MATCH_THRESHOLD = 0.5
+
+
+def normalize_title(title: str) -> list[str]:
+    # "128 GB" and "128GB" become the same "128gb" token
+    text = CAPACITY_RE.sub(
+        lambda m: m.group(1) + m.group(2), clean_product_title(title).lower()
+    )
+    return [token for token in TOKEN_RE.findall(text) if token not in STOP_WORDS]
+
+
+def normalize_titles(titles: list[str]) -> list[list[str]]:
+    """Cleans a batch of whole titles and splits them into match tokens."""
+    return [normalize_title(title) for title in titles]
+
+
+def product_key(tokens: list[str]) -> str:
+    """
+    Stable identity of a product across runs: its sorted, de-duplicated title tokens.
+    """
+    return " ".join(sorted(set(tokens)))
+
+
+def is_model_number(token: str) -> bool:
+    # Mixes letters and digits and isn't a plain capacity like "128gb"
+    return (
+        len(token) >= 4
+        and any(c.isdigit() for c in token)
+        and any(c.isalpha() for c in token)
+        and not CAPACITY_RE.fullmatch(token)
+    )
+
+
+def is_number_word(token: str) -> bool:
+    # "15", "256gb", "4k": a generation, size or capacity, unlike a model number
+    return any(c.isdigit() for c in token) and not is_model_number(token)
+
+
+def _incidence(token_sets: list[set[str]]) -> np.ndarray:
+    """Binary listing x vocabulary matrix for a batch of token sets."""
+    vocabulary = {}
+    rows, cols = [], []
+    for row, tokens in enumerate(token_sets):
+        for token in tokens:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+    matrix = np.zeros((len(token_sets), max(len(vocabulary), 1)), dtype=np.float32)
+    matrix[rows, cols] = 1.0
+    return matrix
+
+
+def _differs(values: list[set[str]]) -> np.ndarray:
+    """
+    True where two listings don't state exactly the same values, including one stating
+    none.
+    """
+    matrix = _incidence(values)
+    shared = matrix @ matrix.T
+    sizes = matrix.sum(axis=1)
+    return ~((shared == sizes[:, None]) & (shared == sizes[None, :]))
+
+
+def _conflicts(values: list[set[str]]) -> np.ndarray:
+    """True where both listings state the attribute and share no value for it."""
+    matrix = _incidence(values)
+    present = matrix.any(axis=1)
+    shared = (matrix @ matrix.T) > 0
+    return present[:, None] & present[None, :] & ~shared
+
+
+def similarity_matrix(token_lists: list[list[str]]) -> np.ndarray:
+    """
+    Pairwise similarity of normalized titles.
+
+    Token-set Jaccard overlap, boosted when the titles share a model number,
+    penalized when they state different colours, and zeroed when their variant
+    words ("pro", "max") or number words ("15", "256gb") differ at all.
+    """
+    token_sets = [set(tokens) for tokens in token_lists]
+    tokens = _incidence(token_sets)
+    intersection = tokens @ tokens.T
+    sizes = tokens.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - intersection
+    scores = np.divide(
+        intersection, union, out=np.zeros_like(intersection), where=union > 0
+    )
+
+    model_numbers = [
+        {token for token in token_set if is_model_number(token)}
+        for token_set in token_sets
+    ]
+    model_matrix = _incidence(model_numbers)
+    scores += MODEL_NUMBER_BONUS * ((model_matrix @ model_matrix.T) > 0)
+
+    colours = [token_set & COLOURS for token_set in token_sets]
+    scores -= COLOUR_CONFLICT_PENALTY * _conflicts(colours)
+    numbers = [
+        {token for token in token_set if is_number_word(token)}
+        for token_set in token_sets
+    ]
+    variants = [token_set & VARIANT_WORDS for token_set in token_sets]
+    scores[_differs(numbers) | _differs(variants)] = 0.0
+    return scores
+
+
+def _cluster(scores: np.ndarray, threshold: float) -> list[list[int]]:
+    """
+    Complete-link grouping: pairs are merged best first, and two clusters only
+    join when every listing of one matches every listing of the other, so a
+    cluster can't chain through a single similar pair.
+    """
+    clusters = {i: [i] for i in range(len(scores))}
+    owner = list(range(len(scores)))
+    rows, cols = np.nonzero(np.triu(scores >= threshold, k=1))
+    pairs = zip(rows.tolist(), cols.tolist(), strict=True)
+    for i, j in sorted(pairs, key=lambda pair: -scores[pair]):
+        a, b = owner[i], owner[j]
+        if a == b or scores[np.ix_(clusters[a], clusters[b])].min() < threshold:
+            continue
+        for member in clusters[b]:
+            owner[member] = a
+        clusters[a] = sorted(clusters[a] + clusters.pop(b))
+    return sorted(clusters.values())
+
+
+def match_listings(
+    listings: list[Product], threshold: float = MATCH_THRESHOLD
+) -> list[MatchedProduct]:
+    """
+    Clusters search hits from different retailers that describe the same product.
+
+    Returns:
+        list: One MatchedProduct per cluster, in order of first appearance.
+    """
+    if not listings:
+        return []
+    token_lists = normalize_titles([listing["title"] for listing in listings])
+    scores = similarity_matrix(token_lists)
+
+    matched = []
+    for members in _cluster(scores, threshold):
+        cluster = [listings[i] for i in members]
+        # The most descriptive title names the product; the first real image represents
+        # it
+        best = max(members, key=lambda i: len(token_lists[i]))
+        image = next(
+            (
+                listing["image"]
+                for listing in cluster
+                if listing.get("image") and "placeholder" not in listing["image"]
+            ),
+            cluster[0].get("image", ""),
+        )
+        matched.append(
+            MatchedProduct(
+                key=product_key(token_lists[best]),
+                title=listings[best]["title"],
+                image=image,
+                url=listings[best]["url"],
+                listings=cluster,
+            )
+        )
+    return matched
+
+
+def compact_product(matched: MatchedProduct) -> dict:
+    """
+    One record per matched product for the compare prompt, instead of every raw hit.
+    """
+    return {
+        "title": matched["title"],
+        "image": matched["image"],
+        "url": matched["url"],
+        "offers": [
+            {
+                "retailer": listing.get("retailer", ""),
+                "url": listing["url"],
+                "content": listing["content"],
+            }
+            for listing in matched["listings"]
+        ],
+    }
@@ -1,115 +1,146 @@
-from utils.helper import get_english_product_name
-from .prompts import ( create_compare_prompt, create_summary_prompt)
-from langchain_core.messages import (SystemMessage, HumanMessage)
-from config.settings import model, tavily, logger
-from .graph_state import AgentState
-import logging
 
+from langchain_core.messages import HumanMessage, SystemMessage
 
-def start_node(state: AgentState):
-    print(f"start node")
-    state["aggregator"] = [{"start_msg": "started"}]
-    return state
+from config.settings import (
+    COMPARE_CONTENT_TOKENS,
+    COMPARE_PROMPT_TOKEN_BUDGET,
+    EXTRACTION_CONFIDENCE,
+    LOG_PAYLOADS,
+    PRICE_HISTORY_ENABLED,
+    PRICE_HISTORY_WINDOW_DAYS,
+    logger,
+)
 
+from .extraction import extract_products
+from .graph_state import AgentState
+from .history import get_price_history, price_stats, record_comparison
+from .llm import forget_model_response, invoke_model, parse_json_content
+from .matching import compact_product, match_listings
+from .prompt_budget import build_compare_payload
+from .prompts import create_compare_prompt
+from .retailers.registry import get_retailers
+from .retailers.search import RETAILER_OK
+from .summary import template_summary
 
-def get_value_comprehension(state, key):
-    results = [value for k, value in state["aggregator"] if k == key]
-    if not results:
-        raise KeyError(f"Key '{key}' not found in aggregator.")
-    print("resuklt", results[0])
-    return results[0]  # Return the first occurrence
 
-def get_results(data, key):
-    for entry in data:
-        if key in entry:
-            return entry[key]
-    return None
+def start_node(_state: AgentState):
+    return {"retailer_results": {}, "retailer_status": {}}
 
 
-# Example node implementation
 def coordinate_node(state: AgentState) -> AgentState:
-    """Coordinate and combine results"""
-    print("inside crodinaror")
-    print(f"aggregator {state["aggregator"]}")
-    # Only combine results if all are available
-    # if all(len(state[f"{r}_results"]) > 0 for r in ["amazon", "bestbuy", "walmart"]):
+    """Merge the hits of every registered retailer that reported back"""
+    retailer_results = state.get("retailer_results", {})
+    retailer_status = state.get("retailer_status", {})
     all_results = []
-    # for retailer in ["amazon", "bestbuy", "walmart"]:
-        # result = get_results(state, f"{retailer}_results")
-    amazon_results = state["aggregator"][2]["amazon_results"]
-    all_results.extend(amazon_results)
-    bb_results = state["aggregator"][3]["bestbuy_results"]
-    all_results.extend(bb_results)
-    wal_results = state["aggregator"][4]["walmart_results"]
-    all_results.extend(wal_results)
-   
-    return {"aggregator": [{"compare_results": all_results}]}
+    for retailer in get_retailers():
+        all_results.extend(retailer_results.get(retailer.key, []))
+    missing = {
+        key: status for key, status in retailer_status.items() if status != RETAILER_OK
+    }
+    if missing:
+        logger.warning(f"comparing without {missing}")
+
+    return {"compare_results": all_results}
     
     
 
+def match_node(state: AgentState):
+    """Group listings of the same product across retailers"""
+    listings = state.get("compare_results", [])
+    matched_products = match_listings(listings)
+    logger.info(
+        f"matched {len(listings)} listings into {len(matched_products)} products"
+    )
+    return {"matched_products": matched_products}
+
+
+def extract_node(state: AgentState):
+    """Read prices, availability and ratings out of the snippets without the LLM"""
+    matched_products = state.get("matched_products", [])
+    products, unresolved = extract_products(matched_products, EXTRACTION_CONFIDENCE)
+    logger.info(f"extracted {len(products)} products locally, "
+                f"{len(unresolved)} left for the llm")
+    return {"extracted_products": products, "unresolved_results": unresolved}
+
+
 def compare_node(state:AgentState):
     logger.info("inside compare")
-    print("inside comapre")
-    # top_result = state["top_results"]
-    
-    system_prompt, user_prompt = create_compare_prompt(state["aggregator"][5]["compare_results"])
+    extracted_products = state.get("extracted_products", [])
+    unresolved_results = state.get("unresolved_results", [])
+    retailer_status = state.get("retailer_status", {})
+    if not unresolved_results:
+        # Everything was resolved locally, skip the LLM round trip
+        return {
+            "top_result": {
+                "products": extracted_products,
+                "retailer_status": retailer_status,
+            }
+        }
+
+    payload, prompt_stats = build_compare_payload(
+        [compact_product(matched) for matched in unresolved_results],
+        COMPARE_PROMPT_TOKEN_BUDGET,
+        COMPARE_CONTENT_TOKENS,
+        raw_input=unresolved_results,
+    )
+    logger.info(f"compare prompt stats {prompt_stats}")
+    system_prompt, user_prompt = create_compare_prompt(
+        payload,
+        # Retailers that were late or failed have nothing to compare
+        [
+            retailer.name
+            for retailer in get_retailers()
+            if retailer_status.get(retailer.key, RETAILER_OK) == RETAILER_OK
+        ],
+    )
     messages = [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_prompt)
     ]
     try:
-        response = model.invoke(messages)
-        
-        # Try to parse as JSON directly first
-        import json
-        try:
-            parsed_response = json.loads(response.content)
+        # In a sweep, sent together with the compare calls of concurrent runs
+        response = invoke_model(
+            messages, use_cache=state.get("llm_cache", True), batched=True
+        )
+        parsed_response = parse_json_content(response.content)
+        if LOG_PAYLOADS:
             logger.info(f"parsed_response {parsed_response}")
-        except json.JSONDecodeError:
-            # If direct parsing fails, clean up the response
-            logger.info(f"error in comaprsion {e}")
-            content = response.content
-            content = content.strip()
-            if content.startswith('```'):
-                content = '\n'.join(content.split('\n')[1:-1])
-            parsed_response = json.loads(content)
-            
-        # state["comparison_results"] = parsed_response
-        
     except Exception as e:
-       # print(f"comparison error {e}")
-        logger.error(f"Error {e}")
-        # state["comparison_results"] = {
-        #     "products": [...]  # your fallback structure
-        # }
-    # return {
-    #     **state,
-    #     #"comparison_result": comparison,
-    #     "next_steps": ["process_llm"]
-    # }
-    return {"aggregator": [{"top_result": parsed_response}]}
+        logger.error(f"Error comparing products: {e}")
+        # Don't keep serving an answer we couldn't parse
+        forget_model_response(messages)
+        # Fail the run here; invoked again with the same run id it resumes at compare
+        raise
+    parsed_response["products"] = extracted_products + parsed_response.get(
+        "products", []
+    )
+    parsed_response["retailer_status"] = retailer_status
+    return {"top_result": parsed_response, "prompt_stats": prompt_stats}
 
 
-def summarize_node(state:AgentState):
-    logger.info("inside summary")
-    print("inside crodinaror")
-    results = state["aggregator"][6]["top_result"]
-    system_prompt, user_prompt = create_summary_prompt(results)
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_prompt)
-    ]
+def history_node(state: AgentState):
+    """Record the compared prices and look up how they sit against the recent history"""
+    if not PRICE_HISTORY_ENABLED:
+        return {"price_history": {}}
+    products = state.get("top_result", {}).get("products", [])
     try:
-        response = model.invoke(messages)
-        logger.info(f"summary agent reponse from llm {response}")
+        history = get_price_history()
+        # Look up before recording, so the window holds earlier observations only
+        stats = price_stats(history, products, PRICE_HISTORY_WINDOW_DAYS)
+        record_comparison(history, products)
     except Exception as e:
-        #  print(f"summary error {e}")
-         logger.error(f"Error {e}")
- 
-    # state["summary"] = response.content
-    # return {
-    #     **state,
-    #     #"summary": summary,
-    #     "next_steps": ["end"]
-    # }
-    return {"aggregator": [{"summary": response.content}]}
\ No newline at end of file
+        logger.error(f"Error updating price history {e}")
+        stats = {}
+    return {"price_history": stats}
+
+
+def summarize_node(state:AgentState):
+    """
+    Template summary of the comparison; the LLM one is only written on request, see
+    graph/summary.py
+    """
+    return {
+        "summary": template_summary(
+            state.get("top_result", {}), state.get("price_history")
+        )
+    }
@@ -0,0 +1,131 @@
+import json
+from functools import lru_cache
+
+from config.settings import OPENAI_MODEL, logger
+
+from .extraction import IN_STOCK_RE, OUT_OF_STOCK_RE, PRICE_RE, RATING_RE
+
+# Characters kept on each side of a price/stock/rating mention when trimming content
+CONTEXT_CHARS = 80
+# Rough characters per token when the tiktoken encoding can't be loaded
+CHARS_PER_TOKEN = 4
+# Smallest per-offer content allowance before whole products are dropped
+MIN_CONTENT_TOKENS = 24
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """
+    The tiktoken encoding for OPENAI_MODEL, imported on first use; None when it can't be
+    loaded.
+    """
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(OPENAI_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use, which fails offline
+        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = get_encoding()
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def trim_content(text: str, max_tokens: int) -> str:
+    """
+    Shrinks a snippet to roughly max_tokens, keeping the text around prices,
+    stock wording and ratings and dropping the rest.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    spans = sorted(
+        (
+            max(match.start() - CONTEXT_CHARS, 0),
+            min(match.end() + CONTEXT_CHARS, len(text)),
+        )
+        for pattern in (PRICE_RE, IN_STOCK_RE, OUT_OF_STOCK_RE, RATING_RE)
+        for match in pattern.finditer(text)
+    )
+    if spans:
+        merged = [list(spans[0])]
+        for start, end in spans[1:]:
+            if start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        text = " ... ".join(text[start:end].strip() for start, end in merged)
+    return _truncate_tokens(text, max_tokens)
+
+
+def _serialize(records: list[dict], content_tokens: int) -> str:
+    trimmed = [
+        {
+            **record,
+            "offers": [
+                {**offer, "content": trim_content(offer["content"], content_tokens)}
+                for offer in record.get("offers", [])
+            ],
+        }
+        for record in records
+    ]
+    return json.dumps(trimmed, separators=(",", ":"), ensure_ascii=False)
+
+
+def build_compare_payload(
+    records: list[dict], budget: int, content_tokens: int, raw_input=None
+) -> tuple[str, dict]:
+    """
+    Serializes compare records into at most `budget` tokens.
+
+    Offer content is first capped at content_tokens and the cap is halved until
+    the payload fits; if it still doesn't fit at MIN_CONTENT_TOKENS, trailing
+    products are dropped.
+
+    Args:
+        records: Compact compare records, one per product.
+        budget: Max tokens of the payload.
+        content_tokens: Initial cap on each offer's content.
+        raw_input: What the records were compacted from, as it would have been
+            sent before compaction; raw_tokens and tokens_saved are measured
+            against it. Defaults to the records themselves.
+
+    Returns:
+        tuple: The compact JSON payload and token stats (raw, sent, saved, dropped).
+    """
+    raw_tokens = count_tokens(repr(records if raw_input is None else raw_input))
+    payload = _serialize(records, content_tokens)
+    while count_tokens(payload) > budget and content_tokens > MIN_CONTENT_TOKENS:
+        content_tokens = max(content_tokens // 2, MIN_CONTENT_TOKENS)
+        payload = _serialize(records, content_tokens)
+
+    kept = len(records)
+    while count_tokens(payload) > budget and kept > 1:
+        kept -= 1
+        payload = _serialize(records[:kept], content_tokens)
+
+    tokens = count_tokens(payload)
+    stats = {
+        "raw_tokens": raw_tokens,
+        "prompt_tokens": tokens,
+        "tokens_saved": raw_tokens - tokens,
+        "dropped_products": len(records) - kept,
+    }
+    return payload, stats
@@ -39,11 +39,19 @@ def create_summary_prompt(results) -> str:  # Renamed to match usage
     return system_prompt, user_prompt
 
 
-def create_compare_prompt(search_results:list[str]) -> str:
+def create_compare_prompt(search_results: str, retailer_names: list[str]) -> str:
     system_prompt = """You are a product comparison expert. Act as a precise product data extractor that returns clean JSON data.
     DO NOT add any explanation or markdown formatting."""
 
-    user_prompt = f"""Based on these product search results with images:
+    retailer_entries = ",".join(f"""
+                    {{
+                        "name": "{name}",
+                        "price": "price in XX.XX format",
+                        "availability": true if found in results
+                    }}""" for name in retailer_names)
+
+    user_prompt = f"""Based on these product search results with images, grouped into
+    one record per product with each retailer's offer listed under "offers":
     {search_results}
     
     Return ONLY a JSON object exactly matching this structure:
@@ -54,22 +62,7 @@ def create_compare_prompt(search_results:list[str]) -> str:
                 "image": "Use actual product image URL from search_results, NO placeholder",
                 "rating": 5,
                 "url" :"https://amamzon.com",
-                "retailers": [
-                    {{
-                        "name": "Walmart",
-                        "price": "price in XX.XX format",
-                        "availability": true if found in results
-                    }},
-                    {{
-                        "name": "Best Buy",
-                        "price": "price in XX.XX format",
-                        "availability": true if found in results
-                    }},
-                    {{
-                        "name": "Amazon",
-                        "price": "price in XX.XX format",
-                        "availability": true if found in results
-                    }}
+                "retailers": [{retailer_entries}
                 ]
             }}
         ]
@@ -79,8 +72,34 @@ def create_compare_prompt(search_results:list[str]) -> str:
     - Extract and use actual product images from the search_results
     - NO placeholder images unless absolutely no image found
     - Return raw JSON only, no code blocks or markdown
-    - Always include all three retailers
+    - Always include all {len(retailer_names)} retailers
     - Use consistent price format XX,XX
     """
     return system_prompt, user_prompt
-  
\ No newline at end of file
+
+
+def create_packed_prompt(system_prompt: str, user_prompts: list[str]):
+    """
+    Several requests sharing a system prompt in one message, answered by request
+    number.
+    """
+    system_prompt = (f"{system_prompt}\n"
+                     "    You will receive several independent requests. "
+                     "Answer each one exactly as if it had been sent on its own.")
+
+    requests = "\n\n".join(f"### Request {number}\n{user_prompt}"
+                           for number, user_prompt in enumerate(user_prompts))
+    user_prompt = f"""{requests}
+
+    Return ONLY a JSON object with one answer per request, matching this structure:
+    {{
+        "results": [
+            {{
+                "id": request number,
+                "response": the JSON object that request asks for
+            }}
+        ]
+    }}
+    Return raw JSON only, no code blocks or markdown.
+    """
+    return system_prompt, user_prompt
@@ -0,0 +1,63 @@
+from functools import lru_cache
+
+from config.settings import (
+    SEMANTIC_CACHE_CANDIDATES,
+    SEMANTIC_CACHE_MODEL,
+    SEMANTIC_CACHE_PATH,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+)
+from utils.semantic_cache import SemanticCache
+
+from .graph_state import AgentState
+from .matching import normalize_title
+from .retailers.search import RETAILER_OK, normalize_query
+
+
+def same_numbers(query: str, cached_query: str) -> bool:
+    """
+    Embeddings barely tell "iphone 14" from "iphone 15" or 128gb from 256gb, so a
+    near-duplicate query must carry exactly the same number-bearing tokens.
+    """
+
+    def numbers(text: str) -> set[str]:
+        return {
+            token for token in normalize_title(text) if any(c.isdigit() for c in token)
+        }
+
+    return numbers(query) == numbers(cached_query)
+
+
+@lru_cache(maxsize=None)
+def get_query_cache() -> SemanticCache:
+    """
+    Returns the process-wide near-duplicate query cache; the model loads on first
+    lookup.
+    """
+    return SemanticCache(
+        SEMANTIC_CACHE_PATH,
+        SEMANTIC_CACHE_MODEL,
+        SEMANTIC_CACHE_THRESHOLD,
+        SEMANTIC_CACHE_TTL,
+        candidates=SEMANTIC_CACHE_CANDIDATES,
+        accept=same_numbers,
+        name="queries",
+    )
+
+
+def cached_run(user_input: str) -> AgentState | None:
+    """Final state of a recent run for a near-duplicate query, or None."""
+    return get_query_cache().get(normalize_query(user_input))
+
+
+def remember_run(user_input: str, final_state: AgentState):
+    """
+    Stores a finished run for near-duplicate queries, unless some retailer didn't
+    answer.
+    """
+    if any(
+        status != RETAILER_OK
+        for status in final_state.get("retailer_status", {}).values()
+    ):
+        return
+    get_query_cache().set(normalize_query(user_input), dict(final_state))
@@ -0,0 +1,99 @@
+from functools import lru_cache
+
+from config.settings import (
+    LISTING_INDEX_MAX_AGE,
+    LISTING_INDEX_MIN_COVERAGE,
+    LISTING_INDEX_MIN_HITS,
+    LISTING_INDEX_PATH,
+    LISTING_INDEX_RETENTION,
+)
+from graph.graph_state import Product
+from graph.matching import COLOURS, is_number_word, normalize_title, normalize_titles
+from graph.retailers.registry import RetailerConfig
+from utils.listing_index import ListingIndex
+
+# Words of something sold for a product rather than the product itself
+ACCESSORY_WORDS = {
+    "case",
+    "cover",
+    "sleeve",
+    "skin",
+    "protector",
+    "screen",
+    "glass",
+    "film",
+    "charger",
+    "cable",
+    "adapter",
+    "stand",
+    "mount",
+    "holder",
+    "strap",
+    "band",
+    "dock",
+    "replacement",
+}
+# Index candidates considered per lookup, per result the retailer's search would return
+CANDIDATES_PER_RESULT = 3
+
+
+@lru_cache(maxsize=None)
+def get_listing_index() -> ListingIndex:
+    """Returns the process-wide listing index, loading it from disk on first use."""
+    return ListingIndex(LISTING_INDEX_PATH, retention=LISTING_INDEX_RETENTION)
+
+
+def index_listings(hits: list[Product], retailer: RetailerConfig):
+    """Adds freshly searched hits of a retailer to the listing index."""
+    get_listing_index().add(
+        hits, normalize_titles([hit["title"] for hit in hits]), retailer.key
+    )
+
+
+def covers(
+    query_tokens: set[str],
+    title_tokens: list[str],
+    min_coverage: float = LISTING_INDEX_MIN_COVERAGE,
+) -> bool:
+    """
+    Whether a listing is about the queried product rather than just mentioning
+    it, like "iPhone 15 case" for "iphone 15": it names no accessory the query
+    doesn't, and at least min_coverage of its title words are query words.
+    Colours and number words ("256gb") the query leaves open only pick a
+    variant, so they don't count.
+    """
+    words = {
+        token
+        for token in title_tokens
+        if token in query_tokens or (token not in COLOURS and not is_number_word(token))
+    }
+    if (words & ACCESSORY_WORDS) - query_tokens:
+        return False
+    return not words or len(words & query_tokens) / len(words) >= min_coverage
+
+
+def lookup_listings(query: str, retailer: RetailerConfig) -> list[Product] | None:
+    """
+    Listings of a retailer seen in the last LISTING_INDEX_MAX_AGE seconds whose
+    titles contain every query token and are about the queried product (see
+    covers), or None when there are too few of them to answer the query
+    without searching.
+    """
+    query_tokens = normalize_title(query)
+    matches = get_listing_index().search(
+        query_tokens,
+        retailer.key,
+        retailer.max_results * CANDIDATES_PER_RESULT,
+        LISTING_INDEX_MAX_AGE,
+    )
+    wanted = set(query_tokens)
+    listings = [
+        listing
+        for listing, _ in matches
+        if covers(wanted, normalize_title(listing["title"]))
+    ]
+    if not listings or len(listings) < min(
+        LISTING_INDEX_MIN_HITS, retailer.max_results
+    ):
+        return None
+    return listings[: retailer.max_results]
@@ -0,0 +1,67 @@
+import json
+from dataclasses import dataclass, fields
+
+from config.settings import RETAILERS_FILE, SEARCH_CACHE_TTL, SEARCH_RATE_LIMIT
+
+
+@dataclass(frozen=True)
+class RetailerConfig:
+    key: str  # graph node name and result key prefix
+    name: str  # display name used in the comparison output
+    domain: str
+    max_results: int = 3
+    search_depth: str = "basic"
+    concurrency: int = 4  # max in-flight searches against this domain
+    timeout: float = 20.0  # seconds before the search is abandoned
+    rate_limit: float = SEARCH_RATE_LIMIT  # max searches per second, 0 is unlimited
+    cache_ttl: float = SEARCH_CACHE_TTL  # seconds a cached search stays fresh
+    # Adaptive search: the search above runs first, with images only if cheap_images,
+    # and is escalated to the one below when it returns fewer than min_results hits,
+    # fewer than min_priced hits with a price, or (require_stock_signal) no priced hit
+    # that says whether it is in stock; escalate_images decides whether the escalated
+    # search adds images
+    cheap_images: bool = False
+    min_results: int = 2
+    min_priced: int = 1
+    require_stock_signal: bool = True
+    escalate_search_depth: str = "advanced"
+    escalate_max_results: int = 6
+    escalate_images: bool = True
+
+
+RETAILERS: dict[str, RetailerConfig] = {}
+
+
+def register_retailer(retailer: RetailerConfig) -> RetailerConfig:
+    """
+    Adds (or replaces) a retailer; build_graph() generates one search node per entry.
+    """
+    RETAILERS[retailer.key] = retailer
+    return retailer
+
+
+def get_retailers() -> list[RetailerConfig]:
+    return list(RETAILERS.values())
+
+
+def load_retailers(path: str) -> list[RetailerConfig]:
+    """
+    Registers retailers from a JSON file holding a list of RetailerConfig mappings.
+    """
+    known = {f.name for f in fields(RetailerConfig)}
+    with open(path) as f:
+        entries = json.load(f)
+    return [
+        register_retailer(
+            RetailerConfig(**{k: v for k, v in entry.items() if k in known})
+        )
+        for entry in entries
+    ]
+
+
+register_retailer(RetailerConfig(key="amazon", name="Amazon", domain="amazon.com"))
+register_retailer(RetailerConfig(key="bestbuy", name="Best Buy", domain="bestbuy.com"))
+register_retailer(RetailerConfig(key="walmart", name="Walmart", domain="walmart.com"))
+
+if RETAILERS_FILE:
+    load_retailers(RETAILERS_FILE)
@@ -0,0 +1,373 @@
+import asyncio
+import hashlib
+import json
+import time
+from functools import lru_cache
+
+from langchain_core.runnables import RunnableConfig
+
+from config.settings import (
+    ADAPTIVE_SEARCH_ENABLED,
+    LISTING_INDEX_ENABLED,
+    LOG_PAYLOADS,
+    SEARCH_CACHE_DISK_SIZE,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_MEMORY_SIZE,
+    SEARCH_CACHE_PATH,
+    SINGLEFLIGHT_ENABLED,
+    logger,
+)
+from graph.extraction import parse_availability, parse_price
+from graph.graph_state import AgentState
+from graph.retailers.listings import index_listings, lookup_listings
+from graph.retailers.registry import RetailerConfig
+from utils.cache import LRUCache, SqliteCache, TieredCache
+from utils.helper import clean_product_title
+from utils.metrics import SIZE_BUCKETS, metrics, span
+from utils.resilience import CircuitOpenError, get_breaker, resilient_call
+from utils.search_client import get_search_client
+from utils.singleflight import AsyncSingleFlight
+
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/300"
+# Outcome of a retailer search, reported in retailer_status
+RETAILER_OK = "ok"
+RETAILER_LATE = "late"
+RETAILER_FAILED = "failed"
+RETAILER_SKIPPED = "skipped"  # the domain's circuit breaker is open
+
+# Identical searches in flight at the same time share one request
+search_flight = AsyncSingleFlight("retailer_search")
+
+
+@lru_cache(maxsize=None)
+def get_search_cache() -> TieredCache:
+    """
+    Returns the process-wide search result cache, opening the SQLite tier on first use.
+    """
+    disk = SqliteCache(
+        SEARCH_CACHE_PATH, max_entries=SEARCH_CACHE_DISK_SIZE, table="search_results"
+    )
+    return TieredCache(LRUCache(SEARCH_CACHE_MEMORY_SIZE), disk)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def search_cache_key(query: str, domain: str, params: dict) -> str:
+    raw = json.dumps([normalize_query(query), domain, params], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def create_search_prompt(user_query: str, domain: str) -> str:
+    prompt = f"""
+      Search for the product "{user_query}" exclusively on the website "{domain}". Provide a comprehensive summary that includes the following details sourced only from "{domain}":
+
+
+    Ensure that all information is accurate and solely derived from "{domain}". Do not include data or references from any other websites or sources.
+
+    """
+    return prompt
+
+
+def process_search_results(search_results: dict, retailer: RetailerConfig) -> list:
+    """
+    Pairs each search hit with its image (or a placeholder) and cleans up the title.
+    """
+    results = search_results.get("results", [])
+    images = search_results.get("images", [])
+
+    processed_results = []
+    for idx, result in enumerate(results):
+        image_url = images[idx] if idx < len(images) else PLACEHOLDER_IMAGE
+        processed_results.append(
+            {
+                # The whole title: colour and variant words often come late in it
+                "title": clean_product_title(result["title"]),
+                "url": result["url"],
+                "content": result["content"],
+                "image": image_url,
+                "retailer": retailer.name,
+            }
+        )
+    return processed_results
+
+
+async def _fetch(
+    query: str,
+    retailer: RetailerConfig,
+    params: dict,
+    cache: TieredCache,
+    cache_key: str,
+) -> dict:
+    """Runs one uncached search and caches the raw response."""
+    client = get_search_client()
+    with span("search", retailer=retailer.key) as current:
+        search_results = await resilient_call(
+            retailer.domain,
+            lambda: client.search(
+                query=create_search_prompt(query, retailer.domain),
+                limit_key=retailer.domain,
+                limit=retailer.concurrency,
+                rate=retailer.rate_limit,
+                **params,
+            ),
+        )
+        payload_bytes = len(json.dumps(search_results))
+        current.set(
+            payload_bytes=payload_bytes, results=len(search_results.get("results", []))
+        )
+    metrics.observe(
+        "search_response_bytes",
+        payload_bytes,
+        buckets=SIZE_BUCKETS,
+        retailer=retailer.key,
+    )
+    if LOG_PAYLOADS:
+        logger.info(f"search_results {retailer.domain}: {search_results}")
+    if cache is not None:
+        await cache.aset(cache_key, search_results, ttl=retailer.cache_ttl)
+    if LISTING_INDEX_ENABLED:
+        try:
+            await asyncio.to_thread(
+                index_listings,
+                process_search_results(search_results, retailer),
+                retailer,
+            )
+        except Exception as e:
+            logger.error(f"Indexing listings from {retailer.domain} failed: {e}")
+    return search_results
+
+
+def search_params(retailer: RetailerConfig, escalated: bool = False) -> dict:
+    """
+    Search parameters of the retailer's cheap first search, or of the escalated one.
+    The cheap search only asks for images with the retailer's cheap_images. With
+    ADAPTIVE_SEARCH_ENABLED off there is a single search, which also retrieves images.
+    """
+    if escalated:
+        return {
+            "search_depth": retailer.escalate_search_depth,
+            "max_results": retailer.escalate_max_results,
+            "include_domains": [retailer.domain],
+            "include_images": retailer.escalate_images,
+        }
+    return {
+        "search_depth": retailer.search_depth,
+        "max_results": retailer.max_results,
+        "include_domains": [retailer.domain],
+        "include_images": retailer.cheap_images or not ADAPTIVE_SEARCH_ENABLED,
+    }
+
+
+def escalation_reason(search_results: dict, retailer: RetailerConfig) -> str | None:
+    """
+    Why a cheap search isn't enough to compare on, checked locally against the
+    retailer's thresholds: "few_results", "no_price" or "no_stock_signal". None
+    when it is enough.
+    """
+    results = search_results.get("results", [])
+    if len(results) < retailer.min_results:
+        return "few_results"
+    # Stock confidence of every hit a price could be read from
+    priced = [
+        parse_availability(result.get("content", ""))[1]
+        for result in results
+        if parse_price(result.get("content", ""))[0]
+    ]
+    if len(priced) < retailer.min_priced:
+        return "no_price"
+    if retailer.require_stock_signal and priced and not any(priced):
+        return "no_stock_signal"
+    return None
+
+
+async def _cached(
+    cache: TieredCache, query: str, retailer: RetailerConfig, params: dict
+) -> dict | None:
+    return (
+        await cache.aget(search_cache_key(query, retailer.domain, params))
+        if cache is not None
+        else None
+    )
+
+
+async def _search(
+    query: str,
+    retailer: RetailerConfig,
+    params: dict,
+    cache: TieredCache,
+    timeout: float,
+) -> dict:
+    """One remote search, shared with identical searches in flight."""
+    cache_key = search_cache_key(query, retailer.domain, params)
+
+    def fetch():
+        return _fetch(query, retailer, params, cache, cache_key)
+
+    return await asyncio.wait_for(
+        search_flight.do(cache_key, fetch) if SINGLEFLIGHT_ENABLED else fetch(),
+        timeout=timeout,
+    )
+
+
+async def _escalate(
+    query: str,
+    retailer: RetailerConfig,
+    search_results: dict,
+    cache: TieredCache,
+    timeout: float,
+) -> dict:
+    """
+    Runs the escalated search when the cheap results fall short of the retailer's
+    thresholds. If it fails or runs out of time, the cheap results are kept.
+    """
+    reason = escalation_reason(search_results, retailer)
+    metrics.inc(
+        "search_stage_total",
+        retailer=retailer.key,
+        stage="cheap" if reason is None else "escalated",
+    )
+    if reason is None:
+        return search_results
+    metrics.inc("search_escalations_total", retailer=retailer.key, reason=reason)
+    try:
+        return await _search(
+            query, retailer, search_params(retailer, escalated=True), cache, timeout
+        )
+    except Exception as e:
+        logger.error(
+            f"Escalated search on {retailer.domain} failed, "
+            f"keeping the first results: {e!r}"
+        )
+        if not search_results.get("results"):
+            raise
+        return search_results
+
+
+async def search_retailer(
+    query: str, retailer: RetailerConfig, timeout: float = None, use_cache: bool = True
+) -> tuple[list, str]:
+    """
+    Searches a single retailer domain through the shared pooled client.
+
+    Raw search responses are cached per (normalized query, domain, search params)
+    for the retailer's cache_ttl, so a hit skips the network round trip. Other
+    queries are answered from the local listing index when it has enough fresh
+    listings of the retailer matching them. The rest go through resilient_call,
+    which hedges, retries and circuit-breaks per domain, and concurrent identical
+    misses share a single search.
+
+    With ADAPTIVE_SEARCH_ENABLED the first search is the cheap one (no images unless
+    the retailer sets cheap_images), and a deeper search with more results (and
+    images with escalate_images) only follows when the cheap results lack enough
+    hits, prices or stock signals, see escalation_reason.
+
+    Args:
+        timeout: Seconds to wait for the search (both stages), defaults to the
+            retailer's timeout.
+        use_cache: Set to False to skip the search cache and the listing index and
+            always search live; the response still goes into both.
+
+    Returns:
+        tuple: Processed product hits (empty if the search failed or timed out) and
+        the search status, RETAILER_OK, RETAILER_LATE, RETAILER_FAILED or
+        RETAILER_SKIPPED.
+    """
+    timeout = retailer.timeout if timeout is None else timeout
+    started = time.monotonic()
+    cache = get_search_cache() if SEARCH_CACHE_ENABLED else None
+    escalated, first = None, None
+    if cache is not None and use_cache:
+        # An escalated response already in the cache beats the cheap one
+        if ADAPTIVE_SEARCH_ENABLED:
+            escalated = await _cached(
+                cache, query, retailer, search_params(retailer, escalated=True)
+            )
+        if escalated is None:
+            first = await _cached(cache, query, retailer, search_params(retailer))
+        metrics.inc(
+            "search_cache_total",
+            retailer=retailer.key,
+            result="miss" if escalated is None and first is None else "hit",
+        )
+    if escalated is not None:
+        return process_search_results(escalated, retailer), RETAILER_OK
+    if first is None and LISTING_INDEX_ENABLED and use_cache:
+        try:
+            indexed = await asyncio.to_thread(lookup_listings, query, retailer)
+        except Exception as e:
+            logger.error(f"Listing index lookup for {retailer.domain} failed: {e}")
+            indexed = None
+        metrics.inc(
+            "listing_index_total",
+            retailer=retailer.key,
+            result="miss" if indexed is None else "hit",
+        )
+        if indexed is not None:
+            return indexed, RETAILER_OK
+
+    try:
+        search_results = (
+            first
+            if first is not None
+            else await _search(query, retailer, search_params(retailer), cache, timeout)
+        )
+        if ADAPTIVE_SEARCH_ENABLED:
+            remaining = max(timeout - (time.monotonic() - started), 0.0)
+            search_results = await _escalate(
+                query, retailer, search_results, cache, remaining
+            )
+    except CircuitOpenError:
+        return [], RETAILER_SKIPPED
+    except asyncio.TimeoutError:
+        logger.error(f"Search on {retailer.domain} timed out after {timeout:.1f}s")
+        if timeout >= retailer.timeout:
+            # The domain itself is too slow; a request deadline cut says nothing about
+            # it
+            get_breaker(retailer.domain).record_failure()
+        return [], RETAILER_LATE
+    except Exception as e:
+        logger.error(f"Error searching {retailer.domain}: {e}")
+        return [], RETAILER_FAILED
+
+    return process_search_results(search_results, retailer), RETAILER_OK
+
+
+def make_retailer_node(retailer: RetailerConfig):
+    """
+    Builds the async graph node that searches one registered retailer.
+
+    The node never raises and gives up by the request deadline, so the
+    coordinator always runs on time with whichever retailers answered.
+    """
+
+    async def retailer_node(state: AgentState, config: RunnableConfig = None):
+        timeout = retailer.timeout
+        # A resumed run brings a fresh deadline in its config, the one in the state
+        # belongs to the first attempt
+        deadline = (
+            (config or {})
+            .get("configurable", {})
+            .get("deadline", state.get("deadline"))
+        )
+        if deadline:
+            timeout = min(timeout, max(deadline - time.time(), 0.0))
+        try:
+            processed_results, status = await search_retailer(
+                state["query"],
+                retailer,
+                timeout,
+                use_cache=state.get("search_cache", True),
+            )
+        except Exception as e:
+            logger.error(f"Retailer {retailer.key} failed: {e}")
+            processed_results, status = [], RETAILER_FAILED
+        metrics.inc("retailer_status_total", retailer=retailer.key, status=status)
+        return {
+            "retailer_results": {retailer.key: processed_results},
+            "retailer_status": {retailer.key: status},
+        }
+
+    retailer_node.__name__ = f"{retailer.key}_node"
+    return retailer_node
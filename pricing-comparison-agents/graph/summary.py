@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from config.settings import (
+    LOG_PAYLOADS,
+    PRICE_HISTORY_WINDOW_DAYS,
+    SUMMARY_WORKERS,
+    logger,
+)
+from utils.async_runner import iterate_sync
+from utils.cache import LRUCache
+from utils.metrics import span
+
+from .history import parse_stored_price, product_history_key
+from .llm import astream_model, invoke_model
+from .prompts import create_summary_prompt
+from .retailers.registry import get_retailers
+from .retailers.search import RETAILER_OK
+
+_executor = ThreadPoolExecutor(
+    max_workers=SUMMARY_WORKERS, thread_name_prefix="summary"
+)
+# Recent background summaries by comparison, so asking twice calls the model once
+_pending = LRUCache(256)
+_pending_lock = threading.Lock()
+
+
+def _price(price: float) -> str:
+    return f"${price:,.2f}"
+
+
+def template_summary(top_result: dict, price_history: dict = None) -> str:
+    """
+    Short deterministic summary of a comparison: best in-stock deal, price range,
+    where it's out of stock, and how the best price compares with the recent history.
+    """
+    offers = []
+    for product in top_result.get("products", []):
+        for offer in product.get("retailers", []):
+            price = parse_stored_price(offer.get("price", ""))
+            if price:
+                offers.append((price, product, offer))
+    if not offers:
+        return "No prices were found for this search."
+
+    in_stock = [entry for entry in offers if entry[2].get("availability")]
+    price, product, offer = min(in_stock or offers, key=lambda entry: entry[0])
+    sentences = [
+        f"Best deal: {product.get('title', '')} at {offer.get('name', '')} "
+        f"for {_price(price)}"
+        + ("." if in_stock else ", though nothing is in stock right now.")
+    ]
+
+    retailers = {entry[2].get("name", "") for entry in offers}
+    low, high = min(entry[0] for entry in offers), max(entry[0] for entry in offers)
+    if high > low:
+        sentences.append(
+            f"Prices range from {_price(low)} to {_price(high)} "
+            f"across {len(retailers)} retailers."
+        )
+
+    window = (
+        (price_history or {})
+        .get(product_history_key(product), {})
+        .get(offer.get("name", ""))
+    )
+    if window and window.get("count"):
+        if window.get("is_lowest"):
+            sentences.append(
+                "That's the lowest price seen in the last "
+                f"{PRICE_HISTORY_WINDOW_DAYS:g} days."
+            )
+        else:
+            sentences.append(
+                f"It has been as low as {_price(window['min'])} in the last "
+                f"{PRICE_HISTORY_WINDOW_DAYS:g} days."
+            )
+
+    out_of_stock = sorted(
+        {
+            entry[2].get("name", "")
+            for entry in offers
+            if not entry[2].get("availability")
+        }
+    )
+    if in_stock and out_of_stock:
+        sentences.append(f"Out of stock at {', '.join(out_of_stock)}.")
+
+    status = top_result.get("retailer_status", {})
+    missing = [
+        retailer.name
+        for retailer in get_retailers()
+        if status.get(retailer.key, RETAILER_OK) != RETAILER_OK
+    ]
+    if missing:
+        sentences.append(
+            f"{', '.join(missing)} didn't answer and "
+            f"{'is' if len(missing) == 1 else 'are'} not included."
+        )
+    return " ".join(sentences)
+
+
+def _summary_messages(top_result: dict) -> list:
+    system_prompt, user_prompt = create_summary_prompt(top_result)
+    return [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
+
+
+def _summary_key(top_result: dict, use_cache: bool) -> str:
+    return hashlib.sha256(
+        json.dumps([top_result, use_cache], sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _shareable(future: Future) -> bool:
+    # A failed summary is written again on the next request
+    return future is not None and not (future.done() and future.exception() is not None)
+
+
+def llm_summary(top_result: dict, use_cache: bool = True) -> str:
+    """Conversational summary of a comparison written by the model."""
+    with span("llm_summary"):
+        response = invoke_model(_summary_messages(top_result), use_cache=use_cache)
+    if LOG_PAYLOADS:
+        logger.info(f"summary agent reponse from llm {response}")
+    return response.content
+
+
+def summarize_in_background(top_result: dict, use_cache: bool = True) -> Future:
+    """
+    Starts llm_summary on a background thread and returns its future. Callers
+    asking for the same comparison while it runs, or shortly after, share it.
+    """
+    key = _summary_key(top_result, use_cache)
+    with _pending_lock:
+        future = _pending.get(key)
+        if not _shareable(future):
+            future = _executor.submit(llm_summary, top_result, use_cache)
+            _pending.set(key, future)
+    return future
+
+
+async def astream_llm_summary(top_result: dict, use_cache: bool = True):
+    """
+    Yields the conversational summary of a comparison while the model writes it.
+    A summary already running or written for the same comparison is shared
+    instead, and arrives in one piece.
+    """
+    key = _summary_key(top_result, use_cache)
+    with _pending_lock:
+        future = _pending.get(key)
+        shared = _shareable(future)
+        if not shared:
+            future = Future()
+            _pending.set(key, future)
+    if shared:
+        yield await asyncio.wrap_future(future)
+        return
+
+    chunks = []
+    try:
+        with span("llm_summary"):
+            async for chunk in astream_model(
+                _summary_messages(top_result), use_cache=use_cache
+            ):
+                chunks.append(chunk)
+                yield chunk
+    except BaseException as e:
+        # Callers sharing this summary get the error; a reader that stops early leaves
+        # it unwritten
+        future.set_exception(
+            e
+            if isinstance(e, Exception)
+            else RuntimeError("summary stream stopped early")
+        )
+        raise
+    future.set_result("".join(chunks))
+
+
+def stream_llm_summary(top_result: dict, use_cache: bool = True):
+    """
+    Blocking iterator over astream_llm_summary, for synchronous callers like Streamlit.
+    """
+    return iterate_sync(astream_llm_summary(top_result, use_cache))
+
+
+async def asummarize(top_result: dict, use_cache: bool = True) -> str:
+    """Awaits the background LLM summary of a comparison."""
+    return await asyncio.wrap_future(summarize_in_background(top_result, use_cache))
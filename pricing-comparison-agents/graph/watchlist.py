@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from functools import lru_cache
+
+from config.settings import (
+    WATCHLIST_CONCURRENCY,
+    WATCHLIST_INTERVAL,
+    WATCHLIST_JITTER,
+    WATCHLIST_MIN_PRICE_CHANGE,
+    WATCHLIST_PATH,
+    WATCHLIST_RATE,
+    logger,
+)
+from utils.cache import SqliteCache
+from utils.metrics import instrument_node, metrics
+from utils.rate_limit import AsyncRateLimiter
+
+from .extraction import extract_listing
+from .graph_builder import asearch_graph
+from .graph_state import AgentState, MatchedProduct
+from .history import parse_stored_price, product_history_key
+from .nodes import compare_node, history_node, summarize_node
+from .retailers.registry import get_retailers
+from .retailers.search import RETAILER_OK, normalize_query
+
+
+@lru_cache(maxsize=None)
+def get_watchlist_store() -> SqliteCache:
+    """Last snapshot per watched query; snapshots never expire."""
+    return SqliteCache(WATCHLIST_PATH, table="watchlist_snapshots")
+
+
+def listing_fingerprints(matched_products: list[MatchedProduct]) -> dict[str, str]:
+    """
+    Hash per retailer of what the comparison depends on: which of its listings
+    matched into which product, with their extracted price, availability and
+    rating. Snippet text is only included where no price could be extracted,
+    so rewording alone doesn't count as a change.
+    """
+    entries = {}
+    for matched in matched_products:
+        for listing in matched["listings"]:
+            offer, rating = extract_listing(listing)
+            entries.setdefault(offer["name"], []).append(
+                [
+                    matched["key"],
+                    listing["url"],
+                    offer["price"],
+                    offer["availability"],
+                    rating,
+                    "" if offer["price"] else listing.get("content", ""),
+                ]
+            )
+    return {
+        name: hashlib.sha256(json.dumps(sorted(rows)).encode()).hexdigest()
+        for name, rows in entries.items()
+    }
+
+
+def snapshot_offers(top_result: dict) -> dict:
+    """
+    'product key|retailer' -> {"title", "price", "availability"} for every compared
+    offer.
+    """
+    offers = {}
+    for product in top_result.get("products", []):
+        key = product_history_key(product)
+        for offer in product.get("retailers", []):
+            offers[f"{key}|{offer.get('name', '')}"] = {
+                "title": product.get("title", ""),
+                "price": parse_stored_price(offer.get("price", "")),
+                "availability": bool(offer.get("availability")),
+            }
+    return offers
+
+
+def diff_offers(
+    query: str,
+    before: dict,
+    after: dict,
+    min_change: float = WATCHLIST_MIN_PRICE_CHANGE,
+) -> list[dict]:
+    """
+    Change events between two snapshots: price_drop, price_increase, back_in_stock,
+    out_of_stock, new_offer and offer_removed.
+    """
+    events = []
+
+    def event(kind: str, offer_key: str, offer: dict, **details):
+        key, _, retailer = offer_key.rpartition("|")
+        events.append(
+            {
+                "type": kind,
+                "query": query,
+                "product": offer["title"],
+                "key": key,
+                "retailer": retailer,
+                "at": time.time(),
+                **details,
+            }
+        )
+
+    for offer_key, offer in after.items():
+        previous = before.get(offer_key)
+        if previous is None:
+            event("new_offer", offer_key, offer, price=offer["price"])
+            continue
+        old_price, new_price = previous["price"], offer["price"]
+        if (
+            old_price
+            and new_price
+            and abs(new_price - old_price) > old_price * min_change
+        ):
+            event(
+                "price_drop" if new_price < old_price else "price_increase",
+                offer_key,
+                offer,
+                before=old_price,
+                after=new_price,
+            )
+        if previous["availability"] != offer["availability"]:
+            event(
+                "back_in_stock" if offer["availability"] else "out_of_stock",
+                offer_key,
+                offer,
+            )
+    for offer_key, offer in before.items():
+        if offer_key not in after:
+            event("offer_removed", offer_key, offer)
+    return events
+
+
+async def refresh_query(query: str) -> list[dict]:
+    """
+    Searches one watched query again and re-runs compare and summarize only if
+    the matched listings changed since the last snapshot.
+
+    Only the retailers that answered are compared against the snapshot; the
+    offers of late or failed ones are carried forward until they answer again,
+    so they don't read as removed.
+
+    Returns:
+        list: Change events against the previous snapshot (none on the first refresh).
+    """
+    store = get_watchlist_store()
+    store_key = normalize_query(query)
+    # Live searches: the search cache and the listing index would hand back what an
+    # earlier refresh saw whenever the interval is shorter than their freshness windows
+    state: AgentState = await asearch_graph(query, use_search_cache=False)
+    retailer_status = state.get("retailer_status", {})
+    answered = {
+        retailer.name
+        for retailer in get_retailers()
+        if retailer_status.get(retailer.key) == RETAILER_OK
+    }
+    if not answered:
+        metrics.inc("watchlist_refresh_total", result="incomplete")
+        logger.warning(f"watchlist: skipping '{query}', retailers {retailer_status}")
+        return []
+    if len(answered) < len(retailer_status):
+        logger.warning(f"watchlist: refreshing '{query}' without {retailer_status}")
+
+    fingerprints = listing_fingerprints(state.get("matched_products", []))
+    previous = store.get(store_key)
+    if previous is not None and all(
+        fingerprints.get(name) == previous["fingerprints"].get(name)
+        for name in answered
+    ):
+        metrics.inc("watchlist_refresh_total", result="unchanged")
+        store.set(store_key, {**previous, "checked_at": time.time()})
+        return []
+
+    for name, node in (
+        ("compare", compare_node),
+        ("history", history_node),
+        ("summarize", summarize_node),
+    ):
+        state.update(await asyncio.to_thread(instrument_node(name, node), state))
+    offers = {
+        key: offer
+        for key, offer in snapshot_offers(state["top_result"]).items()
+        if key.rpartition("|")[2] in answered
+    }
+    events = []
+    if previous is not None:
+        before = {
+            key: offer
+            for key, offer in previous["offers"].items()
+            if key.rpartition("|")[2] in answered
+        }
+        events = diff_offers(query, before, offers)
+        carried = {
+            key: offer for key, offer in previous["offers"].items() if key not in before
+        }
+        offers = {**carried, **offers}
+        fingerprints = {
+            **{
+                name: value
+                for name, value in previous["fingerprints"].items()
+                if name not in answered
+            },
+            **fingerprints,
+        }
+    metrics.inc("watchlist_refresh_total", result="changed")
+    metrics.inc("watchlist_events_total", len(events))
+    store.set(
+        store_key,
+        {
+            "fingerprints": fingerprints,
+            "offers": offers,
+            "top_result": state["top_result"],
+            "summary": state.get("summary", ""),
+            "checked_at": time.time(),
+            "updated_at": time.time(),
+        },
+    )
+    return events
+
+
+async def run_watchlist(
+    queries: list[str],
+    on_event,
+    interval: float = WATCHLIST_INTERVAL,
+    rate: float = WATCHLIST_RATE,
+    jitter: float = WATCHLIST_JITTER,
+    concurrency: int = WATCHLIST_CONCURRENCY,
+    rounds: int = None,
+):
+    """
+    Refreshes every watched query each `interval` seconds and calls on_event(event)
+    for every change found.
+
+    Refreshes start at most `rate` per second, each after a random delay of up to
+    `jitter` seconds, so tracked products don't all hit the retailers at once.
+
+    Args:
+        rounds: Number of passes over the watchlist, None runs until cancelled.
+    """
+    limiter = AsyncRateLimiter(rate) if rate else None
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def refresh_one(query: str):
+        await asyncio.sleep(random.uniform(0, jitter))
+        if limiter is not None:
+            await limiter.acquire()
+        async with semaphore:
+            try:
+                events = await refresh_query(query)
+            except Exception as e:
+                metrics.inc("watchlist_refresh_total", result="error")
+                logger.error(f"watchlist: refreshing '{query}' failed: {e}")
+                return
+        for event in events:
+            on_event(event)
+
+    completed = 0
+    while rounds is None or completed < rounds:
+        started = time.monotonic()
+        await asyncio.gather(*(refresh_one(query) for query in dict.fromkeys(queries)))
+        completed += 1
+        if rounds is not None and completed >= rounds:
+            break
+        await asyncio.sleep(
+            max(interval - (time.monotonic() - started), 0) + random.uniform(0, jitter)
+        )
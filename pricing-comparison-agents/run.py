@@ -1,15 +1,187 @@
-from  graph.graph_builder import run_graph
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import METRICS_PORT, WATCHLIST_INTERVAL, configure_logging
+from graph.graph_builder import arun_graph, run_graph
+from graph.llm import set_batching
+from graph.retailers.search import normalize_query
+from graph.summary import asummarize
+from utils.metrics import start_metrics_server
+
+
+def read_queries(source: str) -> list[str]:
+    """Reads one query per line from a file, or from stdin when source is '-'."""
+    if source == "-":
+        return [line.strip() for line in sys.stdin if line.strip()]
+    with open(source) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def completed_queries(output_path: str) -> set[str]:
+    """
+    Queries that already have a successful record in a (possibly partial) JSONL output
+    file.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line of an interrupted run may be cut off
+                continue
+            if record.get("status") == "ok":
+                done.add(record["query"])
+    return done
+
+
+def previous_sweep(output_path: str) -> str | None:
+    """Sweep id of the last record in a JSONL output file, to --resume that sweep."""
+    sweep = None
+    if not os.path.exists(output_path):
+        return sweep
+    with open(output_path) as f:
+        for line in f:
+            try:
+                sweep = json.loads(line).get("sweep", sweep)
+            except json.JSONDecodeError:
+                continue
+    return sweep
+
+
+def batch_run_id(query: str, sweep: str) -> str:
+    """
+    Checkpoint id of a batch query: the same for every attempt at it within one
+    sweep, so retries and --resume pick up after the searches that already
+    completed, while a new sweep searches again.
+    """
+    key = f"{normalize_query(query)}|{sweep}"
+    return "batch-" + hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+async def run_batch(
+    queries: list[str],
+    output_path: str,
+    concurrency: int,
+    resume: bool,
+    retries: int = 1,
+    llm_summary: bool = False,
+) -> dict:
+    """
+    Runs every query through the graph with at most `concurrency` in flight and
+    appends one JSONL record per query as soon as it finishes. A failed query is
+    retried up to `retries` times, continuing from its last checkpoint. Records
+    carry the template summary unless llm_summary asks for the model-written one.
+
+    Returns:
+        dict: Counts and throughput for the run.
+    """
+    skipped = completed_queries(output_path) if resume else set()
+    # Checkpoints are per sweep: a finished run must not answer the next sweep's query
+    sweep = (previous_sweep(output_path) if resume else None) or uuid.uuid4().hex[:12]
+    pending = [query for query in dict.fromkeys(queries) if query not in skipped]
+    semaphore = asyncio.Semaphore(concurrency)
+    # Sync nodes run on the default executor, and a batched compare call holds its
+    # thread while it waits for company; size the pool so every query in flight can wait
+    # at once
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency + 4)
+    )
+    stats = {
+        "total": len(pending),
+        "ok": 0,
+        "failed": 0,
+        "skipped": len(queries) - len(pending),
+        "failures": [],
+    }
+
+    with open(output_path, "a" if resume else "w") as output:
+        if resume and output.tell() > 0:
+            # Start on a fresh line in case the previous run was cut off mid-record
+            output.write("\n")
+
+        async def run_with_retries(query: str):
+            run_id = batch_run_id(query, sweep)
+            for attempt in range(retries + 1):
+                try:
+                    return await arun_graph(query, run_id=run_id)
+                except Exception as e:
+                    if attempt == retries:
+                        raise
+                    print(f"retrying '{query}' after: {e}", file=sys.stderr)
+
+        async def run_one(query: str):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    final_state = await run_with_retries(query)
+                    record = {
+                        "query": query,
+                        "status": "ok",
+                        "top_result": final_state.get("top_result"),
+                        "retailer_status": final_state.get("retailer_status"),
+                        "price_history": final_state.get("price_history"),
+                        "summary": final_state.get("summary"),
+                    }
+                    if llm_summary:
+                        record["summary"] = await asummarize(final_state["top_result"])
+                    stats["ok"] += 1
+                except Exception as e:
+                    record = {"query": query, "status": "error", "error": str(e)}
+                    stats["failed"] += 1
+                    stats["failures"].append(query)
+                record["elapsed"] = round(time.perf_counter() - started, 3)
+                record["sweep"] = sweep
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_one(query) for query in pending))
+        stats["elapsed"] = round(time.perf_counter() - started, 3)
+
+    stats["queries_per_second"] = (
+        round(stats["total"] / stats["elapsed"], 3) if stats["elapsed"] else 0.0
+    )
+    return stats
+
+
+def watch(queries: list[str], events_path: str, interval: float, rounds: int = None):
+    """
+    Refreshes the watchlist, appending every change event to events_path as a JSON line.
+    """
+    from graph.watchlist import run_watchlist
+
+    with open(events_path, "a") as events:
+        def on_event(event: dict):
+            events.write(json.dumps(event) + "\n")
+            events.flush()
+            print(
+                f"{event['type']}: {event['product']} at {event['retailer']}",
+                file=sys.stderr,
+            )
+
+        asyncio.run(run_watchlist(queries, on_event, interval=interval, rounds=rounds))
+
+
+def interactive():
 
-def main():
-    
     user_input = input("Enter the product you are looking for: ").strip()
     if not user_input:
         print("Please enter valid product name")
         return
-    
+
     try:
         result = run_graph(user_input)
-        
+
         # Display Top Results
         # if result["top_results"]:
         #     print("\nTop Results:")
@@ -19,23 +191,120 @@ def main():
         #         print(f"URL     : {product['url']}")
         #         print(f"Image   : {product['image']}")
         #         print(f"Content : {product['content']}")
-        
+
         # else:
         #     print("No top results found.")
-        
+
         # Display Summary
         # if result["summary"]:
         #     print("\nSummary:")
         #     print(result["summary"])
         # else:
         #     print("No summary available.")
-    
+
     except Exception as e:
-    
+
         print("An error occurred while processing your request.")
 
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare product prices across retailers."
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="read one query per line from FILE ('-' for stdin) instead of prompting",
+    )
+    parser.add_argument(
+        "--output",
+        default="results.jsonl",
+        help="JSONL file batch results are written to",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="max queries in flight in batch mode"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip queries already completed in --output and append to it",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=1,
+        help="times a failed query is retried in batch mode, resuming from its last "
+        "completed step",
+    )
+    parser.add_argument(
+        "--llm-summary",
+        action="store_true",
+        help="have the model write each batch record's summary instead of the template",
+    )
+    parser.add_argument(
+        "--llm-batching",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="send the compare calls of concurrent batch queries to the model together",
+    )
+    parser.add_argument(
+        "--watch",
+        metavar="FILE",
+        help="keep refreshing the queries in FILE and report price and stock changes",
+    )
+    parser.add_argument(
+        "--events",
+        default="events.jsonl",
+        help="JSONL file watchlist change events are appended to",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=WATCHLIST_INTERVAL,
+        help="seconds between watchlist passes",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="refresh the watchlist once and exit, e.g. from cron",
+    )
+    args = parser.parse_args()
+    configure_logging()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+
+    if args.watch:
+        watch(
+            read_queries(args.watch),
+            args.events,
+            args.interval,
+            rounds=1 if args.once else None,
+        )
+        return
+    if not args.batch:
+        interactive()
+        return
+
+    set_batching(args.llm_batching and args.concurrency > 1)
+    stats = asyncio.run(
+        run_batch(
+            read_queries(args.batch),
+            args.output,
+            args.concurrency,
+            args.resume,
+            args.retries,
+            args.llm_summary,
+        )
+    )
+    print(
+        f"{stats['ok']} ok, {stats['failed']} failed, {stats['skipped']} skipped "
+        f"in {stats['elapsed']}s ({stats['queries_per_second']} queries/s)",
+        file=sys.stderr,
+    )
+    for query in stats["failures"]:
+        print(f"failed: {query}", file=sys.stderr)
+
+
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
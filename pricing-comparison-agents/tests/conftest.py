@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings are read at import: keep every store out of .cache and off the network
+_scratch = tempfile.mkdtemp(prefix="pricing-tests-")
+for name, default in {
+    "OPENAI_API_KEY": "test",
+    "TAVILY_API_KEY": "test",
+    "SEARCH_CACHE_PATH": os.path.join(_scratch, "search_cache.db"),
+    "LLM_CACHE_PATH": os.path.join(_scratch, "llm_cache.db"),
+    "PRICE_HISTORY_PATH": os.path.join(_scratch, "price_history"),
+    "WATCHLIST_PATH": os.path.join(_scratch, "watchlist.db"),
+    "CHECKPOINT_PATH": os.path.join(_scratch, "checkpoints.db"),
+    "LISTING_INDEX_PATH": os.path.join(_scratch, "listings.db"),
+    "SEMANTIC_CACHE_PATH": os.path.join(_scratch, "semantic_cache"),
+    "METRICS_SPAN_PATH": os.path.join(_scratch, "spans.jsonl"),
+}.items():
+    os.environ.setdefault(name, default)
+
+RECORDING_PATH = os.path.join(ROOT, "benchmarks", "recordings", "default.json")
+
+
+@pytest.fixture
+def recording() -> dict:
+    from benchmarks.stubs import load_recording
+
+    return load_recording(RECORDING_PATH)
+
+
+@pytest.fixture
+def fake_search(recording, monkeypatch):
+    """
+    A zero-latency FakeSearchClient replaying the recording, with caches and the listing
+    index off.
+    """
+    from benchmarks.stubs import FakeSearchClient, LatencyDistribution
+    from graph.retailers import search
+    from utils import resilience
+    from utils.search_client import set_search_client_factory
+
+    client = FakeSearchClient(recording, LatencyDistribution("constant:0"))
+    monkeypatch.setattr(search, "SEARCH_CACHE_ENABLED", False)
+    monkeypatch.setattr(search, "LISTING_INDEX_ENABLED", False)
+    monkeypatch.setattr(resilience, "_breakers", {})
+    set_search_client_factory(lambda: client)
+    yield client
+    set_search_client_factory(None)
+
+
+@pytest.fixture
+def fake_model(recording):
+    """A zero-latency FakeChatModel answering with the recorded responses."""
+    from benchmarks.stubs import FakeChatModel, LatencyDistribution
+    from graph.llm import set_model
+
+    model = FakeChatModel(recording, LatencyDistribution("constant:0"))
+    set_model(model)
+    yield model
+    set_model(None)
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, "pool", api.WorkerPool(2, 2))
+    return TestClient(api.app)
+
+
+def test_batch_is_capped_at_pool_capacity(client):
+    assert api.WorkerPool(api.API_WORKERS, api.API_QUEUE_SIZE).capacity >= api.MAX_BATCH
+    queries = [f"query {i}" for i in range(api.MAX_BATCH + 1)]
+    response = client.post("/compare/batch", json={"queries": queries})
+    assert response.status_code == 413
+
+
+@pytest.mark.usefixtures("client")
+def test_stream_takes_no_slot_until_read():
+    asyncio.run(api.compare_stream(query="iphone 15"))
+    # Never read, so the generator holding the release never started
+    assert api.pool.admitted == 0
+
+
+def test_stream_rejected_when_pool_full(client):
+    api.pool.admit(api.pool.capacity)
+    response = client.get("/compare/stream", params={"query": "iphone 15"})
+    assert response.status_code == 429
+
+
+def test_summary_goes_through_pool(client):
+    api.pool.admit(api.pool.capacity)
+    response = client.post("/summary", json={"top_result": {"products": []}})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(api.API_RETRY_AFTER)
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_summary_streams_tokens(client, recording):
+    response = client.post(
+        "/summary/stream", json={"top_result": {"products": [], "api": 1}}
+    )
+    lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert len(lines) > 1
+    assert {line["event"] for line in lines} == {"token"}
+    assert "".join(line["data"] for line in lines) == recording["llm"]["summary"]
@@ -0,0 +1,115 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from graph import llm
+from graph.prompts import create_compare_prompt
+from utils.batcher import MicroBatcher
+
+
+class Recorder:
+    """Handler answering every item with its double, remembering each batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items: list) -> list:
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+def test_full_batch_is_sent_without_waiting():
+    handler = Recorder()
+    batcher = MicroBatcher("test", handler, max_size=4, max_wait=10.0)
+    started = time.monotonic()
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(batcher.submit, range(4)))
+    assert time.monotonic() - started < 1.0
+    assert results == [0, 2, 4, 6]
+    assert [sorted(batch) for batch in handler.batches] == [[0, 1, 2, 3]]
+
+
+def test_partial_batch_is_sent_after_max_wait():
+    handler = Recorder()
+    batcher = MicroBatcher("test", handler, max_size=8, max_wait=0.05)
+    started = time.monotonic()
+    assert batcher.submit(21) == 42
+    assert 0.04 <= time.monotonic() - started < 1.0
+    assert handler.batches == [[21]]
+
+
+def test_errors_reach_only_their_caller():
+    def handler(items):
+        return [ValueError(item) if item == "bad" else item.upper() for item in items]
+
+    batcher = MicroBatcher("test", handler, max_size=2, max_wait=10.0)
+    with ThreadPoolExecutor(2) as executor:
+        bad, good = (
+            executor.submit(batcher.submit, "bad"),
+            executor.submit(batcher.submit, "good"),
+        )
+        assert good.result() == "GOOD"
+        with pytest.raises(ValueError):
+            bad.result()
+
+
+def test_failed_handler_fails_the_whole_batch():
+    def handler(_items):
+        raise RuntimeError("model down")
+
+    batcher = MicroBatcher("test", handler, max_size=2, max_wait=10.0)
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(batcher.submit, item) for item in ("a", "b")]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_short_answer_fails_the_whole_batch():
+    def handler(items):
+        return items[:1]
+
+    batcher = MicroBatcher("test", handler, max_size=2, max_wait=10.0)
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(batcher.submit, item) for item in ("a", "b")]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+
+
+def compare_messages(query: str) -> list:
+    system_prompt, user_prompt = create_compare_prompt(
+        f"Results for {query}", ["Amazon"]
+    )
+    return [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
+
+
+def test_prompts_sharing_a_system_prompt_are_packed(fake_model, recording):
+    results = llm._answer_batch(
+        [compare_messages("iphone 15"), compare_messages("iphone 15 pro")]
+    )
+    assert fake_model.calls == 1
+    expected = json.loads(recording["llm"]["compare"])
+    assert [json.loads(result.content) for result in results] == [expected, expected]
+
+
+def test_unanswered_packed_prompts_are_sent_again(fake_model, monkeypatch):
+    respond = fake_model._respond
+
+    def drop_second(messages):
+        response = respond(messages)
+        packed = json.loads(response.content).get("results")
+        if packed:
+            response = AIMessage(content=json.dumps({"results": packed[:1]}))
+        return response
+
+    monkeypatch.setattr(fake_model, "_respond", drop_second)
+    results = llm._answer_batch(
+        [compare_messages("iphone 15"), compare_messages("iphone 15 pro")]
+    )
+    # One packed request, then the dropped prompt on its own
+    assert fake_model.calls == 2
+    assert all(isinstance(result, AIMessage) for result in results)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from graph.retailers import search
+from graph.retailers.registry import RETAILERS
+from utils.cache import LRUCache, SqliteCache, TieredCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_lru_entries_expire():
+    cache = LRUCache()
+    cache.set("a", 1, ttl=0.05)
+    cache.set("b", 2)
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert len(cache) == 1
+
+
+def test_sqlite_expires_and_evicts(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"), max_entries=50)
+    cache.set("short", "x", ttl=0.05)
+    time.sleep(0.06)
+    assert cache.get("short") is None
+
+    # Eviction runs every 100 writes and keeps the max_entries most recently used
+    for i in range(100):
+        cache.set(f"key{i}", {"i": i})
+    assert cache.get("key0") is None
+    assert cache.get("key99") == {"i": 99}
+
+
+def test_tiered_promotes_disk_hits_with_their_ttl(tmp_path):
+    disk = SqliteCache(str(tmp_path / "cache.db"))
+    disk.set("a", [1, 2], ttl=60)
+    cache = TieredCache(LRUCache(), disk)
+    assert cache.get("a") == [1, 2]
+    assert cache.memory.get("a") == [1, 2]
+    assert cache.get("a") == [1, 2]
+    assert cache.get("missing") is None
+
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    expires_at, _ = cache.memory._entries["a"]
+    assert 0 < expires_at - time.time() <= 60
+
+
+def test_tiered_async_api_reads_and_writes_both_tiers(tmp_path):
+    disk = SqliteCache(str(tmp_path / "cache.db"))
+    cache = TieredCache(LRUCache(), disk)
+
+    async def roundtrip():
+        await cache.aset("a", {"x": 1}, ttl=60)
+        cache.memory.clear()
+        return await cache.aget("a"), await cache.aget("a"), await cache.aget("b")
+
+    assert asyncio.run(roundtrip()) == ({"x": 1}, {"x": 1}, None)
+    assert disk.get("a") == {"x": 1}
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_repeated_search_is_served_from_the_cache(fake_search, monkeypatch, tmp_path):
+    cache = TieredCache(LRUCache(), SqliteCache(str(tmp_path / "search.db")))
+    monkeypatch.setattr(search, "SEARCH_CACHE_ENABLED", True)
+    monkeypatch.setattr(search, "get_search_cache", lambda: cache)
+
+    first = asyncio.run(search.search_retailer("iPhone 15", RETAILERS["amazon"]))
+    # Queries differing only in case and spacing share the entry
+    second = asyncio.run(search.search_retailer("iphone  15", RETAILERS["amazon"]))
+    assert fake_search.calls == 1
+    assert second == first
@@ -0,0 +1,74 @@
+import asyncio
+import operator
+import threading
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from utils.checkpoint import SqliteCheckpointSaver
+
+
+class State(TypedDict):
+    steps: Annotated[list[str], operator.add]
+
+
+def build(saver: SqliteCheckpointSaver, calls: dict, fail: dict):
+    def first(_state: State):
+        calls["first"] = calls.get("first", 0) + 1
+        return {"steps": ["first"]}
+
+    def second(_state: State):
+        calls["second"] = calls.get("second", 0) + 1
+        if fail.pop("second", False):
+            raise RuntimeError("second failed")
+        return {"steps": ["second"]}
+
+    graph = StateGraph(State)
+    graph.add_node("first", first)
+    graph.add_node("second", second)
+    graph.add_edge(START, "first")
+    graph.add_edge("first", "second")
+    graph.add_edge("second", END)
+    return graph.compile(checkpointer=saver)
+
+
+def test_retry_resumes_after_completed_nodes(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+    calls, fail = {}, {"second": True}
+    graph = build(saver, calls, fail)
+    config = {"configurable": {"thread_id": "run-1"}}
+    with pytest.raises(RuntimeError):
+        graph.invoke({"steps": []}, config)
+    # A new saver on the same file stands in for another process
+    graph = build(SqliteCheckpointSaver(str(tmp_path / "checkpoints.db")), calls, fail)
+    assert graph.invoke(None, config)["steps"] == ["first", "second"]
+    assert calls == {"first": 1, "second": 2}
+
+
+def test_async_api_runs_off_the_event_loop(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+    threads = []
+    get_tuple = saver.get_tuple
+
+    def recording_get_tuple(config):
+        threads.append(threading.current_thread())
+        return get_tuple(config)
+
+    saver.get_tuple = recording_get_tuple
+    graph = build(saver, {}, {})
+    config = {"configurable": {"thread_id": "run-2"}}
+    result = asyncio.run(graph.ainvoke({"steps": []}, config))
+    assert result["steps"] == ["first", "second"]
+    assert threads and threading.main_thread() not in threads
+
+
+def test_delete_thread(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+    graph = build(saver, {}, {})
+    config = {"configurable": {"thread_id": "run-3"}}
+    graph.invoke({"steps": []}, config)
+    assert saver.get_tuple(config) is not None
+    saver.delete_thread("run-3")
+    assert saver.get_tuple(config) is None
+    assert list(saver.list(config)) == []
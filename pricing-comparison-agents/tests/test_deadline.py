@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.stubs import FakeSearchClient, LatencyDistribution
+from graph.graph_builder import arun_graph, run_graph
+from graph.retailers.registry import RETAILERS
+from graph.retailers.search import RETAILER_LATE, RETAILER_OK, make_retailer_node
+from utils.search_client import set_search_client_factory
+
+
+@pytest.mark.usefixtures("fake_search")
+def test_expired_deadline_marks_the_retailer_late():
+    node = make_retailer_node(RETAILERS["amazon"])
+    update = asyncio.run(node({"query": "iPhone 15", "deadline": time.time() - 1}))
+
+    assert update == {
+        "retailer_results": {"amazon": []},
+        "retailer_status": {"amazon": RETAILER_LATE},
+    }
+
+
+@pytest.mark.usefixtures("fake_search", "fake_model")
+def test_run_stops_waiting_at_the_deadline(recording):
+    client = FakeSearchClient(recording, LatencyDistribution("constant:5"))
+    set_search_client_factory(lambda: client)
+
+    started = time.perf_counter()
+    state = run_graph("iPhone 15", use_llm_cache=False, deadline=0.3)
+
+    assert time.perf_counter() - started < 3
+    late = dict.fromkeys(RETAILERS, RETAILER_LATE)
+    assert state["retailer_status"] == late
+    assert state["top_result"]["retailer_status"] == late
+    assert not any(state["retailer_results"].values())
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_resumed_run_gets_a_fresh_deadline(fake_search):
+    slow = LatencyDistribution("constant:5")
+    fake_search.domain_latency = {"walmart.com": slow}
+
+    async def interrupted_then_resumed():
+        run = arun_graph("iPhone 15", deadline=1.0, run_id="fresh-deadline")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(run, timeout=0.3)
+        # The first attempt's deadline passes before the retry
+        await asyncio.sleep(1.0)
+        fake_search.domain_latency = {}
+        return await arun_graph("iPhone 15", deadline=5.0, run_id="fresh-deadline")
+
+    state = asyncio.run(interrupted_then_resumed())
+    assert state["retailer_status"]["walmart"] == RETAILER_OK
+    assert state["retailer_results"]["walmart"]
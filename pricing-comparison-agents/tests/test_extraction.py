@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from graph import nodes
+from graph.extraction import (
+    AMBIGUOUS_PRICE_WEIGHT,
+    PRICE_WEIGHT,
+    extract_products,
+    parse_price,
+)
+from graph.matching import match_listings
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("Apple iPhone 15 Pro, $1,299 at Amazon", ("1299.00", PRICE_WEIGHT)),
+        ("List Price $999 Price $729 Free shipping", ("729.00", PRICE_WEIGHT)),
+        ("Was $999, save on the $849 bundle", ("999.00", AMBIGUOUS_PRICE_WEIGHT)),
+        ("US $24.99 with free returns", ("24.99", PRICE_WEIGHT)),
+        ("See the latest deals on iPhone 15 cases", (None, 0.0)),
+    ],
+)
+def test_parse_price(text, expected):
+    assert parse_price(text) == expected
+
+
+def listing(title, content, retailer="Amazon"):
+    return {
+        "title": title,
+        "url": f"https://example.com/{retailer}",
+        "content": content,
+        "image": "",
+        "retailer": retailer,
+    }
+
+
+CONFIDENT = listing(
+    "iPhone 15 128GB", "Now $729.00. In stock, ships today. 4.6 out of 5"
+)
+VAGUE = listing("Galaxy S24 256GB", "Check the product page for pricing", "Walmart")
+
+
+def test_products_resolve_only_when_every_offer_is_confident():
+    other = listing("iPhone 15 128GB", "Price: $719.99 Add to cart", "Best Buy")
+    products, unresolved = extract_products(
+        match_listings([CONFIDENT, other, VAGUE]), 0.7
+    )
+    assert [matched["listings"] for matched in unresolved] == [[VAGUE]]
+    assert len(products) == 1
+    assert [r["price"] for r in products[0]["retailers"]] == ["729.00", "719.99"]
+    assert products[0]["rating"] == "4.6"
+
+
+def state_after_extraction(listings):
+    state = {"compare_results": listings, "query": "iPhone 15"}
+    state.update(nodes.match_node(state))
+    return {**state, **nodes.extract_node(state)}
+
+
+def test_llm_fallback_only_sees_low_confidence_listings(monkeypatch):
+    prompts = []
+    llm_product = {"title": "Galaxy S24 256GB", "retailers": [{"name": "Walmart"}]}
+
+    def invoke_model(messages, **_kwargs):
+        prompts.append(messages[1].content)
+        return AIMessage(content=json.dumps({"products": [llm_product]}))
+
+    monkeypatch.setattr(nodes, "invoke_model", invoke_model)
+    state = state_after_extraction([CONFIDENT, VAGUE])
+    products = nodes.compare_node(state)["top_result"]["products"]
+
+    assert len(prompts) == 1
+    assert VAGUE["content"] in prompts[0]
+    assert CONFIDENT["content"] not in prompts[0]
+    assert products[-1] == llm_product
+    assert products[0]["retailers"][0]["price"] == "729.00"
+
+
+def test_llm_is_skipped_when_everything_resolves(monkeypatch):
+    monkeypatch.setattr(nodes, "invoke_model", pytest.fail)
+    state = state_after_extraction([CONFIDENT])
+    products = nodes.compare_node(state)["top_result"]["products"]
+    assert [p["title"] for p in products] == ["iPhone 15 128GB"]
@@ -0,0 +1,11 @@
+from graph.graph_builder import run_graph
+
+
+def test_recorded_run_compares_every_retailer(fake_search, fake_model):
+    state = run_graph("iPhone 15", use_llm_cache=False)
+
+    assert fake_search.calls == 3
+    assert set(state["retailer_results"]) == {"amazon", "bestbuy", "walmart"}
+    assert state["top_result"]["products"]
+    assert state["summary"]
+    assert fake_model.calls >= 1
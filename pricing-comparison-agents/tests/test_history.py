@@ -0,0 +1,21 @@
+import pytest
+
+from graph.history import parse_stored_price
+
+
+@pytest.mark.parametrize(
+    "price, expected",
+    [
+        ("729.99", 729.99),
+        ("$1,299.99", 1299.99),
+        ("1,299", 1299.0),
+        # The compare prompt asks for XX,XX
+        ("729,99", 729.99),
+        ("1.299,99", 1299.99),
+        (729.5, 729.5),
+        ("", None),
+        ("n/a", None),
+    ],
+)
+def test_parse_stored_price(price, expected):
+    assert parse_stored_price(price) == expected
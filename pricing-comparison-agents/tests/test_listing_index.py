@@ -0,0 +1,105 @@
+import pytest
+
+from graph.retailers import listings
+from graph.retailers.registry import RetailerConfig
+from utils.listing_index import COMPACT_MIN_DEAD, ListingIndex
+
+RETAILER = RetailerConfig(key="amazon", name="Amazon", domain="amazon.com")
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = ListingIndex(str(tmp_path / "listings.db"))
+    monkeypatch.setattr(listings, "get_listing_index", lambda: index)
+    return index
+
+
+def add(index: ListingIndex, titles: list[str]):
+    hits = [
+        {"title": title, "url": f"https://amazon.com/{i}", "content": ""}
+        for i, title in enumerate(titles)
+    ]
+    index.add(hits, listings.normalize_titles(titles), RETAILER.key)
+
+
+def test_accessory_listings_dont_answer_the_product(index):
+    add(
+        index,
+        [
+            "Apple iPhone 15 Case Clear MagSafe",
+            "OtterBox iPhone 15 Defender Series Case",
+            "Spigen iPhone 15 Screen Protector 2 Pack",
+            "Apple iPhone 15 Silicone Case - Black",
+        ],
+    )
+    assert listings.lookup_listings("iphone 15", RETAILER) is None
+    assert len(listings.lookup_listings("iphone 15 case", RETAILER)) == 3
+
+
+def test_product_listings_answer_the_product(index):
+    add(
+        index,
+        [
+            "Apple iPhone 15 (128 GB) - Black",
+            "Apple iPhone 15 Case Clear MagSafe",
+            "Apple - iPhone 15 256GB - Blue (Unlocked)",
+            "Apple iPhone 15 Pro 256GB Natural Titanium",
+            "Apple iPhone 15 512GB Pink",
+        ],
+    )
+    hits = listings.lookup_listings("iphone 15", RETAILER)
+    assert sorted(hit["title"] for hit in hits) == [
+        "Apple - iPhone 15 256GB - Blue (Unlocked)",
+        "Apple iPhone 15 (128 GB) - Black",
+        "Apple iPhone 15 512GB Pink",
+    ]
+
+
+@pytest.mark.parametrize(
+    "query, title, expected",
+    [
+        ("iphone 15", "Apple iPhone 15 (128 GB) - Black", True),
+        ("iphone 15", "Apple iPhone 15 Case Clear MagSafe", False),
+        ("iphone 15", "Apple iPhone 15 Pro 256GB Natural Titanium", False),
+        ("iphone 15 case", "Apple iPhone 15 Case Clear MagSafe", True),
+    ],
+)
+def test_covers(query, title, expected):
+    query_tokens = set(listings.normalize_title(query))
+    assert listings.covers(query_tokens, listings.normalize_title(title)) is expected
+
+
+def test_replaced_listing_drops_its_old_terms(tmp_path):
+    index = ListingIndex(str(tmp_path / "listings.db"))
+    index.add(
+        [{"url": "u1", "title": "iphone 15 case"}], [["iphone", "15", "case"]], "amazon"
+    )
+    index.add([{"url": "u1", "title": "iphone 15"}], [["iphone", "15"]], "amazon")
+
+    assert index.search(["case"], "amazon", 10) == []
+    assert [
+        listing["title"] for listing, _ in index.search(["iphone"], "amazon", 10)
+    ] == ["iphone 15"]
+
+
+def test_replaced_listings_are_reclaimed(tmp_path):
+    path = str(tmp_path / "listings.db")
+    index = ListingIndex(path)
+    index.add([{"url": "u0"}], [["galaxy", "s24"]], "amazon")
+    for i in range(1000):
+        index.add(
+            [{"url": "u1"}, {"url": "u2"}],
+            [["iphone", "15", str(i)], ["iphone", "15", "pro"]],
+            "amazon",
+        )
+
+    assert len(index) == 3
+    assert len(index._alive) <= 2 * COMPACT_MIN_DEAD
+    assert (
+        sum(len(postings.ids) for postings in index._postings.values())
+        <= 6 * COMPACT_MIN_DEAD
+    )
+    assert [listing["url"] for listing, _ in index.search(["999"], "amazon", 10)] == [
+        "u1"
+    ]
+    assert len(ListingIndex(path)) == 3
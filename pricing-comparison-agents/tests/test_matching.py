@@ -0,0 +1,94 @@
+from graph.matching import (
+    MATCH_THRESHOLD,
+    match_listings,
+    normalize_title,
+    similarity_matrix,
+)
+from graph.retailers.registry import get_retailers
+from graph.retailers.search import process_search_results
+
+
+def recorded_listings(recording: dict) -> list[dict]:
+    listings = []
+    for retailer in get_retailers():
+        search = recording["search"][retailer.domain]
+        listings += process_search_results(search, retailer)
+    return listings
+
+
+def cluster_titles(listings: list[dict], **kwargs) -> set[tuple[str, ...]]:
+    return {
+        tuple(sorted(listing["title"] for listing in matched["listings"]))
+        for matched in match_listings(listings, **kwargs)
+    }
+
+
+def test_recording_splits_variants(recording):
+    assert cluster_titles(recorded_listings(recording)) == {
+        (
+            "Apple - iPhone 15 128GB - Black (Unlocked)",
+            "Apple iPhone 15 (128 GB) - Black",
+            "Apple iPhone 15 128GB Black Unlocked",
+        ),
+        (
+            "Apple - iPhone 15 256GB - Blue (Unlocked)",
+            "Apple iPhone 15 (256 GB) - Blue",
+        ),
+        (
+            "Apple - iPhone 15 Pro 256GB - Natural Titanium",
+            "Apple iPhone 15 Pro 256GB Natural Titanium",
+            "Apple iPhone 15 Pro 256GB Natural Titanium",
+        ),
+    }
+
+
+def test_each_cluster_has_one_listing_per_retailer(recording):
+    for matched in match_listings(recorded_listings(recording)):
+        retailers = [listing["retailer"] for listing in matched["listings"]]
+        assert len(retailers) == len(set(retailers))
+
+
+def test_titles_keep_words_after_the_sixth():
+    assert "blue" in normalize_title("Apple iPhone 15 (256 GB) - Blue")
+    title = "Apple - iPhone 15 Pro 256GB - Natural Titanium"
+    assert "titanium" in normalize_title(title)
+
+
+def test_variant_and_number_words_veto_a_match():
+    scores = similarity_matrix(
+        [
+            normalize_title(title)
+            for title in (
+                "Apple iPhone 15 256GB Black",
+                "Apple iPhone 15 Pro 256GB Black",
+                "Apple iPhone 14 256GB Black",
+                "Apple iPhone 15 256GB Black Unlocked",
+            )
+        ]
+    )
+    assert scores[0, 1] == 0.0
+    assert scores[0, 2] == 0.0
+    assert scores[0, 3] >= MATCH_THRESHOLD
+
+
+def test_clusters_do_not_chain():
+    # The middle listing is close to both others, which are different products
+    listings = [
+        {
+            "title": title,
+            "url": f"https://example.com/{i}",
+            "content": "",
+            "retailer": retailer,
+        }
+        for i, (title, retailer) in enumerate(
+            [
+                ("Acme Blender Black", "Amazon"),
+                ("Acme Blender Black Steel Jar", "Walmart"),
+                ("Acme Steel Jar Lid", "Best Buy"),
+            ]
+        )
+    ]
+    assert cluster_titles(listings, threshold=0.35) == {
+        ("Acme Blender Black", "Acme Blender Black Steel Jar"),
+        ("Acme Steel Jar Lid",),
+    }
@@ -0,0 +1,70 @@
+import multiprocessing
+
+import numpy as np
+
+from utils.price_history import PriceHistory
+
+
+def test_query_and_window_stats(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    history.append([("tv", "Amazon", 500.0, True), ("tv", "Walmart", 480.0, True)], 100)
+    history.append([("tv", "Amazon", 450.0, True), ("tv", "Walmart", None, False)], 200)
+    assert history.query("tv", "Amazon")["price"].tolist() == [500.0, 450.0]
+    assert history.query("tv", "Amazon", since=150)["price"].tolist() == [450.0]
+    stats = history.window_stats([("tv", "Amazon"), ("tv", "Walmart"), ("tv", "x")])
+    assert stats[("tv", "Amazon")] == {
+        "count": 2,
+        "min": 450.0,
+        "max": 500.0,
+        "p50": 475.0,
+    }
+    assert stats[("tv", "Walmart")]["count"] == 1
+    assert ("tv", "x") not in stats
+
+
+def test_two_writers_keep_distinct_series(tmp_path):
+    # Each instance stands in for another process with its own view of the files
+    first, second = PriceHistory(str(tmp_path)), PriceHistory(str(tmp_path))
+    first.append([("tv", "Amazon", 500.0, True)], 100)
+    second.append([("phone", "Amazon", 700.0, True)], 110)
+    first.append([("laptop", "Walmart", 900.0, True)], 120)
+    assert len(first) == len(second) == 3
+    ids = {
+        first.series_id("tv", "Amazon"),
+        first.series_id("phone", "Amazon"),
+        first.series_id("laptop", "Walmart"),
+    }
+    assert len(ids) == 3
+    assert first.query("phone", "Amazon")["price"].tolist() == [700.0]
+    assert second.query("laptop", "Walmart")["price"].tolist() == [900.0]
+
+
+def _write(path: str, worker: int, rounds: int):
+    history = PriceHistory(path)
+    for i in range(rounds):
+        history.append(
+            [
+                (f"product {worker}", "Amazon", float(i), True),
+                ("shared", "Amazon", float(i), True),
+            ]
+        )
+
+
+def test_concurrent_processes_lose_no_rows(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=_write, args=(str(tmp_path), worker, 50))
+        for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    history = PriceHistory(str(tmp_path))
+    assert len(history) == 400
+    timestamps = history.query("shared", "Amazon")["timestamp"]
+    assert len(timestamps) == 200
+    assert np.all(np.diff(timestamps) >= 0)
+    for worker in range(4):
+        prices = history.query(f"product {worker}", "Amazon")["price"]
+        assert prices.tolist() == [float(i) for i in range(50)]
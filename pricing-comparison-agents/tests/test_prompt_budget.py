@@ -0,0 +1,65 @@
+import json
+
+from graph.prompt_budget import (
+    MIN_CONTENT_TOKENS,
+    build_compare_payload,
+    count_tokens,
+    trim_content,
+)
+
+FILLER = "Shop our wide range of accessories and see all the latest offers. " * 20
+
+
+def record(title: str) -> dict:
+    content = f"{FILLER} {title} now $729.00, in stock. {FILLER}"
+    return {
+        "title": title,
+        "url": f"https://example.com/{title}",
+        "offers": [
+            {"retailer": "Amazon", "url": "https://example.com", "content": content}
+        ],
+    }
+
+
+def test_trim_content_keeps_price_and_stock_context():
+    text = FILLER + " Now $729.00, in stock. " + FILLER
+    trimmed = trim_content(text, 40)
+    assert count_tokens(trimmed) <= 40
+    assert "$729.00" in trimmed
+    assert trim_content("Now $729.00", 40) == "Now $729.00"
+
+
+def test_content_is_trimmed_before_products_are_dropped():
+    records = [record(f"Product {i}") for i in range(3)]
+    full = count_tokens(json.dumps(records))
+    payload, stats = build_compare_payload(records, full // 2, 1000)
+
+    assert stats["dropped_products"] == 0
+    assert stats["prompt_tokens"] <= full // 2
+    sent = json.loads(payload)
+    assert [r["title"] for r in sent] == ["Product 0", "Product 1", "Product 2"]
+    assert all("$729.00" in r["offers"][0]["content"] for r in sent)
+
+
+def test_trailing_products_are_dropped_last():
+    records = [record(f"Product {i}") for i in range(6)]
+    _, single = build_compare_payload(records[:1], 10_000, MIN_CONTENT_TOKENS)
+    one_product = single["prompt_tokens"]
+    payload, stats = build_compare_payload(records, one_product * 3, 1000)
+
+    sent = json.loads(payload)
+    assert stats["dropped_products"] == 6 - len(sent) > 0
+    assert [r["title"] for r in sent] == [f"Product {i}" for i in range(len(sent))]
+    assert stats["prompt_tokens"] <= one_product * 3
+
+
+def test_tokens_saved_is_measured_against_the_raw_input():
+    records = [record("Product 0")]
+    raw_listings = [
+        {"listings": [dict(records[0]["offers"][0], title="Product 0")] * 3}
+    ]
+    _, stats = build_compare_payload(records, 10_000, 1000, raw_input=raw_listings)
+
+    assert stats["raw_tokens"] == count_tokens(repr(raw_listings))
+    assert stats["tokens_saved"] == stats["raw_tokens"] - stats["prompt_tokens"]
+    assert stats["tokens_saved"] > count_tokens(repr(records)) - stats["prompt_tokens"]
@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.stubs import FakeSearchClient, FakeSearchError, LatencyDistribution
+from utils import resilience
+from utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    RetryBudget,
+    resilient_call,
+)
+
+KEY = "amazon.com"
+
+
+class LatencySequence:
+    """Latencies handed out in order, one per call, for a FakeSearchClient."""
+
+    def __init__(self, *latencies: float):
+        self.latencies = list(latencies)
+
+    def sample(self) -> float:
+        return self.latencies.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    # No latency history (so no hedging) and a budget for two retries, unless a test
+    # says otherwise
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "latency_tracker", LatencyTracker())
+    monkeypatch.setattr(resilience, "retry_budget", RetryBudget(ratio=0.0, reserve=2.0))
+
+
+def client(
+    recording: dict, failure_rate: float = 0.0, latency=None
+) -> FakeSearchClient:
+    return FakeSearchClient(
+        recording,
+        latency or LatencyDistribution("constant:0"),
+        failure_rate=failure_rate,
+    )
+
+
+def cool_down(breaker: CircuitBreaker):
+    # As if the cool-down had passed, without sleeping through it
+    breaker._opened_at -= breaker.cooldown
+
+
+def search(fake: FakeSearchClient, **kwargs):
+    return asyncio.run(
+        resilient_call(
+            KEY, lambda: fake.search("iphone 15", include_domains=[KEY]), **kwargs
+        )
+    )
+
+
+def test_breaker_opens_then_half_opens_then_closes(recording, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    monkeypatch.setattr(resilience, "_breakers", {KEY: breaker})
+    fake = client(recording, failure_rate=1.0)
+    for _ in range(2):
+        with pytest.raises(FakeSearchError):
+            search(fake, max_retries=0)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        search(fake, max_retries=0)
+    assert fake.calls == 2
+
+    cool_down(breaker)
+    assert breaker.state == "half-open"
+    fake.failure_rate = 0.0
+    assert search(fake, max_retries=0)["results"]
+    assert breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_one_trial_through_and_reopens_on_failure():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    assert breaker.record_failure()
+    assert not breaker.allow()
+
+    cool_down(breaker)
+    assert breaker.allow()
+    assert not breaker.allow()  # the trial is still in flight
+    assert breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_retries_stop_when_the_budget_is_spent(recording):
+    fake = client(recording, failure_rate=1.0)
+    with pytest.raises(FakeSearchError):
+        search(fake, max_retries=5, backoff=0)
+    # One call plus the two retries the reserve allows
+    assert fake.calls == 3
+
+    with pytest.raises(FakeSearchError):
+        search(fake, max_retries=5, backoff=0)
+    assert fake.calls == 4
+
+
+def test_retries_recover_from_a_transient_failure(recording):
+    fake = client(recording, failure_rate=1.0)
+    make_call = fake.search
+
+    async def flaky(*args, **kwargs):
+        if fake.calls:
+            fake.failure_rate = 0.0
+        return await make_call(*args, **kwargs)
+
+    fake.search = flaky
+    assert search(fake, max_retries=2, backoff=0)["results"]
+    assert fake.calls == 2
+
+
+def test_hedge_wins_and_cancels_the_slow_call(recording, monkeypatch):
+    tracker = LatencyTracker(min_samples=20)
+    for _ in range(20):
+        tracker.record(KEY, 0.01)
+    monkeypatch.setattr(resilience, "latency_tracker", tracker)
+    # The first call stalls, the hedge started after ~10ms answers at once
+    fake = client(recording, latency=LatencySequence(5.0, 0.0))
+    cancelled = []
+
+    async def make_call():
+        try:
+            return await fake.search("iphone 15", include_domains=[KEY])
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        started = time.monotonic()
+        result = await resilient_call(KEY, make_call)
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(0.01)
+        # Checked before asyncio.run cancels whatever is left over on exit
+        return result, elapsed, list(cancelled)
+
+    result, elapsed, cancelled_before_exit = asyncio.run(run())
+    assert result["results"]
+    assert elapsed < 1.0
+    assert fake.calls == 2
+    assert cancelled_before_exit == [True]
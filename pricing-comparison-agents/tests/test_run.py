@@ -0,0 +1,31 @@
+import asyncio
+import json
+
+import pytest
+
+import run
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_new_sweep_searches_again(tmp_path, fake_search):
+    output = str(tmp_path / "results.jsonl")
+    for _ in range(2):
+        stats = asyncio.run(run.run_batch(["iphone 15"], output, 1, resume=False))
+        assert stats["ok"] == 1
+    # The second sweep didn't get the first one's finished checkpoint back
+    assert fake_search.calls == 6
+
+
+@pytest.mark.usefixtures("fake_search", "fake_model")
+def test_resume_continues_the_recorded_sweep(tmp_path):
+    output = str(tmp_path / "results.jsonl")
+    asyncio.run(run.run_batch(["iphone 15"], output, 1, resume=False))
+    with open(output) as f:
+        sweep = json.loads(f.readline())["sweep"]
+    assert run.previous_sweep(output) == sweep
+    stats = asyncio.run(
+        run.run_batch(["iphone 15", "galaxy s24"], output, 1, resume=True)
+    )
+    assert stats["skipped"] == 1
+    with open(output) as f:
+        assert {json.loads(line)["sweep"] for line in f if line.strip()} == {sweep}
@@ -0,0 +1,48 @@
+import asyncio
+import dataclasses
+
+from graph.retailers.registry import RETAILERS
+from graph.retailers.search import (
+    PLACEHOLDER_IMAGE,
+    RETAILER_OK,
+    search_params,
+    search_retailer,
+)
+
+
+def test_stage_params():
+    amazon = RETAILERS["amazon"]
+    assert search_params(amazon) == {
+        "search_depth": amazon.search_depth,
+        "max_results": amazon.max_results,
+        "include_domains": [amazon.domain],
+        "include_images": False,
+    }
+    assert search_params(amazon, escalated=True) == {
+        "search_depth": amazon.escalate_search_depth,
+        "max_results": amazon.escalate_max_results,
+        "include_domains": [amazon.domain],
+        "include_images": True,
+    }
+
+    configured = dataclasses.replace(amazon, cheap_images=True, escalate_images=False)
+    assert search_params(configured)["include_images"] is True
+    assert search_params(configured, escalated=True)["include_images"] is False
+
+
+def test_cheap_search_is_image_free(fake_search):
+    hits, status = asyncio.run(search_retailer("iphone 15", RETAILERS["amazon"]))
+    assert status == RETAILER_OK
+    # The recording has priced, in-stock hits, so there is no escalation
+    assert fake_search.calls == 1
+    assert hits and all(hit["image"] == PLACEHOLDER_IMAGE for hit in hits)
+
+
+def test_escalates_when_no_price(fake_search):
+    for result in fake_search.searches["bestbuy.com"]["results"]:
+        result["content"] = "Great phone."
+    hits, status = asyncio.run(search_retailer("iphone 15", RETAILERS["bestbuy"]))
+    assert status == RETAILER_OK
+    assert fake_search.calls == 2
+    # The escalated search brings the images
+    assert hits and hits[0]["image"] != PLACEHOLDER_IMAGE
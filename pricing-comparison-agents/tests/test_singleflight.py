@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from benchmarks.stubs import FakeSearchClient, LatencyDistribution
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_request(recording):
+    client = FakeSearchClient(recording, LatencyDistribution("constant:0.05"))
+    flight = AsyncSingleFlight("test")
+
+    async def run():
+        def search():
+            return client.search("iphone 15", include_domains=["amazon.com"])
+
+        return await asyncio.gather(
+            *(flight.do("amazon iphone 15", search) for _ in range(5))
+        )
+
+    results = asyncio.run(run())
+    assert client.calls == 1
+    assert all(result is results[0] for result in results)
+    assert (flight.calls, flight.collapsed) == (5, 4)
+
+
+def test_error_reaches_every_caller_and_the_key_is_freed():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        results = await asyncio.gather(
+            *(flight.do("key", fail) for _ in range(3)), return_exceptions=True
+        )
+        # The failed call isn't cached, the next one runs again
+        with pytest.raises(ValueError):
+            await flight.do("key", fail)
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 2
+
+
+def test_shared_call_is_cancelled_with_its_last_caller():
+    flight = AsyncSingleFlight("test")
+
+    async def run():
+        stopped = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        callers = [asyncio.ensure_future(flight.do("key", slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not stopped.is_set()
+        callers[1].cancel()
+        await asyncio.wait_for(stopped.wait(), timeout=1)
+
+    asyncio.run(run())
+
+
+def test_blocking_callers_share_one_call():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return {"price": 729.0}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+    leader.start()
+    started.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    while flight.calls < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"price": 729.0}] * 4
@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.stubs import FakeChatModel, LatencyDistribution
+from graph import summary
+from graph.llm import set_model
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_stream_yields_chunks_and_shares_the_result(recording):
+    top_result = {"products": [], "test": "stream"}
+    chunks = list(summary.stream_llm_summary(top_result, use_cache=False))
+    assert len(chunks) > 1
+    assert "".join(chunks) == recording["llm"]["summary"]
+    # Asking again reuses the streamed summary instead of calling the model
+    assert list(summary.stream_llm_summary(top_result, use_cache=False)) == [
+        "".join(chunks)
+    ]
+    assert summary.summarize_in_background(
+        top_result, use_cache=False
+    ).result() == "".join(chunks)
+
+
+def test_abandoned_stream_is_written_again(fake_model):
+    top_result = {"products": [], "test": "abandoned"}
+    chunks = summary.stream_llm_summary(top_result, use_cache=False)
+    next(chunks)
+    chunks.close()
+    assert "".join(summary.stream_llm_summary(top_result, use_cache=False))
+    assert fake_model.calls == 2
+
+
+def test_concurrent_requests_share_one_summary(recording):
+    model = FakeChatModel(recording, LatencyDistribution("constant:0.05"))
+    set_model(model)
+    top_result = {"products": [], "test": "concurrent"}
+    barrier = threading.Barrier(8)
+
+    def ask(_):
+        barrier.wait()
+        return summary.summarize_in_background(top_result, use_cache=False)
+
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            futures = list(pool.map(ask, range(8)))
+        assert len({id(future) for future in futures}) == 1
+        futures[0].result()
+        assert model.calls == 1
+    finally:
+        set_model(None)
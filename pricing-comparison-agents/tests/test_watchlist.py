@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from graph import watchlist
+from graph.retailers import search
+from graph.retailers.search import normalize_query
+
+
+def drop_amazon_price(fake_search):
+    listing = fake_search.searches["amazon.com"]["results"][0]
+    listing["content"] = listing["content"].replace("$729.00", "$699.00")
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_refresh_searches_live_despite_cache(fake_search, monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_CACHE_ENABLED", True)
+    query = "apple iphone 15 watch live"
+    assert asyncio.run(watchlist.refresh_query(query)) == []
+    calls = fake_search.calls
+
+    drop_amazon_price(fake_search)
+    events = asyncio.run(watchlist.refresh_query(query))
+    assert fake_search.calls == 2 * calls
+    assert {
+        "type": "price_drop",
+        "retailer": "Amazon",
+        "before": 729.0,
+        "after": 699.0,
+    }.items() <= events[0].items()
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_refresh_diffs_answered_retailers_and_carries_the_rest(
+    fake_search, monkeypatch
+):
+    query = "apple iphone 15 watch partial"
+    assert asyncio.run(watchlist.refresh_query(query)) == []
+    first = watchlist.get_watchlist_store().get(normalize_query(query))
+    walmart = {
+        key: offer for key, offer in first["offers"].items() if key.endswith("|Walmart")
+    }
+    assert walmart
+
+    replay = fake_search.search
+
+    async def search_without_walmart(query, **params):
+        if params["include_domains"] == ["walmart.com"]:
+            raise ConnectionError("walmart.com is down")
+        return await replay(query, **params)
+
+    monkeypatch.setattr(fake_search, "search", search_without_walmart)
+    drop_amazon_price(fake_search)
+    events = asyncio.run(watchlist.refresh_query(query))
+
+    assert [(event["type"], event["retailer"]) for event in events] == [
+        ("price_drop", "Amazon")
+    ]
+    second = watchlist.get_watchlist_store().get(normalize_query(query))
+    assert {key: second["offers"][key] for key in walmart} == walmart
+    assert second["fingerprints"]["Walmart"] == first["fingerprints"]["Walmart"]
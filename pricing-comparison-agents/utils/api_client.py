@@ -0,0 +1,65 @@
+# utils/api_client.py
+
+import json
+
+import httpx
+
+from config.settings import COMPARISON_API_TIMEOUT
+
+
+class ComparisonBusy(Exception):
+    """The comparison API rejected the request because its worker pool is full."""
+
+
+def stream_comparison(api_url: str, query: str, use_llm_cache: bool = True):
+    """
+    Streams a comparison from the API, yielding the same (event, node, payload)
+    tuples as graph.graph_builder.stream_graph.
+
+    Raises:
+        ComparisonBusy: The API answered 429.
+        RuntimeError: The comparison failed on the server.
+    """
+    with httpx.stream(
+        "GET",
+        f"{api_url.rstrip('/')}/compare/stream",
+        params={"query": query, "use_llm_cache": use_llm_cache},
+        timeout=COMPARISON_API_TIMEOUT,
+    ) as response:
+        if response.status_code == 429:
+            raise ComparisonBusy(response.headers.get("Retry-After", ""))
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message["event"] == "error":
+                raise RuntimeError(message["data"])
+            yield message["event"], message["node"], message["data"]
+
+
+def stream_summary(api_url: str, top_result: dict, use_llm_cache: bool = True):
+    """
+    Streams the LLM-written summary of a comparison from the API, yielding its
+    text as the model writes it.
+
+    Raises:
+        ComparisonBusy: The API answered 429.
+        RuntimeError: The summary failed on the server.
+    """
+    with httpx.stream(
+        "POST",
+        f"{api_url.rstrip('/')}/summary/stream",
+        json={"top_result": top_result, "use_llm_cache": use_llm_cache},
+        timeout=COMPARISON_API_TIMEOUT,
+    ) as response:
+        if response.status_code == 429:
+            raise ComparisonBusy(response.headers.get("Retry-After", ""))
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message["event"] == "error":
+                raise RuntimeError(message["data"])
+            yield message["data"]
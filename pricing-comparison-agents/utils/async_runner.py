@@ -0,0 +1,45 @@
+# utils/async_runner.py
+
+import asyncio
+import threading
+
+_loop = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="graph-event-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine on the shared background event loop and blocks until it finishes.
+
+    Synchronous callers (the CLI, Streamlit script threads) all land on the same
+    loop, so they share its pooled clients and concurrency limits.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def iterate_sync(agen):
+    """
+    Drives an async generator on the shared background loop and yields its items
+    to a synchronous caller as soon as each one is produced. A caller that stops
+    early closes the async generator too.
+    """
+    loop = _get_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
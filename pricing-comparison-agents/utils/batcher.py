@@ -0,0 +1,102 @@
+# utils/batcher.py
+
+import threading
+
+from utils.metrics import metrics
+
+# Histogram buckets for items per batch
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class _Slot:
+    __slots__ = ("item", "done", "result", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Groups concurrent blocking calls: submit() queues an item and waits until
+    max_size items are queued or max_wait seconds have passed since the first
+    one, then a single handler(items) call answers the whole batch and every
+    caller gets the result at its own position.
+
+    handler must return one result per item, in order; an exception instance in
+    place of a result is raised to that item's caller only.
+    """
+
+    def __init__(self, name: str, handler, max_size: int, max_wait: float):
+        self.name = name
+        self.handler = handler
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._pending = []
+        self._generation = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def _take(self) -> list[_Slot]:
+        batch, self._pending = self._pending, []
+        self._generation += 1
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush_after_wait(self, generation: int):
+        with self._lock:
+            # The batch this timer was started for may already have filled up and gone
+            batch = self._take() if generation == self._generation else []
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch: list[_Slot]):
+        self.batches += 1
+        self.items += len(batch)
+        metrics.observe(
+            "batch_size", len(batch), buckets=BATCH_BUCKETS, batcher=self.name
+        )
+        try:
+            results = self.handler([slot.item for slot in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        if len(results) != len(batch):
+            # Waiters without a result would block forever
+            error = ValueError(
+                f"{self.name} handler answered {len(results)} of {len(batch)} items"
+            )
+            results = [error] * len(batch)
+        for slot, result in zip(batch, results, strict=True):
+            if isinstance(result, Exception):
+                slot.error = result
+            else:
+                slot.result = result
+            slot.done.set()
+
+    def submit(self, item):
+        """Returns the handler's result for item, once its batch has been answered."""
+        slot = _Slot(item)
+        batch = None
+        with self._lock:
+            self._pending.append(slot)
+            if len(self._pending) >= self.max_size:
+                batch = self._take()
+            elif len(self._pending) == 1:
+                self._timer = threading.Timer(
+                    self.max_wait, self._flush_after_wait, args=(self._generation,)
+                )
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            # The caller that fills the batch sends it, without waiting for the timer
+            self._run(batch)
+        slot.done.wait()
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
@@ -0,0 +1,242 @@
+# utils/listing_index.py
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+# The in-memory index is rebuilt from SQLite once replaced listings take up more than
+# this share of its slots, and at least COMPACT_MIN_DEAD of them
+COMPACT_DEAD_RATIO = 0.5
+COMPACT_MIN_DEAD = 256
+
+
+class _Postings:
+    """Documents containing one term and how often, as growable typed arrays."""
+
+    __slots__ = ("ids", "tf")
+
+    def __init__(self):
+        self.ids = array("i")
+        self.tf = array("H")
+
+
+class ListingIndex:
+    """
+    Incremental BM25 inverted index over retailer listings.
+
+    Callers index pre-tokenized titles; each listing is stored in SQLite and
+    its postings are kept in memory, so a lookup scores only the documents
+    containing a query term, with numpy, and reads back just the top hits. A
+    listing seen again under the same url replaces the earlier copy, leaving a
+    dead slot behind until the in-memory index is next rebuilt. Listings older
+    than `retention` seconds are dropped whenever it is (re)built.
+    """
+
+    def __init__(self, path: str, retention: float = None):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            "id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, source TEXT NOT NULL, "
+            "tokens TEXT NOT NULL, listing TEXT NOT NULL, seen_at REAL NOT NULL)"
+        )
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _load(self):
+        """(Re)builds the in-memory index from the listings table."""
+        self._postings = {}
+        self._slots_by_url = {}
+        self._sources = {}
+        # Per slot, in the order listings were added; replaced ones stay as dead slots.
+        # Slots are not SQLite rowids, which get reused when the last row is replaced
+        self._rowids = array("q")
+        self._lengths = array("H")
+        self._source_ids = array("h")
+        self._seen_at = array("d")
+        self._alive = bytearray()
+        self._live = 0
+        self._total_length = 0
+        if self.retention is not None:
+            self._conn.execute(
+                "DELETE FROM listings WHERE seen_at < ?",
+                (time.time() - self.retention,),
+            )
+        for rowid, url, source, tokens, seen_at in self._conn.execute(
+            "SELECT id, url, source, tokens, seen_at FROM listings ORDER BY id"
+        ):
+            self._add_document(rowid, url, source, tokens.split(), seen_at)
+
+    def _compact_if_needed(self):
+        dead = len(self._alive) - self._live
+        if dead >= COMPACT_MIN_DEAD and dead > len(self._alive) * COMPACT_DEAD_RATIO:
+            self._load()
+
+    def _add_document(
+        self, rowid: int, url: str, source: str, tokens: list[str], seen_at: float
+    ):
+        previous = self._slots_by_url.get(url)
+        if previous is not None and self._alive[previous]:
+            # Postings keep pointing at the dead slot; lookups mask it out
+            self._alive[previous] = 0
+            self._live -= 1
+            self._total_length -= self._lengths[previous]
+        slot = len(self._alive)
+        self._slots_by_url[url] = slot
+        self._rowids.append(rowid)
+        self._lengths.append(min(len(tokens), 65535))
+        self._source_ids.append(self._sources.setdefault(source, len(self._sources)))
+        self._seen_at.append(seen_at)
+        self._alive.append(1)
+        self._live += 1
+        self._total_length += self._lengths[slot]
+        for term, count in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.ids.append(slot)
+            postings.tf.append(min(count, 65535))
+
+    def add(
+        self,
+        listings: list[dict],
+        tokens: list[list[str]],
+        source: str,
+        seen_at: float = None,
+    ):
+        """
+        Indexes listings (dicts with at least a "url") under their title tokens.
+
+        Args:
+            source: What the listings are looked up by later, e.g. the retailer key.
+            seen_at: When the listings were fetched, defaults to now.
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        documents = [
+            (listing, listing_tokens)
+            for listing, listing_tokens in zip(listings, tokens, strict=True)
+            if listing_tokens
+        ]
+        with self._lock:
+            # One transaction per batch rather than a commit per listing
+            self._conn.execute("BEGIN")
+            try:
+                rowids = []
+                for listing, listing_tokens in documents:
+                    self._conn.execute(
+                        "DELETE FROM listings WHERE url = ?", (listing["url"],)
+                    )
+                    rowids.append(
+                        self._conn.execute(
+                            "INSERT INTO listings (url, source, tokens, listing, "
+                            "seen_at) VALUES (?, ?, ?, ?, ?)",
+                            (
+                                listing["url"],
+                                source,
+                                " ".join(listing_tokens),
+                                json.dumps(listing),
+                                seen_at,
+                            ),
+                        ).lastrowid
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            for rowid, (listing, listing_tokens) in zip(rowids, documents, strict=True):
+                self._add_document(
+                    rowid, listing["url"], source, listing_tokens, seen_at
+                )
+            self._compact_if_needed()
+
+    def _top_slots(
+        self, postings: list[_Postings], source_id: int, limit: int, max_age: float
+    ) -> list[int]:
+        # The numpy views over the growable arrays must not outlive the lock, or appends
+        # would fail
+        size = len(self._alive)
+        lengths = np.frombuffer(self._lengths, dtype=np.uint16)
+        average_length = self._total_length / self._live
+        scores = np.zeros(size, dtype=np.float32)
+        matched = np.zeros(size, dtype=np.uint16)
+        for term_postings in postings:
+            ids = np.frombuffer(term_postings.ids, dtype=np.int32)
+            tf = np.frombuffer(term_postings.tf, dtype=np.uint16).astype(np.float32)
+            # Postings include dead slots, close enough for document frequency
+            idf = math.log(1 + (self._live - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / average_length)
+            scores[ids] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            matched[ids] += 1
+        candidates = (matched == len(postings)) & (
+            np.frombuffer(self._source_ids, dtype=np.int16) == source_id
+        )
+        candidates &= np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        if max_age is not None:
+            candidates &= (
+                np.frombuffer(self._seen_at, dtype=np.float64) >= time.time() - max_age
+            )
+        slots = np.flatnonzero(candidates)
+        if len(slots) > limit:
+            slots = slots[np.argpartition(-scores[slots], limit - 1)[:limit]]
+        return slots[np.argsort(-scores[slots], kind="stable")].tolist()
+
+    def search(
+        self, tokens: list[str], source: str, limit: int, max_age: float = None
+    ) -> list[tuple[dict, float]]:
+        """
+        Top listings of a source containing every query token, best BM25 score first.
+
+        Args:
+            max_age: Skip listings seen more than this many seconds ago.
+
+        Returns:
+            list: (listing, seen_at) pairs, at most `limit`.
+        """
+        terms = set(tokens)
+        with self._lock:
+            source_id = self._sources.get(source)
+            if not terms or source_id is None or not self._live or limit <= 0:
+                return []
+            postings = [self._postings.get(term) for term in terms]
+            if any(term_postings is None for term_postings in postings):
+                return []
+            rowids = [
+                self._rowids[slot]
+                for slot in self._top_slots(postings, source_id, limit, max_age)
+            ]
+            if not rowids:
+                return []
+            placeholders = ",".join("?" * len(rowids))
+            rows = {
+                rowid: (listing, seen_at)
+                for rowid, listing, seen_at in self._conn.execute(
+                    "SELECT id, listing, seen_at FROM listings "
+                    f"WHERE id IN ({placeholders})",
+                    rowids,
+                )
+            }
+        return [
+            (json.loads(rows[rowid][0]), rows[rowid][1])
+            for rowid in rowids
+            if rowid in rows
+        ]
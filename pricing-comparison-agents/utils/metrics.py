@@ -0,0 +1,250 @@
+# utils/metrics.py
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.settings import METRICS_SPAN_PATH, METRICS_SPAN_SAMPLE_RATE, logger
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (100, 300, 1000, 3000, 10_000, 30_000, 100_000, 300_000)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    In-process counters and histograms keyed by name and labels, rendered in
+    the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(
+        self, name: str, value: float, buckets: tuple = SECONDS_BUCKETS, **labels
+    ):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """
+        Counter values and histogram count/sum as plain data, keyed by 'name{labels}'.
+        """
+        with self._lock:
+            counters = {
+                _series(name, labels): value
+                for (name, labels), value in self._counters.items()
+            }
+            histograms = {
+                _series(name, labels): {"count": h.count, "sum": h.sum}
+                for (name, labels), h in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{_series(name, labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                buckets = histogram.buckets + ("+Inf",)
+                for bound, count in zip(buckets, histogram.counts, strict=True):
+                    cumulative += count
+                    bucket = _series(name + "_bucket", labels + (("le", str(bound)),))
+                    lines.append(f"{bucket} {cumulative}")
+                lines.append(f"{_series(name + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{_series(name + '_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _series(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class SpanExporter:
+    """
+    Writes a sampled fraction of spans as JSON lines. Spans are buffered and
+    flushed in batches so sampling doesn't add a file write per call.
+    """
+
+    def __init__(self, path: str, sample_rate: float, batch_size: int = 100):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def export(self, span: dict):
+        with self._lock:
+            self._buffer.append(span)
+            if len(self._buffer) < self.batch_size:
+                return
+            spans, self._buffer = self._buffer, []
+        self._write(spans)
+
+    def flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if spans:
+            self._write(spans)
+
+    def _write(self, spans: list[dict]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.writelines(json.dumps(span) + "\n" for span in spans)
+
+
+metrics = Metrics()
+span_exporter = SpanExporter(METRICS_SPAN_PATH, METRICS_SPAN_SAMPLE_RATE)
+
+
+class Span:
+    """Handle yielded by span(); attributes set on it end up in the exported span."""
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, **labels):
+    """
+    Times a block: records {name}_seconds and, on failure, {name}_errors_total,
+    labelled with `labels`, and exports the span when it is sampled.
+    """
+    current = Span(name, dict(labels))
+    started = time.perf_counter()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        metrics.inc(f"{name}_errors_total", **labels)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        metrics.observe(f"{name}_seconds", duration, **labels)
+        if span_exporter.sampled():
+            span_exporter.export(
+                {
+                    "name": name,
+                    "start": time.time() - duration,
+                    "duration": duration,
+                    "error": repr(error) if error else None,
+                    "attributes": current.attributes,
+                }
+            )
+
+
+def instrument_node(name: str, node):
+    """
+    Wraps a graph node (sync or async) in a "node" span labelled with the node name.
+    """
+    # LangGraph passes the run config to nodes that take one
+    takes_config = "config" in inspect.signature(node).parameters
+
+    if inspect.iscoroutinefunction(node):
+
+        @functools.wraps(node)
+        async def async_wrapper(state, config=None):
+            with span("node", node=name):
+                return await (node(state, config) if takes_config else node(state))
+
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state, config=None):
+        with span("node", node=name):
+            return node(state, config) if takes_config else node(state)
+
+    return wrapper
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port: int):
+    """
+    Serves /metrics on a daemon thread; repeated calls in the same process are no-ops.
+    """
+    global _server
+    if _server is not None:
+        return _server
+    _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(
+        target=_server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    logger.info(f"metrics available on :{port}/metrics")
+    return _server
@@ -0,0 +1,285 @@
+# utils/price_history.py
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks on Windows: a single writing process is assumed there
+    fcntl = None
+
+# One raw binary file per column; row i of every column is one observation
+COLUMNS = {
+    "timestamp": np.float64,  # epoch seconds, non-decreasing
+    "series": np.int32,  # id from series.jsonl
+    "price": np.float32,  # NaN when no price was found
+    "available": np.uint8,
+}
+# Rows scanned per step when a window is too large to touch at once
+CHUNK_ROWS = 1 << 20
+
+
+class PriceHistory:
+    """
+    Append-only price observations per (product key, retailer) series.
+
+    Observations are stored column by column as raw numpy arrays and read back
+    through memory maps, so range queries only page in the rows they touch.
+    Timestamps never decrease, which lets a time window be located by binary
+    search instead of a scan.
+
+    Several processes (the app, the API workers, batch runs, the watchlist) may
+    share one history: appends and series registration hold an exclusive lock
+    on a file next to the columns, and pick up what other processes wrote first.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._series = {}
+        self._next_id = 0
+        self._series_offset = 0
+        self._series_path = os.path.join(path, "series.jsonl")
+        self._lock_path = os.path.join(path, "lock")
+        self._load_series()
+
+    @contextmanager
+    def _exclusive(self):
+        """Holds this process's lock and the file lock shared with other processes."""
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_series(self):
+        """Reads the series registered since the last call, by any process."""
+        if not os.path.exists(self._series_path):
+            return
+        with open(self._series_path, "rb") as f:
+            f.seek(self._series_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Still being written, or cut off by an interrupted write
+                    break
+                self._series_offset += len(line)
+                try:
+                    series_id, product_key, retailer = json.loads(line)
+                except ValueError:
+                    continue
+                self._series[(product_key, retailer)] = series_id
+                self._next_id = max(self._next_id, series_id + 1)
+
+    def _column_path(self, column: str) -> str:
+        return os.path.join(self.path, f"{column}.bin")
+
+    def __len__(self) -> int:
+        # A write interrupted between columns leaves them uneven; only complete rows
+        # count
+        return min(
+            os.path.getsize(self._column_path(column)) // np.dtype(dtype).itemsize
+            if os.path.exists(self._column_path(column))
+            else 0
+            for column, dtype in COLUMNS.items()
+        )
+
+    def _last_timestamp(self, rows: int) -> float:
+        if not rows:
+            return 0.0
+        return float(self._column("timestamp", rows)[rows - 1])
+
+    def _column(self, column: str, rows: int) -> np.ndarray:
+        if not rows:
+            return np.empty(0, dtype=COLUMNS[column])
+        return np.memmap(
+            self._column_path(column), dtype=COLUMNS[column], mode="r", shape=(rows,)
+        )
+
+    def series_id(self, product_key: str, retailer: str) -> int | None:
+        series_id = self._series.get((product_key, retailer))
+        if series_id is None:
+            # Maybe registered by another process since
+            with self._lock:
+                self._load_series()
+            series_id = self._series.get((product_key, retailer))
+        return series_id
+
+    def _ensure_series(self, product_key: str, retailer: str) -> int:
+        # Called under _exclusive, right after _load_series
+        series_id = self._series.get((product_key, retailer))
+        if series_id is None:
+            series_id = self._series[(product_key, retailer)] = self._next_id
+            self._next_id += 1
+            with open(self._series_path, "ab") as f:
+                # Drop a line cut off by an interrupted write, it'd corrupt this one
+                f.truncate(self._series_offset)
+                line = (json.dumps([series_id, product_key, retailer]) + "\n").encode()
+                f.write(line)
+            self._series_offset += len(line)
+        return series_id
+
+    def append(
+        self,
+        observations: list[tuple[str, str, float | None, bool]],
+        timestamp: float = None,
+    ):
+        """
+        Appends (product key, retailer, price, available) observations taken at
+        `timestamp`.
+        """
+        if not observations:
+            return
+        with self._exclusive():
+            self._load_series()
+            rows = len(self)
+            # Clamp so timestamps stay sorted even if the clock steps back, or another
+            # process appended a later one
+            now = time.time() if timestamp is None else timestamp
+            timestamp = max(now, self._last_timestamp(rows))
+            columns = {
+                "timestamp": np.full(len(observations), timestamp),
+                "series": [
+                    self._ensure_series(key, retailer)
+                    for key, retailer, _, _ in observations
+                ],
+                "price": [
+                    math.nan if price is None else price
+                    for _, _, price, _ in observations
+                ],
+                "available": [bool(available) for _, _, _, available in observations],
+            }
+            for column, dtype in COLUMNS.items():
+                with open(
+                    self._column_path(column),
+                    "r+b" if os.path.exists(self._column_path(column)) else "wb",
+                ) as f:
+                    # Drop any partial row left by an interrupted append before writing
+                    f.truncate(rows * np.dtype(dtype).itemsize)
+                    f.seek(0, os.SEEK_END)
+                    np.asarray(columns[column], dtype=dtype).tofile(f)
+
+    def _window(self, since: float = None, until: float = None) -> tuple[int, int]:
+        """Row range [start, stop) whose timestamps fall within [since, until]."""
+        rows = len(self)
+        timestamps = self._column("timestamp", rows)
+        start = (
+            int(np.searchsorted(timestamps, since, side="left"))
+            if since is not None
+            else 0
+        )
+        stop = (
+            int(np.searchsorted(timestamps, until, side="right"))
+            if until is not None
+            else rows
+        )
+        return start, stop
+
+    def query(
+        self, product_key: str, retailer: str, since: float = None, until: float = None
+    ) -> dict:
+        """
+        Observations of one series within the window.
+
+        Returns:
+            dict: "timestamp", "price" and "available" arrays in time order.
+        """
+        series_id = self.series_id(product_key, retailer)
+        start, stop = self._window(since, until)
+        parts = {column: [] for column in ("timestamp", "price", "available")}
+        if series_id is not None:
+            series_column = self._column("series", stop)
+            columns = {column: self._column(column, stop) for column in parts}
+            for chunk_start in range(start, stop, CHUNK_ROWS):
+                chunk = slice(chunk_start, min(chunk_start + CHUNK_ROWS, stop))
+                mask = series_column[chunk] == series_id
+                for column in parts:
+                    parts[column].append(np.asarray(columns[column][chunk][mask]))
+        return {
+            column: np.concatenate(values)
+            if values
+            else np.empty(0, dtype=COLUMNS[column])
+            for column, values in parts.items()
+        }
+
+    def window_stats(
+        self,
+        series: list[tuple[str, str]],
+        since: float = None,
+        until: float = None,
+        percentiles: tuple = (50,),
+    ) -> dict:
+        """
+        Price min/max/percentiles per (product key, retailer) over a time window,
+        computed for all requested series in one vectorized pass.
+
+        Returns:
+            dict: (product key, retailer) -> {"count", "min", "max", "p<N>"...} for
+            series with at least one priced observation in the window.
+        """
+        wanted = {
+            self.series_id(key, retailer): (key, retailer) for key, retailer in series
+        }
+        wanted.pop(None, None)
+        if not wanted:
+            return {}
+        wanted_ids = np.fromiter(wanted, dtype=np.int32)
+        start, stop = self._window(since, until)
+        series_column, price_column = (
+            self._column("series", stop),
+            self._column("price", stop),
+        )
+
+        ids, prices = [], []
+        for chunk_start in range(start, stop, CHUNK_ROWS):
+            chunk = slice(chunk_start, min(chunk_start + CHUNK_ROWS, stop))
+            chunk_ids, chunk_prices = series_column[chunk], price_column[chunk]
+            mask = np.isin(chunk_ids, wanted_ids) & ~np.isnan(chunk_prices)
+            ids.append(np.asarray(chunk_ids[mask]))
+            prices.append(np.asarray(chunk_prices[mask]))
+        if not ids:
+            return {}
+        ids, prices = np.concatenate(ids), np.concatenate(prices).astype(np.float64)
+        if not len(ids):
+            return {}
+
+        # Sort by series then price so every series is a contiguous, ordered run
+        order = np.lexsort((prices, ids))
+        ids, prices = ids[order], prices[order]
+        group_ids, starts, counts = np.unique(
+            ids, return_index=True, return_counts=True
+        )
+        stats = {
+            "count": counts,
+            "min": prices[starts],
+            "max": prices[starts + counts - 1],
+        }
+        for percentile in percentiles:
+            # Linear interpolation between the closest ranks, like np.percentile
+            position = starts + (counts - 1) * (percentile / 100)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            stats[f"p{percentile:g}"] = prices[lower] + (
+                prices[upper] - prices[lower]
+            ) * (position - lower)
+
+        return {
+            # Prices are stored as float32, so round back to cents
+            wanted[int(series_id)]: {
+                name: values[i].item()
+                if name == "count"
+                else round(values[i].item(), 2)
+                for name, values in stats.items()
+            }
+            for i, series_id in enumerate(group_ids)
+        }
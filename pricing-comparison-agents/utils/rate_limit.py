@@ -0,0 +1,40 @@
+# utils/rate_limit.py
+
+import asyncio
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket that lets at most `rate` calls start per second, with bursts of up to
+    `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        # Waiters queue on the lock, so calls are released in arrival order
+        async with self._lock:
+            now = loop.time()
+            if self._updated_at is not None:
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated_at) * self.rate
+                )
+            self._updated_at = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 1.0
+                self._updated_at = loop.time()
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
@@ -0,0 +1,255 @@
+# utils/resilience.py
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from config.settings import (
+    SEARCH_BREAKER_COOLDOWN,
+    SEARCH_BREAKER_FAILURES,
+    SEARCH_HEDGE_PERCENTILE,
+    SEARCH_MAX_RETRIES,
+    SEARCH_RETRY_BACKOFF,
+    SEARCH_RETRY_BUDGET,
+    logger,
+)
+from utils.metrics import metrics
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class LatencyTracker:
+    """
+    Recent successful call latencies per key, used to decide when a call is slow
+    enough to hedge.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: str, percentile: float) -> float | None:
+        """The latency percentile for key, or None until enough calls have been seen."""
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return float(np.percentile(samples, percentile))
+
+
+class RetryBudget:
+    """
+    Caps retries and hedges at a fraction of regular calls across the process, so
+    a struggling dependency doesn't get hit with a retry storm.
+
+    Every call deposits `ratio` tokens, every retry or hedge spends one; `reserve`
+    tokens are always available so low traffic can still retry.
+    """
+
+    def __init__(self, ratio: float, reserve: float = 10.0):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._balance = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(
+                self._balance + self.ratio, self.reserve + 1000 * self.ratio
+            )
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `cooldown` seconds, then lets a single trial call through (half-open); its
+    outcome closes the breaker again or restarts the cool-down.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return (
+            "half-open"
+            if time.monotonic() - self._opened_at >= self.cooldown
+            else "open"
+        )
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Frees the half-open trial slot of a call that ended without an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Counts a failure; returns True when this failure (re)opened the breaker."""
+        with self._lock:
+            self._failures += 1
+            reopened = self._trial_in_flight or (
+                self._opened_at is None and self._failures >= self.failure_threshold
+            )
+            if reopened:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+            return reopened
+
+
+latency_tracker = LatencyTracker()
+retry_budget = RetryBudget(SEARCH_RETRY_BUDGET)
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(key: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(
+                SEARCH_BREAKER_FAILURES, SEARCH_BREAKER_COOLDOWN
+            )
+        return breaker
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Network errors, timeouts, 429 and 5xx responses are worth retrying; other 4xx are
+    not.
+    """
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+
+async def _timed(key: str, make_call):
+    started = time.monotonic()
+    result = await make_call()
+    latency_tracker.record(key, time.monotonic() - started)
+    return result
+
+
+async def hedged_call(
+    key: str, make_call, hedge_percentile: float = SEARCH_HEDGE_PERCENTILE
+):
+    """
+    Awaits make_call(); if it is still running after key's hedge_percentile
+    latency, starts a second identical call and returns whichever succeeds first.
+    """
+    first = asyncio.ensure_future(_timed(key, make_call))
+    delay = (
+        latency_tracker.percentile(key, hedge_percentile) if hedge_percentile else None
+    )
+    if delay is None:
+        return await first
+
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and retry_budget.withdraw():
+            metrics.inc("search_hedges_total", key=key)
+            tasks.add(asyncio.ensure_future(_timed(key, make_call)))
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def resilient_call(
+    key: str,
+    make_call,
+    max_retries: int = SEARCH_MAX_RETRIES,
+    backoff: float = SEARCH_RETRY_BACKOFF,
+):
+    """
+    Runs make_call() behind key's circuit breaker, hedging slow attempts and
+    retrying failed ones with jittered exponential backoff while the retry
+    budget allows.
+
+    Raises:
+        CircuitOpenError: The breaker for key is open, the call was skipped.
+    """
+    breaker = get_breaker(key)
+    if not breaker.allow():
+        metrics.inc("search_circuit_rejections_total", key=key)
+        raise CircuitOpenError(f"circuit for {key} is open")
+    retry_budget.deposit()
+
+    attempt = 0
+    while True:
+        try:
+            result = await hedged_call(key, make_call)
+        except asyncio.CancelledError:
+            # Abandoned by the caller's deadline, which says nothing about the
+            # dependency
+            breaker.release_trial()
+            raise
+        except Exception as e:
+            if breaker.record_failure():
+                metrics.inc("search_circuit_opened_total", key=key)
+                logger.warning(
+                    f"circuit for {key} opened for {breaker.cooldown}s after: {e}"
+                )
+            if (
+                attempt >= max_retries
+                or not is_retryable(e)
+                or not breaker.allow()
+                or not retry_budget.withdraw()
+            ):
+                raise
+            attempt += 1
+            metrics.inc("search_retries_total", key=key)
+            await asyncio.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            continue
+        breaker.record_success()
+        return result
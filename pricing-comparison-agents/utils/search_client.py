@@ -0,0 +1,122 @@
+# utils/search_client.py
+
+import asyncio
+import weakref
+from contextlib import nullcontext
+
+import httpx
+
+from config.settings import (
+    SEARCH_API_URL,
+    SEARCH_CONCURRENCY,
+    SEARCH_MAX_CONNECTIONS,
+    SEARCH_TIMEOUT,
+    TAVILY_API_KEY,
+)
+from utils.rate_limit import AsyncRateLimiter
+
+
+class PooledSearchClient:
+    """
+    Async Tavily search client backed by a single keep-alive connection pool.
+
+    Every retailer node shares one instance per event loop, so a comparison
+    reuses warm connections instead of opening a fresh one per search, and the
+    semaphore caps how many searches are in flight at once.
+    """
+
+    def __init__(
+        self,
+        api_key: str = TAVILY_API_KEY,
+        base_url: str = SEARCH_API_URL,
+        max_connections: int = SEARCH_MAX_CONNECTIONS,
+        concurrency: int = SEARCH_CONCURRENCY,
+        timeout: float = SEARCH_TIMEOUT,
+    ):
+        self._api_key = api_key
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=timeout,
+        )
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limits = {}
+        self._rate_limiters = {}
+
+    def _limit(self, key: str, concurrency: int) -> asyncio.Semaphore:
+        semaphore = self._limits.get(key)
+        if semaphore is None:
+            semaphore = self._limits[key] = asyncio.Semaphore(concurrency)
+        return semaphore
+
+    def _rate_limit(self, key: str, rate: float) -> AsyncRateLimiter:
+        limiter = self._rate_limiters.get(key)
+        if limiter is None:
+            limiter = self._rate_limiters[key] = AsyncRateLimiter(rate)
+        return limiter
+
+    async def search(
+        self,
+        query: str,
+        limit_key: str = None,
+        limit: int = None,
+        rate: float = None,
+        **params,
+    ) -> dict:
+        """
+        Runs a Tavily search; accepts the same keyword arguments as TavilyClient.search.
+
+        Args:
+            limit_key: Optional key (e.g. a retailer domain) with its own concurrency
+                cap.
+            limit: Max in-flight searches for limit_key, on top of the global cap.
+            rate: Max searches per second started for limit_key; None or 0 means
+                unlimited.
+        """
+        payload = {"api_key": self._api_key, "query": query, **params}
+        if limit_key and rate:
+            await self._rate_limit(limit_key, rate).acquire()
+        per_key = (
+            self._limit(limit_key, limit or SEARCH_CONCURRENCY)
+            if limit_key
+            else nullcontext()
+        )
+        async with per_key, self._semaphore:
+            response = await self._client.post("/search", json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+# httpx pools and asyncio semaphores are bound to the loop they were created on
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PooledSearchClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_client_factory = PooledSearchClient
+
+
+def set_search_client_factory(factory=None):
+    """
+    Replaces how per-loop search clients are built, e.g. with a local stand-in
+    exposing the same async search(); None restores PooledSearchClient.
+    """
+    global _client_factory
+    _client_factory = factory or PooledSearchClient
+    _clients.clear()
+
+
+def get_search_client() -> PooledSearchClient:
+    """
+    Returns the pooled search client for the running loop, creating it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = _client_factory()
+    return client
@@ -0,0 +1,179 @@
+# utils/semantic_cache.py
+
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+
+from utils.cache import SqliteCache
+from utils.metrics import metrics
+
+# Histogram buckets for cosine similarity of the nearest cached query
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.99, 1.0)
+
+
+class SemanticCache:
+    """
+    Cache keyed by meaning rather than exact text: keys are embedded with a local
+    sentence-transformers model, and a lookup returns the value of the nearest
+    stored key if it is at least `threshold` cosine-similar.
+
+    Embeddings live in a chromadb collection, whose HNSW index answers nearest
+    neighbour queries approximately; values live in a SqliteCache next to it.
+    Entries expire after `ttl` seconds. Both libraries are imported on first use.
+
+    The last lookups, with the key they matched and its similarity, are kept
+    for stats() so the threshold can be checked against real traffic.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        threshold: float,
+        ttl: float,
+        candidates: int = 3,
+        accept=None,
+        name: str = "semantic",
+    ):
+        """
+        Args:
+            candidates: Nearest neighbours considered per lookup.
+            accept: Optional accept(key, cached_key) -> bool vetoing a match the
+                embedding considers close, e.g. on differing model numbers.
+        """
+        self.path = path
+        self.model_name = model_name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.candidates = candidates
+        self.accept = accept
+        self.name = name
+        self.lookups = 0
+        self.hits = 0
+        self.rejected = 0
+        self.recent = deque(maxlen=200)
+        self._model = None
+        self._collection = None
+        self._values = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _open(self):
+        with self._lock:
+            if self._collection is None:
+                import chromadb
+                from chromadb.config import Settings
+                from sentence_transformers import SentenceTransformer
+
+                os.makedirs(self.path, exist_ok=True)
+                self._model = SentenceTransformer(self.model_name)
+                client = chromadb.PersistentClient(
+                    path=self.path, settings=Settings(anonymized_telemetry=False)
+                )
+                self._collection = client.get_or_create_collection(
+                    self.name, metadata={"hnsw:space": "cosine"}
+                )
+                self._values = SqliteCache(
+                    os.path.join(self.path, "values.db"), table=f"{self.name}_values"
+                )
+        return self._collection
+
+    def embed(self, key: str) -> list[float]:
+        self._open()
+        return self._model.encode([key], normalize_embeddings=True)[0].tolist()
+
+    def _note(
+        self, result: str, key: str, matched: str = None, similarity: float = None
+    ):
+        metrics.inc("semantic_cache_total", cache=self.name, result=result)
+        if similarity is not None:
+            metrics.observe(
+                "semantic_cache_similarity",
+                similarity,
+                buckets=SIMILARITY_BUCKETS,
+                cache=self.name,
+            )
+        self.recent.append(
+            {
+                "key": key,
+                "matched": matched,
+                "similarity": similarity,
+                "result": result,
+                "at": time.time(),
+            }
+        )
+
+    def get(self, key: str):
+        """Returns the value stored under the closest similar enough key, or None."""
+        collection = self._open()
+        self.lookups += 1
+        if collection.count() == 0:
+            self._note("miss", key)
+            return None
+        found = collection.query(
+            query_embeddings=[self.embed(key)],
+            n_results=self.candidates,
+            where={"expires_at": {"$gt": time.time()}},
+            include=["distances", "metadatas"],
+        )
+        best, vetoed = None, False
+        for entry_id, distance, metadata in zip(
+            found["ids"][0], found["distances"][0], found["metadatas"][0], strict=True
+        ):
+            similarity = 1.0 - distance
+            if best is None:
+                best = (metadata["key"], similarity)
+            if similarity < self.threshold:
+                break
+            if self.accept is not None and not self.accept(key, metadata["key"]):
+                vetoed = True
+                continue
+            value = self._values.get(entry_id)
+            if value is None:
+                # Value expired or was evicted, the embedding goes too
+                collection.delete(ids=[entry_id])
+                continue
+            self.hits += 1
+            self._note("hit", key, metadata["key"], similarity)
+            return value
+        if vetoed:
+            # Close enough by embedding but vetoed, worth reviewing
+            self.rejected += 1
+            self._note("rejected", key, *best)
+        else:
+            self._note("miss", key, *(best or (None, None)))
+        return None
+
+    def set(self, key: str, value):
+        collection = self._open()
+        entry_id = hashlib.sha256(key.encode()).hexdigest()
+        now = time.time()
+        self._values.set(entry_id, value, ttl=self.ttl)
+        collection.upsert(
+            ids=[entry_id],
+            embeddings=[self.embed(key)],
+            metadatas=[{"key": key, "expires_at": now + self.ttl}],
+        )
+        self._writes += 1
+        # Expired embeddings are filtered out of lookups; drop them now and then
+        if self._writes % 100 == 0:
+            collection.delete(where={"expires_at": {"$lte": now}})
+
+    def stats(self) -> dict:
+        """
+        Hit counts and the most recent lookups, for checking what the threshold
+        collapses.
+        """
+        return {
+            "threshold": self.threshold,
+            "entries": self._collection.count()
+            if self._collection is not None
+            else None,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "rejected": self.rejected,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "recent": list(self.recent),
+        }
@@ -0,0 +1,172 @@
+# utils/singleflight.py
+
+import asyncio
+import threading
+import weakref
+
+from utils.metrics import metrics
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """
+    Items produced by one shared async generator, replayable by any number of
+    subscribers.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent identical async calls: while a call for a key is in
+    flight, later callers with the same key await that call instead of starting
+    their own, and all of them get its result (or exception).
+
+    Results are shared, so callers must treat them as read-only. In-flight calls
+    are tracked per event loop. If every caller waiting on a call is cancelled,
+    the shared call is cancelled too.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.collapsed = 0
+        self._flights = weakref.WeakKeyDictionary()
+
+    def _record(self, shared: bool):
+        self.calls += 1
+        metrics.inc("singleflight_calls_total", group=self.name)
+        if shared:
+            self.collapsed += 1
+            metrics.inc("singleflight_collapsed_total", group=self.name)
+
+    def _in_flight(self) -> dict:
+        return self._flights.setdefault(asyncio.get_running_loop(), {})
+
+    async def do(self, key, make_coro):
+        """Awaits make_coro(), or the call already in flight for key."""
+        flights = self._in_flight()
+        flight = flights.get(key)
+        self._record(shared=flight is not None)
+        if flight is None:
+            flight = flights[key] = _Flight(asyncio.ensure_future(make_coro()))
+            flight.task.add_done_callback(
+                lambda _: flights.pop(key, None) if flights.get(key) is flight else None
+            )
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller gave up (e.g. its deadline passed), stop the shared work
+                flight.task.cancel()
+
+    async def stream(self, key, make_agen):
+        """
+        Yields the items of make_agen(), or of the identical stream already in
+        flight for key; late subscribers first receive everything produced so far.
+        """
+        flights = self._in_flight()
+        broadcast = flights.get(key)
+        self._record(shared=broadcast is not None)
+        if broadcast is None:
+            broadcast = flights[key] = _Broadcast()
+
+            async def pump(agen):
+                try:
+                    async for item in agen:
+                        broadcast.items.append(item)
+                        broadcast.notify()
+                except Exception as e:
+                    broadcast.error = e
+                finally:
+                    broadcast.done = True
+                    if flights.get(key) is broadcast:
+                        del flights[key]
+                    broadcast.notify()
+
+            broadcast.task = asyncio.ensure_future(pump(make_agen()))
+
+        broadcast.subscribers += 1
+        try:
+            position = 0
+            while True:
+                while position < len(broadcast.items):
+                    yield broadcast.items[position]
+                    position += 1
+                if broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                await broadcast._changed.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                broadcast.task.cancel()
+
+
+class _SyncFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-based counterpart of AsyncSingleFlight for blocking callers: threads
+    calling do() with a key that is already in flight wait for that call's result.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.collapsed = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Returns fn(), or the result of the call already in flight for key."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _SyncFlight()
+            self.calls += 1
+            self.collapsed += not leader
+        metrics.inc("singleflight_calls_total", group=self.name)
+        if not leader:
+            metrics.inc("singleflight_collapsed_total", group=self.name)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
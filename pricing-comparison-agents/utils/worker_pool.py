@@ -0,0 +1,75 @@
+# utils/worker_pool.py
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from utils.metrics import metrics
+
+
+class PoolSaturated(Exception):
+    """Raised when a job can't be admitted: every worker and queue slot is taken."""
+
+
+class WorkerPool:
+    """
+    Bounded async worker pool with admission control.
+
+    At most `workers` jobs run at once and up to `queue_size` more wait for a
+    worker; admit() rejects anything beyond that right away instead of letting
+    the backlog (and every caller's latency) grow without bound.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.admitted = 0
+        self.running = 0
+        self._semaphore = asyncio.Semaphore(workers)
+
+    @property
+    def capacity(self) -> int:
+        """Most jobs admitted at once, running or waiting."""
+        return self.workers + self.queue_size
+
+    def check(self, jobs: int = 1):
+        """
+        Raises:
+            PoolSaturated: Not enough free workers and queue slots for `jobs` jobs.
+        """
+        if self.admitted + jobs > self.capacity:
+            metrics.inc("worker_pool_rejected_total", jobs)
+            raise PoolSaturated(
+                f"{self.admitted} jobs admitted, capacity {self.capacity}"
+            )
+
+    def admit(self, jobs: int = 1):
+        """
+        Reserves room for `jobs` jobs, all or nothing; release() them when done.
+
+        Raises:
+            PoolSaturated: Not enough free workers and queue slots.
+        """
+        self.check(jobs)
+        self.admitted += jobs
+        metrics.inc("worker_pool_admitted_total", jobs)
+
+    def release(self, jobs: int = 1):
+        self.admitted -= jobs
+
+    @asynccontextmanager
+    async def worker(self):
+        """Waits for a free worker and holds it for the duration of the block."""
+        async with self._semaphore:
+            self.running += 1
+            try:
+                yield
+            finally:
+                self.running -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": self.running,
+            "queued": self.admitted - self.running,
+        }